@@ -0,0 +1,45 @@
+# shared setup for the benchmark scripts: configures the test django app
+# and creates a schema of synthetic models to expose
+import os
+import sys
+import timeit
+
+# make both the test django app and uql importable
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from testapp import setup
+
+setup()
+
+from django.db import models
+
+
+def createModels(count: int) -> list[type[models.Model]]:
+    """creates `count` unmanaged models, each with a few columns and a foreign key"""
+    created: list[type[models.Model]] = []
+
+    for i in range(count):
+        attrs = {
+            "__module__": "testapp.models",
+            "Meta": type("Meta", (), {"app_label": "testapp", "managed": False}),
+            "name": models.CharField(max_length=100),
+            "description": models.TextField(),
+            "amount": models.IntegerField(default=0),
+            "createdAt": models.DateTimeField(auto_now_add=True),
+        }
+
+        if created:
+            attrs["parent"] = models.ForeignKey(
+                created[-1], on_delete=models.CASCADE, related_name=f"children{i}"
+            )
+        created.append(type(f"BenchModel{i}", (models.Model,), attrs))
+    return created
+
+
+def report(label: str, fn, number: int) -> float:
+    """runs fn `number` times and prints the average time per call"""
+    total = timeit.timeit(fn, number=number)
+    perCall = total / number
+    print(f"{label:<48} {perCall * 1e6:>10.2f} µs/call")
+    return perCall
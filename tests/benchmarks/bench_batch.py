@@ -0,0 +1,82 @@
+# measures concurrent batches (createUQLView(batchWorkers=...)) with django's default
+# CONN_MAX_AGE = 0: the worker threads keeping their connection between cells, against
+# closing it after every cell like django.db.close_old_connections does for requests.
+# the database is an sqlite file, in-memory databases are never closed.
+# run with: python tests/benchmarks/bench_batch.py
+import os
+import tempfile
+from unittest import mock
+
+from _setup import report
+
+from django.conf import settings
+
+path = os.path.join(tempfile.mkdtemp(), "bench_batch.sqlite3")
+settings.DATABASES["default"]["NAME"] = path
+
+from django.core.management import call_command
+from django.db import close_old_connections
+from django.db.backends.signals import connection_created
+from rest_framework.test import APIRequestFactory
+
+from testapp import models as app
+from uql.views import createUQLView
+from uql.models import ExposedModel, useFullPermissionAccess
+
+BOOKS = 200
+CELLS = 8
+WORKERS = 4
+CALLS = 50
+
+assert settings.DATABASES["default"].get("CONN_MAX_AGE", 0) == 0
+
+call_command("migrate", run_syncdb=True, verbosity=0)
+
+publisher = app.Publisher.objects.create(name="Penguin")
+author = app.Author.objects.create(name="Achebe", publisher=publisher)
+app.Book.objects.bulk_create(
+    app.Book(title=f"Book {i}", price=i, author=author) for i in range(BOOKS)
+)
+
+exposed = [
+    ExposedModel(model=model).addPermission(
+        "ANONYMOUS", lambda _: useFullPermissionAccess()
+    )
+    for model in (app.Publisher, app.Author, app.Book)
+]
+view = createUQLView(models=exposed, functions=[], batchWorkers=WORKERS).as_view()
+
+# distinct cells, identical ones would only be run once
+cells = [
+    {
+        "intent": "models.testapp.book.findmany",
+        "fields": {"title": True, "price": True},
+        "args": {"where": {"price": {"_gte": i * (BOOKS // CELLS)}}, "limit": 20},
+    }
+    for i in range(CELLS)
+]
+request = lambda: APIRequestFactory().post("/uql/", cells, format="json")
+
+opened = []
+connection_created.connect(
+    lambda sender, connection, **kwargs: opened.append(1), weak=False
+)
+
+
+def run(label: str) -> float:
+    view(request()).render()
+    opened.clear()
+    perCall = report(label, lambda: view(request()).render(), CALLS)
+    print(f"{'':<48} {len(opened) / CALLS:>10.2f} connections/batch")
+    return perCall
+
+
+print(f"{CELLS} cells per batch, {WORKERS} workers, CONN_MAX_AGE = 0")
+
+with mock.patch("uql.views._releaseWorkerConnections", close_old_connections):
+    before = run("connection closed after every cell")
+
+after = run("connection kept by the worker thread")
+print(f"speedup: {before / after:.2f}x")
+
+os.remove(path)
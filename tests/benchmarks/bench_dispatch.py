@@ -0,0 +1,63 @@
+# measures the overhead of dispatching to an intent: validation, permission checks,
+# the handler call and field selection, against the previous per-call dispatch.
+# run with: python tests/benchmarks/bench_dispatch.py
+import inspect
+import typing
+
+from _setup import report
+
+from django.core.exceptions import ValidationError
+from rest_framework.permissions import BasePermission
+
+from uql.utils import dto
+from uql.functions import ApiFunction
+from uql.utils.select import selectKeys
+
+CALLS = 20000
+
+
+class IsAllowed(BasePermission):
+    def has_permission(self, request, view):
+        return True
+
+
+def handler(request, args):
+    return {"id": 1, "name": "uql", "count": args["count"], "meta": {"a": 1, "b": 2}}
+
+
+function = ApiFunction(
+    handler,
+    rule=dto.Dictionary({"count": dto.Number()}),
+    permission_classes=[lambda request: True, IsAllowed],
+)
+
+args = {"count": 3}
+fields = {"id": True, "meta": {"a": True}}
+
+
+def legacy():
+    # the dispatch path before intents were compiled
+    function.rule.validate(args)
+    error = ValidationError("Unauthorised operation", "401")
+    for permission in function.permission_classes:
+        if inspect.isfunction(permission):
+            if not permission(None):
+                raise error
+        elif issubclass(
+            typing.cast(typing.Type[BasePermission], permission), BasePermission
+        ):
+            if not permission().has_permission(None, None):
+                raise error
+    data = handler(None, args)
+    return selectKeys(data, fields)
+
+
+def compiled():
+    return function.execute(None, args, fields)
+
+
+assert legacy() == compiled()
+
+before = report("per-call dispatch (previous)", legacy, CALLS)
+after = report("compiled pipeline", compiled, CALLS)
+print(f"speedup: {before / after:.2f}x")
@@ -0,0 +1,67 @@
+# measures findmany on books that share a few authors: nested (each author serialized
+# once per response, then reused) against the normalized output, with response sizes.
+# run with: python tests/benchmarks/bench_identity.py
+from unittest import mock
+
+from _setup import report
+
+from django.core.management import call_command
+from django.db import transaction
+from rest_framework.test import APIRequestFactory
+
+from testapp import models as app
+from uql.views import createUQLView
+from uql.models import ExposedModel, useFullPermissionAccess
+
+BOOKS = 1000
+AUTHORS = 20
+CALLS = 10
+
+call_command("migrate", run_syncdb=True, verbosity=0)
+
+exposed = [
+    ExposedModel(model=model).addPermission(
+        "ANONYMOUS", lambda _: useFullPermissionAccess()
+    )
+    for model in (app.Publisher, app.Author, app.Book, app.Tag, app.Review)
+]
+view = createUQLView(models=exposed, functions=[]).as_view()
+
+
+def call(normalize: bool) -> bytes:
+    body = {
+        "intent": "models.testapp.book.findmany",
+        "fields": True,
+        "args": {"where": {}, "normalize": normalize},
+    }
+    return view(APIRequestFactory().post("/uql/", body, format="json")).render().content
+
+
+def withoutIdentityMap() -> bytes:
+    # without the context, the serializers serialize every nested object
+    with mock.patch("uql.models.manager.createSerializerContext", lambda normalize: {}):
+        return call(False)
+
+
+with transaction.atomic():
+    publisher = app.Publisher.objects.create(name="Penguin")
+    authors = [
+        app.Author.objects.create(name=f"Author {i}", publisher=publisher)
+        for i in range(AUTHORS)
+    ]
+    app.Book.objects.bulk_create(
+        [
+            app.Book(title=f"Book {i}", price=i, author=authors[i % AUTHORS])
+            for i in range(BOOKS)
+        ]
+    )
+
+    assert withoutIdentityMap() == call(False)
+
+    before = report("nested, without identity map", withoutIdentityMap, CALLS)
+    after = report("nested, with identity map", lambda: call(False), CALLS)
+    report("normalized", lambda: call(True), CALLS)
+    print(f"speedup: {before / after:.2f}x")
+    print(f"response size: nested {len(call(False))}B, normalized {len(call(True))}B")
+
+    transaction.set_rollback(True)
@@ -0,0 +1,49 @@
+# compares building the intent root with lazy handler stubs against materializing
+# every model handler up front (the previous behaviour).
+# run with: python tests/benchmarks/bench_lazy_root.py
+import tracemalloc
+
+from _setup import createModels, report
+
+from uql.views import createUQLView
+from uql.models import ExposedModel, useFullPermissionAccess
+
+MODEL_COUNT = 60
+ROUNDS = 20
+
+exposedModels = [
+    ExposedModel(model=model).addPermission(
+        "ANONYMOUS", lambda _: useFullPermissionAccess()
+    )
+    for model in createModels(MODEL_COUNT)
+]
+
+View = createUQLView(models=exposedModels, functions=[])
+
+
+def buildLazy():
+    return View.buildRoot(exposedModels, [])
+
+
+def buildEager():
+    root = View.buildRoot(exposedModels, [])
+    for stub in root.values():
+        stub.function
+    return root
+
+
+def allocated(fn) -> int:
+    tracemalloc.start()
+    root = fn()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del root
+    return size
+
+
+print(f"{MODEL_COUNT} exposed models")
+eager = report("eager root (every handler built)", buildEager, ROUNDS)
+lazy = report("lazy root (stubs only)", buildLazy, ROUNDS)
+print(f"startup speedup: {eager / lazy:.1f}x")
+print(f"eager root memory: {allocated(buildEager) / 1024:>10.1f} KiB")
+print(f"lazy root memory:  {allocated(buildLazy) / 1024:>10.1f} KiB")
@@ -0,0 +1,36 @@
+# measures building Q objects from where structures of the same shape with different
+# values: walking the whole structure on every call against the compiled query cache.
+# run with: python tests/benchmarks/bench_query.py
+from unittest import mock
+
+from _setup import report
+
+from uql.utils import query as q
+
+CALLS = 20000
+
+
+def where(i: int) -> dict:
+    return {
+        "price": {"_gte": i, "_lt": i + 100},
+        "author": {"publisher": {"name": {"_icontains": f"pen{i}"}}},
+        "_or": [
+            {"title": {"_contains": "war"}},
+            {"tags": {"label": {"_in": [i, i + 1]}}},
+        ],
+    }
+
+
+call = lambda: q.makeQuery(where(7))
+
+# compile every shape, as if nothing was ever cached
+with mock.patch.object(q, "_template", q._compile):
+    uncached = call()
+    before = report("compiled on every call", call, CALLS)
+
+assert uncached == call()
+q.clearQueryCache()
+
+after = report("compiled query cache", call, CALLS)
+print(f"speedup: {before / after:.2f}x")
+print(q.queryCacheInfo())
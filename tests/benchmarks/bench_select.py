@@ -0,0 +1,68 @@
+# measures selecting the requested fields from findmany-like outputs: selectKeys on
+# every row (the previous projection) against a projector compiled once per call.
+# small outputs (find-like rows, short lists) are also projected with project, which
+# doesn't compile a projector for every output.
+# run with: python tests/benchmarks/bench_select.py
+from _setup import report
+
+from uql.utils.select import project
+from uql.utils.select import selectKeys
+from uql.utils.select import compileProjector
+
+ROWS = 10000
+CALLS = 20
+
+rows = [
+    {
+        "id": i,
+        "title": f"Book {i}",
+        "price": i * 100,
+        "author": {
+            "id": i % 20,
+            "name": f"Author {i % 20}",
+            "publisher": {"id": 1, "name": "Penguin"},
+        },
+        "tags": [{"id": t, "label": f"tag {t}"} for t in range(i % 4)],
+    }
+    for i in range(ROWS)
+]
+
+shapes = {
+    "flat": {"id": True, "title": True, "price": True},
+    "nested": {"title": True, "author": {"name": True, "publisher": {"name": True}}},
+    "list of maps": {"id": True, "tags": {"label": True}},
+    "whole values": {"author": True, "tags": True},
+}
+
+
+def legacy(fields: dict):
+    return [selectKeys(row, fields) for row in rows]
+
+
+def compiled(fields: dict):
+    return compileProjector(fields)(rows)
+
+
+for name, fields in shapes.items():
+    assert legacy(fields) == compiled(fields)
+
+    before = report(f"selectKeys, {name} ({ROWS} rows)", lambda: legacy(fields), CALLS)
+    after = report(f"compiled, {name} ({ROWS} rows)", lambda: compiled(fields), CALLS)
+    print(f"speedup: {before / after:.2f}x")
+
+
+# small outputs, projected on every call
+SMALL_CALLS = 20000
+small = {"one row": rows[5], "five rows": rows[:5]}
+fields = shapes["nested"]
+
+for name, output in small.items():
+    assert project(output, fields) == compileProjector(fields)(output)
+
+    before = report(
+        f"compiled per call, {name}",
+        lambda: compileProjector(fields)(output),
+        SMALL_CALLS,
+    )
+    after = report(f"project, {name}", lambda: project(output, fields), SMALL_CALLS)
+    print(f"speedup: {before / after:.2f}x")
@@ -0,0 +1,53 @@
+# compares serializing findmany results with the drf model serializers against
+# reading the rows with QuerySet.values() (ExposedModel(fastSerialization=True)).
+# run with: python tests/benchmarks/bench_values.py
+from _setup import report
+
+from django.core.management import call_command
+from django.db import transaction
+from rest_framework.test import APIRequestFactory
+
+from testapp import models as app
+from uql.views import createUQLView
+from uql.models import ExposedModel, useFullPermissionAccess
+
+BOOKS = 500
+CALLS = 20
+
+call_command("migrate", run_syncdb=True, verbosity=0)
+
+
+def view(fastSerialization: bool):
+    exposed = [
+        ExposedModel(model=model, fastSerialization=fastSerialization).addPermission(
+            "ANONYMOUS", lambda _: useFullPermissionAccess()
+        )
+        for model in (app.Publisher, app.Author, app.Book, app.Tag, app.Review)
+    ]
+    return createUQLView(models=exposed, functions=[]).as_view()
+
+
+body = {"intent": "models.testapp.book.findmany", "fields": True, "args": {"where": {}}}
+request = lambda: APIRequestFactory().post("/uql/", body, format="json")
+
+with transaction.atomic():
+    publisher = app.Publisher.objects.create(name="Penguin")
+    author = app.Author.objects.create(name="Achebe", publisher=publisher)
+    tags = [app.Tag.objects.create(label=f"tag {i}") for i in range(3)]
+
+    for i in range(BOOKS):
+        book = app.Book.objects.create(title=f"Book {i}", price=i, author=author)
+        book.tags.set(tags[: i % 4])
+
+    drfView, valuesView = view(False), view(True)
+    assert drfView(request()).render().content == valuesView(request()).render().content
+
+    before = report(
+        f"drf serializers ({BOOKS} rows)", lambda: drfView(request()), CALLS
+    )
+    after = report(
+        f"values() serializer ({BOOKS} rows)", lambda: valuesView(request()), CALLS
+    )
+    print(f"speedup: {before / after:.2f}x")
+
+    transaction.set_rollback(True)
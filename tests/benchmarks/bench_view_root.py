@@ -0,0 +1,30 @@
+# measures the fixed per-request cost of instantiating the uql view.
+# run with: python tests/benchmarks/bench_view_root.py
+from _setup import createModels, report
+
+from uql.views import createUQLView
+from uql.models import ExposedModel, useFullPermissionAccess
+
+MODEL_COUNT = 60
+REQUESTS = 200
+
+exposedModels = [
+    ExposedModel(model=model).addPermission(
+        "ANONYMOUS", lambda _: useFullPermissionAccess()
+    )
+    for model in createModels(MODEL_COUNT)
+]
+
+View = createUQLView(models=exposedModels, functions=[])
+
+# warm up the shared root
+View()
+
+print(f"{MODEL_COUNT} exposed models, {REQUESTS} simulated requests")
+before = report(
+    "rebuild root on every request (previous)",
+    lambda: View.buildRoot(exposedModels, []),
+    REQUESTS,
+)
+after = report("view instantiation with shared root", View, REQUESTS)
+print(f"speedup: {before / after:.0f}x")
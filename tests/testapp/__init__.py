@@ -0,0 +1,32 @@
+# minimal django project used by the unit tests and benchmarks.
+# call `setup()` before importing anything from uql that touches django models
+import django
+from django.conf import settings
+
+
+def setup() -> None:
+    """configures django settings (in-memory sqlite) and loads the app registry"""
+
+    if settings.configured:
+        return
+
+    settings.configure(
+        DEBUG=False,
+        SECRET_KEY="uql-tests",
+        USE_TZ=True,
+        DEFAULT_AUTO_FIELD="django.db.models.AutoField",
+        DATABASES={
+            "default": {
+                "ENGINE": "django.db.backends.sqlite3",
+                "NAME": ":memory:",
+            }
+        },
+        INSTALLED_APPS=[
+            "django.contrib.contenttypes",
+            "django.contrib.auth",
+            "rest_framework",
+            "uql",
+            "testapp",
+        ],
+    )
+    django.setup()
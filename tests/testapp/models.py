@@ -0,0 +1,34 @@
+from django.db import models
+
+
+class Publisher(models.Model):
+    name = models.CharField(max_length=120, unique=True)
+
+
+class Author(models.Model):
+    name = models.CharField(max_length=120)
+    email = models.EmailField(null=True)
+    publisher = models.ForeignKey(
+        Publisher, on_delete=models.CASCADE, related_name="authors", null=True
+    )
+
+
+class Tag(models.Model):
+    label = models.CharField(max_length=40)
+
+
+class Book(models.Model):
+    title = models.CharField(max_length=200, db_index=True)
+    summary = models.TextField(default="")
+    price = models.DecimalField(max_digits=8, decimal_places=2, default=0)
+    published = models.DateField(null=True)
+    inPrint = models.BooleanField(default=True)
+    author = models.ForeignKey(Author, on_delete=models.CASCADE, related_name="books")
+    tags = models.ManyToManyField(Tag, related_name="books", blank=True)
+
+
+class Review(models.Model):
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name="reviews")
+    rating = models.IntegerField()
+    body = models.TextField(default="")
+    createdAt = models.DateTimeField(auto_now_add=True)
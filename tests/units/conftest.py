@@ -0,0 +1,94 @@
+import os
+import sys
+
+import pytest
+
+# make the test django app importable
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from testapp import setup
+
+setup()
+
+
+@pytest.fixture(scope="session")
+def db():
+    """creates the test database tables once per session"""
+    from django.core.management import call_command
+
+    call_command("migrate", run_syncdb=True, verbosity=0)
+
+
+@pytest.fixture
+def library(db):
+    """a small library of books, rolled back after each test"""
+    from django.db import transaction
+    from testapp import models as app
+
+    with transaction.atomic():
+        publisher = app.Publisher.objects.create(name="Penguin")
+        authors = [
+            app.Author.objects.create(name=name, publisher=publisher)
+            for name in ("Achebe", "Adichie")
+        ]
+        tags = [app.Tag.objects.create(label=label) for label in ("novel", "classic")]
+
+        for i in range(6):
+            book = app.Book.objects.create(
+                title=f"Book {i}", price=i, author=authors[i % 2]
+            )
+            book.tags.set(tags[: i % 3])
+            for rating in range(i % 3):
+                app.Review.objects.create(book=book, rating=rating)
+
+        yield {"publisher": publisher, "authors": authors, "tags": tags}
+        transaction.set_rollback(True)
+
+
+@pytest.fixture
+def fullAccess():
+    """a permission function giving a role access to every column and operation"""
+    from uql.models import useFullPermissionAccess
+
+    return lambda _: useFullPermissionAccess()
+
+
+@pytest.fixture
+def exposeLibrary(fullAccess):
+    """returns a function exposing the library models, by name, with full access for
+    ANONYMOUS. options are given to every ExposedModel, modelOptions to the ExposedModel
+    of a model only"""
+    from testapp import models as app
+    from uql.models import ExposedModel
+
+    def expose(modelOptions: dict | None = None, **options) -> dict[str, ExposedModel]:
+        return {
+            model.__name__.lower(): ExposedModel(
+                model=model, **options, **(modelOptions or {}).get(model, {})
+            ).addPermission("ANONYMOUS", fullAccess)
+            for model in (app.Publisher, app.Author, app.Book, app.Tag, app.Review)
+        }
+
+    return expose
+
+
+@pytest.fixture
+def post():
+    """returns a function posting a body to a view of exposed models (viewOptions are
+    given to createUQLView) and decoding the response, or returning the response itself
+    with raw=True. Responses that aren't streamed are rendered"""
+    import json
+    from rest_framework.test import APIRequestFactory
+    from uql.views import createUQLView
+
+    def post(exposed: dict, body, raw: bool = False, **viewOptions):
+        view = createUQLView(
+            models=list(exposed.values()), functions=[], **viewOptions
+        ).as_view()
+        response = view(APIRequestFactory().post("/uql/", body, format="json"))
+
+        if not response.streaming:
+            response.render()
+        return response if raw else json.loads(response.content)
+
+    return post
@@ -0,0 +1,92 @@
+import io
+import os
+
+import pytest
+from django.core.management import call_command
+
+from uql.models.advisor import QueryRecorder
+from uql.models.advisor import readUsage
+from uql.models.advisor import recommendIndexes
+
+
+@pytest.fixture
+def findmany(exposeLibrary, post):
+    def findmany(recorder: QueryRecorder, where: dict, **args):
+        body = {
+            "intent": "models.testapp.book.findmany",
+            "fields": True,
+            "args": {"where": where, **args},
+        }
+        return post(exposeLibrary(), body, raw=True, queryRecorder=recorder)
+
+    return findmany
+
+
+def test_recorded_lookups(library, tmp_path, findmany):
+    path = str(tmp_path / "usage.jsonl")
+    recorder = QueryRecorder(path, flushEvery=2)
+
+    for _ in range(3):
+        findmany(recorder, {"author": {"name": {"_icontains": "a"}}})
+
+    # every other call is written
+    assert readUsage(path)[("testapp.book", "author__name__icontains")][0] == 2
+
+    findmany(recorder, {"title": {"_eq": "Book 1"}, "price": {"_gt": 1}})
+    recorder.flush()
+
+    usage = readUsage(path)
+    assert {lookup: calls for (_, lookup), (calls, _) in usage.items()} == {
+        "author__name__icontains": 3,
+        "title__exact": 1,
+        "price__gt": 1,
+    }
+
+    # the title is indexed
+    recommendations = {(r.model, r.column): r for r in recommendIndexes(usage)}
+    assert set(recommendations) == {
+        ("testapp.author", "name"),
+        ("testapp.book", "price"),
+    }
+
+    author = recommendations[("testapp.author", "name")]
+    assert (author.calls, author.reason) == (3, "no index")
+    assert author.lookups == ("testapp.book: author__name__icontains",)
+
+
+def test_streamed_lookups_are_recorded_once_streamed(library, tmp_path, findmany):
+    path = str(tmp_path / "usage.jsonl")
+    recorder = QueryRecorder(path, flushEvery=1)
+
+    response = findmany(recorder, {"price": {"_gt": 1}}, stream=True, chunkSize=2)
+    assert not os.path.exists(path)
+
+    b"".join(response.streaming_content)
+    assert readUsage(path)[("testapp.book", "price__gt")][0] == 1
+
+
+def test_recommendations_are_ranked_by_time():
+    usage = {
+        ("testapp.book", "summary__exact"): [10, 1.0],
+        ("testapp.book", "price__gt"): [2, 4.0],
+        ("testapp.review", "rating__in"): [20, 2.0],
+        ("testapp.book", "title__exact"): [100, 9.0],
+    }
+
+    assert [r.column for r in recommendIndexes(usage)] == ["price", "rating", "summary"]
+
+
+def test_index_recommendations_command(library, tmp_path, findmany):
+    path = str(tmp_path / "usage.jsonl")
+    recorder = QueryRecorder(path)
+
+    findmany(recorder, {"summary": {"_contains": "war"}, "title": {"_icontains": "a"}})
+    recorder.flush()
+
+    output = io.StringIO()
+    call_command("uqlindexes", path, stdout=output)
+    lines = output.getvalue().splitlines()
+
+    assert lines[0].startswith("1. testapp.book.")
+    assert "testapp.book.title (the index can't serve icontains)" in output.getvalue()
+    assert "testapp.book.summary (no index)" in output.getvalue()
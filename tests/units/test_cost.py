@@ -0,0 +1,71 @@
+import pytest
+from testapp import models as app
+
+from uql.models import useFullPermissionAccess
+from uql.models.cost import QueryCost
+from uql.models.cost import analyzeQuery
+from uql.models.cost import exceededLimits
+
+
+@pytest.mark.parametrize(
+    "where,cost",
+    [
+        ({"title": {"_eq": "a"}}, QueryCost(2, 0, 1, 0, 0, ())),
+        ({"id": {"_in": [1, 2, 3]}}, QueryCost(2, 0, 1, 0, 3, ())),
+        ({"summary": {"_regex": "^a"}}, QueryCost(2, 0, 1, 1, 0, ("summary",))),
+        # foreign keys are indexed, relations are compared by primary key
+        ({"author": {"_eq": 1}, "tags": {"_in": [1]}}, QueryCost(2, 0, 2, 0, 1, ())),
+        (
+            {"author": {"name": {"_eq": "a"}, "publisher__name": {"_eq": "b"}}},
+            QueryCost(3, 2, 2, 0, 0, ("author__name",)),
+        ),
+        (
+            {"_or": [{"price": {"_gt": 1}}, {"reviews": {"rating": {"_eq": 5}}}]},
+            QueryCost(4, 1, 2, 0, 0, ("price", "reviews__rating")),
+        ),
+        # transforms can't use the column's index
+        ({"id": {"abs": {"_eq": 1}}}, QueryCost(3, 0, 1, 0, 0, ("id__abs",))),
+    ],
+)
+def test_analyze_query(db, where, cost):
+    assert analyzeQuery(app.Book, where) == cost
+
+
+def test_exceeded_limits(db):
+    cost = analyzeQuery(
+        app.Book,
+        {"author": {"name": {"_regex": "^A"}}, "id": {"_in": [1, 2]}},
+    )
+
+    assert exceededLimits(cost, {}) == []
+    assert exceededLimits(cost, {"maxDepth": 3, "maxJoins": 1, "maxInSize": 2}) == []
+    assert len(exceededLimits(cost, {"maxJoins": 0, "allowRegex": False})) == 2
+    assert exceededLimits(cost, {"allowUnindexed": False}) == [
+        "filters columns without an index: author__name"
+    ]
+
+
+def test_findmany_rejects_queries_over_budget(library, exposeLibrary, post):
+    exposed = exposeLibrary()
+    exposed["book"].addPermission(
+        "ANONYMOUS",
+        lambda _: {
+            **useFullPermissionAccess(),
+            "select": {
+                "column": "ALL_COLUMNS",
+                "row": "ALL_ROWS",
+                "budget": {"maxJoins": 1, "allowUnindexed": False},
+            },
+        },
+    )
+    body = {
+        "intent": "models.testapp.book.findmany",
+        "fields": {"title": True},
+        "args": {"where": {"title": {"_eq": "Book 1"}}},
+    }
+    assert post(exposed, body)["data"] == [{"title": "Book 1"}]
+
+    body["args"]["where"] = {"author": {"publisher": {"name": {"_eq": "Penguin"}}}}
+    error = post(exposed, body)["error"]
+    assert error["errorCode"] == "UQL:QUERY_OVER_BUDGET"
+    assert "2 relations" in error["summary"]
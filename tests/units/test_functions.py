@@ -0,0 +1,93 @@
+import pytest
+from django.core.exceptions import ValidationError
+from rest_framework.permissions import BasePermission
+
+from uql.utils import dto
+from uql.exceptions import RequestHandlingError
+from uql.functions import ApiFunction, LazyApiFunction
+
+
+class CountingPermission(BasePermission):
+    instances = 0
+
+    def __init__(self) -> None:
+        CountingPermission.instances += 1
+
+    def has_permission(self, request, view):
+        return request == "allowed"
+
+
+def echo(request, args):
+    return args
+
+
+def test_pipeline_validates_and_checks_permissions():
+    function = ApiFunction(
+        echo,
+        rule=dto.Dictionary({"value": dto.Number()}),
+        permission_classes=[lambda request: request != "banned", CountingPermission],
+    )
+    created = CountingPermission.instances
+
+    assert function("allowed", {"value": 1}) == {"value": 1}
+    assert function("allowed", {"value": 2}) == {"value": 2}
+    assert CountingPermission.instances == created
+
+    with pytest.raises(ValueError):
+        function("allowed", {"value": "one"})
+
+    with pytest.raises(ValidationError):
+        function("banned", {"value": 1})
+
+    with pytest.raises(ValidationError):
+        function("anonymous", {"value": 1})
+
+
+def test_invalid_permission_is_rejected_on_registration():
+    with pytest.raises(ValueError):
+        ApiFunction(echo, permission_classes=[object])
+
+
+def test_execute_projects_output():
+    function = ApiFunction(echo)
+    args = {"a": 1, "b": {"c": 2, "d": 3}}
+
+    assert function.execute(None, args, {"b": {"c": True}}) == {"b": {"c": 2}}
+    assert function.execute(None, args, True) == args
+    assert function.execute(None, args, None) is None
+
+    with pytest.raises(RequestHandlingError):
+        ApiFunction(lambda request, args: 1, name="one").execute(None, {}, True)
+
+
+def test_lazy_function_is_created_once():
+    calls = []
+
+    def factory():
+        calls.append(1)
+        return ApiFunction(echo)
+
+    stub = LazyApiFunction(factory)
+    assert stub.execute(None, {"a": 1}, True) == {"a": 1}
+    assert stub(None, {"a": 2}) == {"a": 2}
+    assert stub.name == "echo"
+    assert len(calls) == 1
+
+
+def test_lazy_function_flags_dont_create_it():
+    stub = LazyApiFunction(lambda: ApiFunction(echo, pure=True), pure=True)
+    assert stub.pure and not stub.selectsFields
+    assert not stub.materialized
+
+
+def test_model_intent_flags_match_their_functions():
+    from testapp import models as app
+    from uql.views import createUQLView
+    from uql.models import ExposedModel, ModelOperations
+
+    exposed = ExposedModel(model=app.Book, operations=list(ModelOperations))
+    root = createUQLView(models=[exposed], functions=[]).getSharedRoot()
+
+    for stub in root.values():
+        flags = (stub.pure, stub.selectsFields)
+        assert flags == (stub.function.pure, stub.function.selectsFields)
@@ -0,0 +1,551 @@
+import json
+
+import pytest
+from django.db import connection
+from django.db.models import Q
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory
+from testapp import models as app
+
+from uql.views import createUQLView
+from uql.utils.query import Parameter
+from uql.models import ExposedModel, ModelOperations, useFullPermissionAccess
+
+
+def test_findmany_relations_are_loaded_in_fixed_queries(library, exposeLibrary, post):
+    exposed = exposeLibrary()
+    body = {
+        "intent": "models.testapp.book.findmany",
+        "fields": True,
+        "args": {"where": {}},
+    }
+
+    with CaptureQueriesContext(connection) as queries:
+        data = post(exposed, body)["data"]
+
+    assert len(data) == 6
+    assert data[0]["author"]["publisher"]["name"] == "Penguin"
+    # books joined with authors and publishers, then the tags
+    assert len(queries) == 2
+
+
+def test_prefetched_relations_honor_row_permissions(library, exposeLibrary, post):
+    exposed = exposeLibrary()
+    exposed["author"].addPermission(
+        "ANONYMOUS",
+        lambda _: {
+            **useFullPermissionAccess(),
+            "select": {"column": ["id", "name", "books"], "row": "ALL_ROWS"},
+        },
+    )
+    exposed["book"].addPermission(
+        "ANONYMOUS",
+        lambda _: {
+            **useFullPermissionAccess(),
+            "select": {"column": ["id", "title"], "row": Q(price__gte=2)},
+        },
+    )
+
+    body = {
+        "intent": "models.testapp.author.findmany",
+        "fields": True,
+        "args": {"where": {}},
+    }
+
+    with CaptureQueriesContext(connection) as queries:
+        data = post(exposed, body)["data"]
+
+    assert len(queries) == 2
+    assert [book["title"] for book in data[0]["books"]] == ["Book 2", "Book 4"]
+
+    # written rows are serialized with the same relations
+    achebe = app.Author.objects.get(name="Achebe")
+    body = {
+        "intent": "models.testapp.author.update",
+        "fields": True,
+        "args": {"partial": {"pk": achebe.pk, "fields": {"name": "Chinua Achebe"}}},
+    }
+    data = post(exposed, body)["data"]
+    assert [book["title"] for book in data["books"]] == ["Book 2", "Book 4"]
+
+    body = {
+        "intent": "models.testapp.author.insert",
+        "fields": True,
+        "args": {"object": {"name": "Soyinka"}},
+    }
+    assert post(exposed, body)["data"]["books"] == []
+
+
+def test_findmany_only_fetches_selected_fields(library, exposeLibrary, post):
+    exposed = exposeLibrary()
+    body = {
+        "intent": "models.testapp.book.findmany",
+        "fields": {"title": True, "author": {"name": True}},
+        "args": {"where": {"price": {"_lt": 2}}},
+    }
+
+    with CaptureQueriesContext(connection) as queries:
+        data = post(exposed, body)["data"]
+
+    assert data == [
+        {"title": "Book 0", "author": {"name": "Achebe"}},
+        {"title": "Book 1", "author": {"name": "Adichie"}},
+    ]
+
+    # one query, without the unselected columns and relations
+    assert len(queries) == 1
+    sql = queries[0]["sql"]
+    assert '"testapp_author"."name"' in sql
+    assert not ('"testapp_book"."summary"' in sql or "testapp_publisher" in sql)
+
+
+def test_find_without_fields_only_checks_existence(library, exposeLibrary, post):
+    exposed = exposeLibrary()
+    book = app.Book.objects.first()
+    body = {"intent": "models.testapp.book.find", "args": {"pk": book.pk}}
+
+    response = post(exposed, body)
+    assert response["data"] is None and response["error"] is None
+
+    body["args"]["pk"] = 10_000
+    assert post(exposed, body)["error"]["errorCode"] == "DoesNotExist"
+
+
+@pytest.mark.parametrize("fastSerialization", [False, True])
+def test_serialized_columns_follow_the_users_permission(
+    library, fastSerialization, exposeLibrary, post
+):
+    from types import SimpleNamespace
+    from rest_framework.test import force_authenticate
+
+    def permission(userId):
+        column = ["id", "title", "price"] if userId == 7 else ["id", "title"]
+        return {
+            **useFullPermissionAccess(),
+            "select": {"column": column, "row": "ALL_ROWS"},
+        }
+
+    exposed = exposeLibrary(fastSerialization=fastSerialization)
+    exposed["book"].addPermission("USER", permission)
+    view = createUQLView(
+        models=list(exposed.values()), functions=[], userRoleFactory=lambda _: "USER"
+    ).as_view()
+    body = {"intent": "models.testapp.book.findmany", "fields": True, "args": {}}
+
+    def keys(user) -> list[str]:
+        request = APIRequestFactory().post("/uql/", body, format="json")
+        force_authenticate(request, user=user)
+        response = view(request)
+        response.render()
+        return list(json.loads(response.content)["data"][0])
+
+    # the serializer reads the columns of the permission bound to the user
+    assert keys(SimpleNamespace(pk=7, is_authenticated=True)) == [
+        "id",
+        "title",
+        "price",
+    ]
+    assert keys(SimpleNamespace(pk=8, is_authenticated=True)) == ["id", "title"]
+
+
+def test_repeated_related_objects_are_serialized_once(library, exposeLibrary):
+    from rest_framework.request import Request
+
+    exposed = exposeLibrary()
+    View = createUQLView(models=list(exposed.values()), functions=[])
+    findMany = View.getSharedRoot()["models.testapp.book.findmany"]
+    request = Request(APIRequestFactory().post("/uql/"))
+
+    data = findMany(request, {"where": {}})
+
+    # books 0, 2 and 4 share an author, the author is serialized for the first
+    assert data[0]["author"]["name"] == "Achebe"
+    assert data[0]["author"] is data[2]["author"] is data[4]["author"]
+    assert data[0]["author"]["publisher"] is data[1]["author"]["publisher"]
+
+
+def test_normalized_findmany(library, exposeLibrary, post):
+    exposed = exposeLibrary()
+    body = {
+        "intent": "models.testapp.book.findmany",
+        "fields": {"title": True, "author": {"name": True, "publisher": True}},
+        "args": {"where": {}, "normalize": True},
+    }
+
+    response = post(exposed, body)
+    authors = library["authors"]
+    publisher = library["publisher"]
+
+    assert [book["author"] for book in response["data"]] == [
+        authors[i % 2].pk for i in range(6)
+    ]
+    assert response["included"] == {
+        "testapp.author": {
+            str(authors[0].pk): {"name": "Achebe", "publisher": publisher.pk},
+            str(authors[1].pk): {"name": "Adichie", "publisher": publisher.pk},
+        },
+        "testapp.publisher": {
+            str(publisher.pk): {"id": publisher.pk, "name": "Penguin"}
+        },
+    }
+
+    # outputs that aren't normalized have no side table
+    body["args"]["normalize"] = False
+    assert not ("included" in post(exposed, body))
+
+
+def stream(post, exposed: dict[str, ExposedModel], body) -> tuple[bool, bytes]:
+    response = post(exposed, body, raw=True)
+
+    if response.streaming:
+        return True, b"".join(response.streaming_content)
+    return False, response.content
+
+
+@pytest.mark.parametrize("normalize", [False, True])
+def test_streamed_findmany_matches_the_regular_response(
+    library, normalize, exposeLibrary, post
+):
+    exposed = exposeLibrary()
+    body = {
+        "intent": "models.testapp.book.findmany",
+        "fields": {"title": True, "author": {"name": True}, "tags": True},
+        "args": {"where": {}, "normalize": normalize},
+    }
+    _, regular = stream(post, exposed, body)
+
+    body["args"].update(stream=True, chunkSize=4)
+
+    with CaptureQueriesContext(connection) as queries:
+        streamed, content = stream(post, exposed, body)
+
+    assert streamed
+    assert json.loads(content) == json.loads(regular)
+    if not normalize:
+        assert content == regular
+
+    # the books are read with one query, and the tags prefetched for each chunk of 4 books
+    assert len(queries) == 3
+
+
+def test_streamed_intents_cant_be_batched(library, exposeLibrary, post):
+    exposed = exposeLibrary()
+    cell = {
+        "intent": "models.testapp.book.findmany",
+        "fields": True,
+        "args": {"where": {}, "stream": True},
+    }
+
+    _, content = stream(post, exposed, [cell])
+    assert json.loads(content)["error"]["errorCode"] == "UQL:INVALID_REQUEST_BODY"
+
+
+def test_prepared_findmany(library, exposeLibrary, post):
+    exposed = exposeLibrary()
+    exposed["book"].addPreparedQuery(
+        "byAuthor",
+        {"author": {"name": {"_eq": Parameter("author")}}, "price": {"_gte": 2}},
+    )
+    body = {
+        "intent": "models.testapp.book.findmany",
+        "fields": {"title": True},
+        "args": {"query": "byAuthor", "params": {"author": "Achebe"}},
+    }
+
+    assert post(exposed, body)["data"] == [{"title": "Book 2"}, {"title": "Book 4"}]
+
+    # a where structure narrows the prepared query
+    body["args"]["where"] = {"price": {"_lt": 3}}
+    assert post(exposed, body)["data"] == [{"title": "Book 2"}]
+
+
+def test_prepared_findmany_params_are_converted(library, exposeLibrary, post):
+    exposed = exposeLibrary()
+    exposed["book"].addPreparedQuery(
+        "cheap",
+        {
+            "price": {"_lte": Parameter("price")},
+            "author": {"_in": Parameter("authors")},
+        },
+    )
+    authors = [str(author.pk) for author in library["authors"]]
+    body = {
+        "intent": "models.testapp.book.findmany",
+        "fields": {"title": True},
+        "args": {"query": "cheap", "params": {"price": "1", "authors": authors}},
+    }
+    assert post(exposed, body)["data"] == [{"title": "Book 0"}, {"title": "Book 1"}]
+
+    for params in (
+        {"price": "cheap", "authors": authors},
+        {"price": 1, "authors": authors[0]},
+        {"price": 1, "authors": ["first"]},
+    ):
+        body["args"]["params"] = params
+        response = post(exposed, body, raw=True)
+        assert response.status_code == 400
+        assert response.data["error"]["errorCode"] == "UQL:INVALID_REQUEST_BODY"
+
+
+@pytest.mark.parametrize(
+    "args,errorCode",
+    [
+        ({"query": "byTitle", "params": {}}, "UQL:INEXISTENT_QUERY"),
+        ({"query": "byAuthor", "params": {}}, "UQL:MISSING_REQUIRED_ARGUMENT"),
+        (
+            {"query": "byAuthor", "params": {"author": "Achebe", "title": "x"}},
+            "UQL:UNKNOWN_ARGS",
+        ),
+    ],
+)
+def test_prepared_findmany_errors(library, args, errorCode, exposeLibrary, post):
+    exposed = exposeLibrary()
+    exposed["book"].addPreparedQuery(
+        "byAuthor", {"author": {"name": {"_eq": Parameter("author")}}}
+    )
+    body = {"intent": "models.testapp.book.findmany", "fields": True, "args": args}
+
+    assert post(exposed, body)["error"]["errorCode"] == errorCode
+
+
+def test_paginated_findmany(library, exposeLibrary, post):
+    exposed = exposeLibrary()
+    body = {
+        "intent": "models.testapp.book.findmany",
+        "fields": {"title": True},
+        "args": {"orderBy": ["-title"], "paginate": True, "limit": 2},
+    }
+
+    def page(**cursor) -> tuple[list[str], dict]:
+        with CaptureQueriesContext(connection) as queries:
+            response = post(exposed, {**body, "args": {**body["args"], **cursor}})
+
+        # the sort keys of the page, whether there are rows behind the cursor, then the rows
+        assert len(queries) == (3 if cursor else 2)
+        return [book["title"] for book in response["data"]], response["pageInfo"]
+
+    titles, first = page()
+    assert titles == ["Book 5", "Book 4"]
+    assert (first["hasPreviousPage"], first["hasNextPage"]) == (False, True)
+
+    titles, second = page(after=first["endCursor"])
+    assert titles == ["Book 3", "Book 2"]
+
+    titles, last = page(after=second["endCursor"])
+    assert titles == ["Book 1", "Book 0"]
+    assert (last["hasPreviousPage"], last["hasNextPage"]) == (True, False)
+
+    titles, previous = page(before=second["startCursor"])
+    assert titles == ["Book 5", "Book 4"]
+    assert previous == first
+
+    # rows inserted before the cursor don't shift the next pages
+    app.Book.objects.create(title="Book 9", price=9, author=library["authors"][0])
+    assert page(after=second["endCursor"])[0] == ["Book 1", "Book 0"]
+
+    # the rows of a cursor can be deleted, the pages around it are still found
+    app.Book.objects.filter(title__in=["Book 1", "Book 0"]).delete()
+    titles, previous = page(before=last["startCursor"])
+    assert titles == ["Book 3", "Book 2"]
+    assert (previous["hasPreviousPage"], previous["hasNextPage"]) == (True, False)
+
+
+@pytest.mark.parametrize(
+    "args,errorCode",
+    [
+        ({"orderBy": ["price"]}, "UQL:INVALID_ORDERING"),
+        ({"orderBy": ["rating"]}, "UQL:INVALID_ORDERING"),
+        ({"orderBy": ["title"], "after": "bm90IGEgY3Vyc29y"}, "UQL:INVALID_CURSOR"),
+        ({"offset": 1}, "UQL:INVALID_REQUEST_BODY"),
+    ],
+)
+def test_paginated_findmany_errors(library, args, errorCode, exposeLibrary, post):
+    body = {
+        "intent": "models.testapp.book.findmany",
+        "fields": True,
+        "args": {"paginate": True, "limit": 2, **args},
+    }
+    assert post(exposeLibrary(), body)["error"]["errorCode"] == errorCode
+
+
+def test_aggregate(library, exposeLibrary, post):
+    exposed = exposeLibrary(
+        operations=[*ModelOperations.all(), ModelOperations.AGGREGATE]
+    )
+    achebe, adichie = library["authors"]
+    body = {
+        "intent": "models.testapp.book.aggregate",
+        "fields": True,
+        "args": {"count": ["*"], "sum": ["price"], "groupBy": ["author"]},
+    }
+
+    with CaptureQueriesContext(connection) as queries:
+        data = post(exposed, body)["data"]
+
+    assert len(queries) == 1
+    assert data == [
+        {"group": {"author": achebe.pk}, "count": {"*": 3}, "sum": {"price": 6}},
+        {"group": {"author": adichie.pk}, "count": {"*": 3}, "sum": {"price": 9}},
+    ]
+
+    body["args"] = {"where": {"price": {"_gte": 2}}, "count": ["*"], "max": ["title"]}
+    assert post(exposed, body)["data"] == {
+        "count": {"*": 4},
+        "max": {"title": "Book 5"},
+    }
+
+    # only numbers are summed and averaged
+    for function in ("sum", "avg"):
+        body["args"] = {function: ["title"]}
+        response = post(exposed, body)
+        assert response["statusCode"] == 400
+        assert response["error"]["errorCode"] == "UQL:UNKNOWN_ARGS"
+
+    # aggregate is only published when it's listed in the model's operations
+    response = post(exposeLibrary(), body)
+    assert response["error"]["errorCode"] == "UQL:INEXISTENT_INTENT"
+
+
+def test_aggregate_honors_select_permission(library, exposeLibrary, post):
+    exposed = exposeLibrary(operations=[ModelOperations.AGGREGATE])
+    exposed["book"].addPermission(
+        "ANONYMOUS",
+        lambda _: {
+            **useFullPermissionAccess(),
+            "select": {"column": ["id", "title"], "row": Q(price__lt=2)},
+        },
+    )
+    body = {
+        "intent": "models.testapp.book.aggregate",
+        "fields": True,
+        "args": {"count": ["*"]},
+    }
+    assert post(exposed, body)["data"] == {"count": {"*": 2}}
+
+    body["args"] = {"sum": ["price"]}
+    assert post(exposed, body)["error"]["errorCode"] == "PermissionError"
+
+    body["args"] = {"count": ["*"], "groupBy": ["price"]}
+    assert post(exposed, body)["error"]["errorCode"] == "PermissionError"
+
+
+def test_exists_and_count(library, exposeLibrary, post):
+    exposed = exposeLibrary(operations=[ModelOperations.EXISTS, ModelOperations.COUNT])
+    exposed["book"].addPermission(
+        "ANONYMOUS",
+        lambda _: {
+            **useFullPermissionAccess(),
+            "select": {"column": ["id", "title"], "row": Q(price__lt=4)},
+        },
+    )
+
+    def call(intent: str, where: dict):
+        body = {
+            "intent": f"models.testapp.book.{intent}",
+            "fields": True,
+            "args": {"where": where},
+        }
+
+        with CaptureQueriesContext(connection) as queries:
+            data = post(exposed, body)["data"]
+
+        assert len(queries) == 1
+        return data, queries[0]["sql"]
+
+    data, sql = call("count", {"author": {"name": {"_eq": "Achebe"}}})
+    assert data == {"count": 2} and "COUNT(*)" in sql
+
+    data, sql = call("exists", {"title": {"_eq": "Book 3"}})
+    assert data == {"exists": True} and "LIMIT 1" in sql
+
+    # rows the role can't select don't exist
+    assert call("exists", {"title": {"_eq": "Book 5"}})[0] == {"exists": False}
+    assert call("count", {})[0] == {"count": 4}
+
+    # they're only published when they're listed in the model's operations
+    for intent in ("exists", "count"):
+        body = {"intent": f"models.testapp.book.{intent}", "fields": True}
+        response = post(exposeLibrary(), body)
+        assert response["error"]["errorCode"] == "UQL:INEXISTENT_INTENT"
+
+
+def test_ordered_findmany(library, exposeLibrary, post):
+    exposed = exposeLibrary()
+    app.Book.objects.filter(title__in=["Book 1", "Book 4"]).update(
+        published="2000-01-01"
+    )
+    body = {
+        "intent": "models.testapp.book.findmany",
+        "fields": {"title": True},
+        "args": {"orderBy": [{"column": "published", "nulls": "first"}, "-price"]},
+    }
+    titles = lambda: [book["title"] for book in post(exposed, body)["data"]]
+
+    assert titles() == ["Book 5", "Book 3", "Book 2", "Book 0", "Book 4", "Book 1"]
+
+    body["args"]["orderBy"][0]["nulls"] = "last"
+    assert titles() == ["Book 4", "Book 1", "Book 5", "Book 3", "Book 2", "Book 0"]
+
+
+def test_ordering_is_validated(library, exposeLibrary, post):
+    exposed = exposeLibrary()
+    exposed["book"].addPermission(
+        "ANONYMOUS",
+        lambda _: {
+            **useFullPermissionAccess(),
+            "select": {"column": ["id", "title", "price"], "row": "ALL_ROWS"},
+        },
+    )
+    body = {
+        "intent": "models.testapp.book.findmany",
+        "fields": {"title": True},
+        "args": {"orderBy": ["summary"]},
+    }
+    assert post(exposed, body)["error"]["errorCode"] == "PermissionError"
+
+    # strict ordering only allows orderings an index can read the rows in
+    exposed["book"].strictOrdering = True
+
+    body["args"]["orderBy"] = ["price"]
+    assert post(exposed, body)["error"]["errorCode"] == "UQL:INVALID_ORDERING"
+
+    body["args"]["orderBy"] = ["-title", "id"]
+    assert post(exposed, body)["data"][0] == {"title": "Book 5"}
+
+
+def test_role_and_permissions_are_resolved_once_per_request(
+    library, exposeLibrary, post
+):
+    calls = {"role": 0, "book": 0, "author": 0}
+
+    def role(user) -> str:
+        calls["role"] += 1
+        return "ANONYMOUS"
+
+    def permission(name: str):
+        def permissionFunction(userId):
+            calls[name] += 1
+            return useFullPermissionAccess()
+
+        return permissionFunction
+
+    exposed = exposeLibrary(operations=[*ModelOperations.all(), ModelOperations.COUNT])
+    exposed["book"].addPermission("ANONYMOUS", permission("book"))
+    exposed["author"].addPermission("ANONYMOUS", permission("author"))
+
+    cells = [
+        {"intent": "models.testapp.book.findmany", "fields": True, "args": {}},
+        {"intent": "models.testapp.book.count", "fields": True, "args": {}},
+        {"intent": "models.testapp.author.findmany", "fields": True, "args": {}},
+    ]
+
+    def send():
+        response = post(exposed, cells, userRoleFactory=role)
+        assert [cell["error"] for cell in response] == [None] * 3
+
+    # the serializer classes are created (and cached for the next requests) on the first request
+    send()
+    calls.update(role=0, book=0, author=0)
+
+    send()
+    assert calls == {"role": 1, "book": 1, "author": 1}
@@ -1,6 +1,8 @@
 import pytest
 from django.db.models import Q
 from uql.utils.query import makeQuery
+from uql.utils.query import queryCacheInfo
+from uql.utils.query import clearQueryCache
 
 # Test cases for makeQuery function
 test_cases = [
@@ -105,3 +107,21 @@ test_cases = [
 @pytest.mark.parametrize("query,expected", test_cases)
 def test_make_query(query, expected):
     assert makeQuery(query) == expected
+
+
+def test_query_shapes_are_compiled_once():
+    clearQueryCache()
+    query = lambda a, b: {
+        "a": {"_gt": a},
+        "_or": [{"b": {"_eq": b}}, {"c": {"_in": [a]}}],
+    }
+
+    assert makeQuery(query(1, 2)) == Q(a__gt=1) & (Q(b=2) | Q(c__in=[1]))
+    assert makeQuery(query(3, 4)) == Q(a__gt=3) & (Q(b=4) | Q(c__in=[3]))
+
+    info = queryCacheInfo()
+    assert (info.hits, info.misses) == (1, 1)
+
+    # a different shape is compiled on it's own
+    makeQuery({"a": {"_lt": 1}})
+    assert queryCacheInfo().misses == 2
@@ -0,0 +1,213 @@
+import pytest
+from django.db import models
+from django.db import connection
+from django.db.models import Q
+from testapp import models as app
+
+from uql.utils.query import makeQuery
+from uql.models import ExposedModel
+from uql.models.search import SearchLookup
+from uql.models.search import buildSearchIndex
+from uql.models.search import dropSearchIndex
+
+SUMMARIES = [
+    "A village wrestler and the arrival of missionaries",
+    "A family in Enugu, a purple hibiscus",
+    "The end of an era in a village",
+    "Half of a yellow sun over Biafra",
+    "A man of the people",
+    "Americanah, a love story across oceans",
+]
+
+
+@pytest.fixture
+def titles(post):
+    def titles(exposed: dict[str, ExposedModel], args: dict) -> list[str]:
+        body = {
+            "intent": "models.testapp.book.findmany",
+            "fields": {"title": True},
+            "args": args,
+        }
+        return [book["title"] for book in post(exposed, body)["data"]]
+
+    return titles
+
+
+@pytest.fixture(params=["indexed", "unindexed"])
+def exposed(library, request, exposeLibrary):
+    """the library exposed with searchable books and authors, searched with and without an index"""
+    exposed = exposeLibrary(
+        {
+            app.Book: {"searchFields": ["title", "summary"]},
+            app.Author: {"searchFields": ["name"]},
+        }
+    )
+
+    for i, summary in enumerate(SUMMARIES):
+        app.Book.objects.filter(title=f"Book {i}").update(summary=summary)
+
+    if request.param == "indexed":
+        buildSearchIndex(app.Book)
+        buildSearchIndex(app.Author)
+
+    yield exposed
+
+    dropSearchIndex(app.Book)
+    dropSearchIndex(app.Author)
+
+
+def test_search(exposed, titles):
+    assert sorted(titles(exposed, {"where": {"_search": "village"}})) == [
+        "Book 0",
+        "Book 2",
+    ]
+
+    # every word has to match, in any of the fields
+    assert titles(exposed, {"where": {"_search": "book village era"}}) == ["Book 2"]
+
+    # combined with other criteria, and searched through relations
+    where = {"_search": "village", "author": {"_search": "adichie"}}
+    assert titles(exposed, {"where": where}) == []
+
+    where = {"_or": [{"_search": "sun"}, {"author": {"_search": "achebe"}}]}
+    assert sorted(titles(exposed, {"where": where})) == [
+        "Book 0",
+        "Book 2",
+        "Book 3",
+        "Book 4",
+    ]
+
+
+def test_search_index_follows_saves(exposed, titles):
+    book = app.Book.objects.create(
+        title="Things Fall Apart", author=app.Author.objects.get(name="Achebe")
+    )
+    assert titles(exposed, {"where": {"_search": "things apart"}}) == [
+        "Things Fall Apart"
+    ]
+
+    book.title = "No Longer at Ease"
+    book.save()
+    assert titles(exposed, {"where": {"_search": "things"}}) == []
+    assert titles(exposed, {"where": {"_search": "ease"}}) == ["No Longer at Ease"]
+
+    book.delete()
+    assert titles(exposed, {"where": {"_search": "ease"}}) == []
+
+
+def test_search_index_built_elsewhere_is_maintained(library, exposeLibrary, titles):
+    exposed = exposeLibrary({app.Book: {"searchFields": ["title", "summary"]}})
+    assert titles(exposed, {"where": {"_search": "things"}}) == []
+
+    # the index is built by another process, once this one already searched
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'CREATE VIRTUAL TABLE "uql_search_testapp_book" USING fts5("title", "summary")'
+        )
+
+    book = app.Book.objects.create(
+        title="Things Fall Apart", author=library["authors"][0]
+    )
+    assert titles(exposed, {"where": {"_search": "things"}}) == ["Things Fall Apart"]
+
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT rowid FROM "uql_search_testapp_book"')
+        assert cursor.fetchall() == [(book.pk,)]
+
+    dropSearchIndex(app.Book)
+
+
+def test_unindexed_search_escapes_wildcards(exposed, request, titles):
+    if request.node.callspec.params["exposed"] == "indexed":
+        pytest.skip("fts5 doesn't read % and _ as wildcards")
+
+    app.Book.objects.filter(title="Book 1").update(summary="50% off the first_edition")
+
+    assert titles(exposed, {"where": {"_search": "%"}}) == ["Book 1"]
+    assert titles(exposed, {"where": {"_search": "first_"}}) == ["Book 1"]
+    assert titles(exposed, {"where": {"_search": "a_village"}}) == []
+
+
+def test_search_ordering(exposed, request, titles):
+    indexed = request.node.callspec.params["exposed"] == "indexed"
+    args = {"where": {"_search": "village"}, "orderBy": [{"search": "village era"}]}
+
+    # without an index every row ranks the same
+    if indexed:
+        assert titles(exposed, args)[0] == "Book 2"
+
+    args = {"orderBy": [{"search": "village"}, "-price"], "limit": 3}
+    ranked = titles(exposed, args)
+
+    if indexed:
+        assert sorted(ranked[:2]) == ["Book 0", "Book 2"] and ranked[2] == "Book 5"
+    else:
+        assert ranked == ["Book 5", "Book 4", "Book 3"]
+
+
+def test_search_errors(exposed, post):
+    body = {
+        "intent": "models.testapp.review.findmany",
+        "fields": True,
+        "args": {"where": {"_search": "good"}},
+    }
+    assert post(exposed, body)["error"]["errorCode"] == "UQL:UNKNOWN_ARGS"
+
+    body["args"] = {"orderBy": [{"search": "good"}]}
+    assert post(exposed, body)["error"]["errorCode"] == "UQL:UNKNOWN_ARGS"
+
+    body = {
+        "intent": "models.testapp.book.findmany",
+        "fields": True,
+        "args": {"orderBy": [{"search": "village"}], "paginate": True, "limit": 2},
+    }
+    assert post(exposed, body)["error"]["errorCode"] == "UQL:INVALID_ORDERING"
+
+    # blank texts are rejected, with or without an index
+    for args in ({"where": {"_search": ""}}, {"where": {"_search": "  "}}):
+        body["args"] = args
+        response = post(exposed, body)
+        assert response["statusCode"] == 400
+        assert response["error"]["errorCode"] == "UQL:INVALID_REQUEST_BODY"
+
+    body["args"] = {"orderBy": [{"search": " "}]}
+    assert post(exposed, body)["error"]["errorCode"] == "UQL:INVALID_REQUEST_BODY"
+
+    # _search is placed on the model or a relation, not on a column
+    for where in (
+        {"title": {"_search": "village"}},
+        {"author": {"name": {"_search": "achebe"}}},
+        {"_or": [{"_search": "sun"}, {"price__gt": {"_search": "sun"}}]},
+    ):
+        body["args"] = {"where": where}
+        response = post(exposed, body)
+        assert response["statusCode"] == 400
+        assert response["error"]["errorCode"] == "UQL:INVALID_REQUEST_BODY"
+
+    body["args"] = {"where": {"reviews": {"_search": "good"}}}
+    assert post(exposed, body)["error"]["errorCode"] == "UQL:UNKNOWN_ARGS"
+
+
+def test_search_lookup(exposed):
+    assert makeQuery({"_search": "a"}) == Q(pk__uqlsearch="a")
+
+    # the lookup is only registered on the primary keys of searchable models
+    assert app.Book._meta.pk.get_lookup("uqlsearch") is SearchLookup
+    assert app.Book._meta.get_field("title").get_lookup("uqlsearch") is None
+    assert makeQuery({"author": {"_search": "a"}}) == Q(author__pk__uqlsearch="a")
+
+
+def test_searched_models_have_integer_keys():
+    isbn = type(
+        "Isbn",
+        (models.Model,),
+        {
+            "__module__": "testapp.models",
+            "Meta": type("Meta", (), {"app_label": "testapp", "managed": False}),
+            "isbn": models.CharField(max_length=13, primary_key=True),
+            "title": models.CharField(max_length=200),
+        },
+    )
+
+    with pytest.raises(TypeError):
+        ExposedModel(model=isbn, searchFields=["title"])
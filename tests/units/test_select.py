@@ -1,4 +1,8 @@
+import pytest
+
+from uql.utils.select import project
 from uql.utils.select import selectKeys
+from uql.utils.select import compileProjector
 
 data = {
     "name": {
@@ -13,3 +17,54 @@ def test_selectkeys():
     assert {"name": {"common": data["name"]["common"]}} == selectKeys(
         data, {"name": {"common": True}}
     )
+
+
+rows = [
+    {
+        "id": i,
+        "title": f"Book {i}",
+        "author": {
+            "id": 1,
+            "name": "Achebe",
+            "publisher": {"id": 1, "name": "Penguin"},
+        },
+        "tags": [{"id": 1, "label": "classic"}, 2],
+        "price": None,
+    }
+    for i in range(3)
+]
+
+
+@pytest.mark.parametrize(
+    "fields",
+    [
+        True,
+        None,
+        {"title": True},
+        {"price": {"amount": True}, "tags": True},
+        {"author": {"name": True, "publisher": {"name": True}}, "id": False},
+        {"tags": {"label": True}, "title": 1},
+    ],
+)
+def test_compiled_projector(fields):
+    projector = compileProjector(fields)
+    expected = (
+        None
+        if not fields
+        else rows
+        if fields is True
+        else [selectKeys(row, fields) for row in rows]
+    )
+
+    assert projector(rows) == expected
+    # the keys are kept in the order of the structure
+    assert [list(row) for row in projector(rows) or []] == [
+        list(row) for row in expected or []
+    ]
+    assert projector(rows[0]) == (expected[0] if expected else None)
+    assert project(rows, fields) == expected
+
+
+def test_compiled_projector_requires_keys():
+    with pytest.raises(KeyError):
+        compileProjector({"summary": False})(rows)
@@ -0,0 +1,44 @@
+from testapp import models as app
+
+from uql.models import ExposedModel
+from uql.models import serializers
+from uql.models.meta import getModelMeta
+
+
+def test_serializer_classes_are_cached(fullAccess):
+    author = ExposedModel(model=app.Author).addPermission("USER", fullAccess)
+    book = ExposedModel(model=app.Book).addPermission("USER", fullAccess)
+
+    sr = book.getSerializerClass("USER")
+    assert book.getSerializerClass("USER") is sr
+
+    # nested serializers come from the cache too
+    nested = sr().fields["author"]
+    assert type(nested) is type(sr().fields["author"])
+
+    # changing a role's permission drops it's classes
+    author.addPermission("USER", fullAccess)
+    assert book.getSerializerClass("USER") is not sr
+
+
+def test_serializer_cache_is_bounded(monkeypatch, fullAccess):
+    monkeypatch.setattr(serializers, "SERIALIZER_CACHE_SIZE", 2)
+    tag = ExposedModel(model=app.Tag).addPermission(["A", "B", "C"], fullAccess)
+
+    first = tag.getSerializerClass("A")
+    tag.getSerializerClass("B")
+    tag.getSerializerClass("C")
+
+    assert len(serializers._serializerCache) == 2
+    assert tag.getSerializerClass("A") is not first
+
+
+def test_model_meta_index():
+    meta = getModelMeta(app.Book)
+
+    assert getModelMeta(app.Book) is meta
+    assert list(meta.fields) == serializers._getAllModelFields(app.Book)
+    assert "reviews" not in meta.fieldSet
+    assert meta.foreignFields["author"] == {"model": app.Author, "type": "OBJECT"}
+    assert meta.foreignFields["reviews"] == {"model": app.Review, "type": "LIST"}
+    assert meta.columnTypes["price"] == "DecimalField"
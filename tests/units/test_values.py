@@ -0,0 +1,213 @@
+import datetime
+import json
+
+import pytest
+from django.db import connection
+from django.db.models import Q
+from django.test.utils import CaptureQueriesContext
+from testapp import models as app
+
+from uql.models import ExposedModel, useFullPermissionAccess
+from uql.models.values import ValuesSerializer
+
+
+def withReverseRelations(exposed: dict[str, ExposedModel]):
+    columns = {
+        "author": ["id", "name", "email", "publisher", "books"],
+        "book": [
+            "id",
+            "title",
+            "price",
+            "published",
+            "inPrint",
+            "author",
+            "tags",
+            "reviews",
+        ],
+    }
+
+    for name, column in columns.items():
+        exposed[name].addPermission(
+            "ANONYMOUS",
+            lambda _, column=column: {
+                **useFullPermissionAccess(),
+                "select": {"column": column, "row": "ALL_ROWS"},
+            },
+        )
+
+
+def restrictBooks(exposed: dict[str, ExposedModel]):
+    exposed["book"].addPermission(
+        "ANONYMOUS",
+        lambda _: {
+            **useFullPermissionAccess(),
+            "select": {
+                "column": ["id", "title", "price", "author", "tags", "reviews"],
+                "row": Q(price__gte=2),
+            },
+        },
+    )
+
+
+@pytest.fixture
+def both(exposeLibrary, post):
+    def both(body, configure=None) -> tuple[bytes, bytes]:
+        """returns the responses of the drf and the values serializers"""
+        responses = []
+        for fast in (False, True):
+            exposed = exposeLibrary(fastSerialization=fast)
+            if configure:
+                configure(exposed)
+            responses.append(post(exposed, body, raw=True).content)
+        return responses[0], responses[1]
+
+    return both
+
+
+@pytest.fixture
+def dated(library):
+    app.Book.objects.filter(title="Book 1").update(
+        published=datetime.date(2001, 2, 3), summary="lorem", inPrint=False
+    )
+    app.Author.objects.filter(name="Adichie").update(
+        email="ngozi@example.com", publisher=None
+    )
+    return library
+
+
+@pytest.mark.parametrize("model", ["publisher", "author", "book", "tag", "review"])
+def test_findmany_parity(dated, model, both):
+    drf, fast = both(
+        {
+            "intent": f"models.testapp.{model}.findmany",
+            "fields": True,
+            "args": {"where": {}},
+        }
+    )
+    assert json.loads(fast)["error"] is None
+    assert fast == drf
+
+
+@pytest.mark.parametrize(
+    "fields",
+    [
+        {"title": True, "price": True},
+        {"title": True, "author": {"name": True, "publisher": True}},
+        {"title": True, "author": False, "tags": True},
+        {"title": True, "reviews": {"rating": True, "createdAt": True}},
+        {"published": True, "inPrint": True, "author": {"books": {"title": True}}},
+        {"title": True, "author": {"books": True}},
+    ],
+)
+def test_findmany_selected_fields_parity(dated, fields, both):
+    drf, fast = both(
+        {
+            "intent": "models.testapp.book.findmany",
+            "fields": fields,
+            "args": {"where": {"price": {"_lt": 4}}, "limit": 2, "offset": 1},
+        },
+        withReverseRelations,
+    )
+    assert json.loads(fast)["error"] is None
+    assert fast == drf
+
+
+def test_find_parity(dated, both):
+    book = app.Book.objects.get(title="Book 1")
+
+    for pk in (book.pk, 10_000):
+        drf, fast = both(
+            {"intent": "models.testapp.book.find", "fields": True, "args": {"pk": pk}}
+        )
+        assert fast == drf
+
+
+def test_permissions_parity(dated, both):
+    # column permissions on the model, row permissions on a nested list
+    for intent in ("book", "author"):
+        drf, fast = both(
+            {
+                "intent": f"models.testapp.{intent}.findmany",
+                "fields": True,
+                "args": {"where": {}},
+            },
+            restrictBooks,
+        )
+        assert json.loads(fast)["error"] is None
+        assert fast == drf
+
+
+def test_relations_are_loaded_in_fixed_queries(dated, exposeLibrary, post):
+    exposed = exposeLibrary(fastSerialization=True)
+    withReverseRelations(exposed)
+    body = {
+        "intent": "models.testapp.author.findmany",
+        "fields": {
+            "name": True,
+            "publisher": True,
+            "books": {"title": True, "tags": True, "reviews": {"rating": True}},
+        },
+        "args": {"where": {}},
+    }
+
+    for _ in range(2):
+        with CaptureQueriesContext(connection) as queries:
+            data = post(exposed, body)["data"]
+
+        # authors joined with publishers, then their books, the tags and reviews of the books
+        assert len(queries) == 4
+
+        # more rows, same number of queries
+        app.Author.objects.create(name="Okri", publisher=dated["publisher"])
+
+    assert data[0]["publisher"] == {"id": dated["publisher"].pk, "name": "Penguin"}
+
+
+def test_unsupported_fields_fall_back_to_drf():
+    from rest_framework import serializers
+
+    class Sr(serializers.ModelSerializer):
+        summary = serializers.SerializerMethodField()
+
+        class Meta:
+            model = app.Book
+            fields = ["id", "summary"]
+
+        def get_summary(self, obj):
+            return obj.summary.upper()
+
+    assert ValuesSerializer.forSerializerClass(Sr) is None
+
+
+@pytest.mark.parametrize("intent", ["book.findmany", "author.findmany", "book.find"])
+def test_normalized_parity(dated, intent, both):
+    book = app.Book.objects.get(title="Book 4")
+    args = {"pk": book.pk} if intent.endswith(".find") else {"where": {}}
+    drf, fast = both(
+        {
+            "intent": f"models.testapp.{intent}",
+            "fields": True,
+            "args": {**args, "normalize": True},
+        },
+        withReverseRelations,
+    )
+
+    assert json.loads(fast)["included"]
+    # the side table is filled in a different order
+    assert json.loads(fast) == json.loads(drf)
+
+
+def test_streamed_parity(dated, both, exposeLibrary, post):
+    body = {
+        "intent": "models.testapp.book.findmany",
+        "fields": True,
+        "args": {"where": {}},
+    }
+    drf, _ = both(body, withReverseRelations)
+
+    exposed = exposeLibrary(fastSerialization=True)
+    withReverseRelations(exposed)
+    body["args"].update(stream=True, chunkSize=4)
+
+    response = post(exposed, body, raw=True)
+    assert b"".join(response.streaming_content) == drf
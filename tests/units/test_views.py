@@ -0,0 +1,264 @@
+import json
+
+import pytest
+from testapp import models as app
+from rest_framework.test import APIRequestFactory
+
+from uql.views import createUQLView
+from uql.functions import ApiFunction
+from uql.models import ExposedModel, ModelOperations, useFullPermissionAccess
+
+
+@ApiFunction.decorator(name="ping")
+def ping(request, args):
+    return {"pong": True}
+
+
+def createView():
+    book = ExposedModel(model=app.Book).addPermission(
+        "ANONYMOUS", lambda _: useFullPermissionAccess()
+    )
+    return createUQLView(models=[book], functions=[ping])
+
+
+def test_root_is_shared_between_instances():
+    View = createView()
+    first, second = View(), View()
+
+    assert first.root is second.root
+    assert "models.testapp.book.findmany" in first.root
+    assert "functions.ping" in first.root
+
+    with pytest.raises(TypeError):
+        first.root["functions.other"] = ping  # type: ignore
+
+
+def test_setters_rebuild_instance_root_only():
+    View = createView()
+    view = View()
+    view.functions = []
+
+    assert "functions.ping" not in view.root
+    assert "functions.ping" in View().root
+
+
+def test_model_intents_are_materialized_on_first_use():
+    View = createView()
+    view = View()
+    stub = view.root["models.testapp.book.find"]
+
+    assert not stub.materialized
+    assert stub.rule is not None
+    assert stub.materialized
+    assert not view.root["models.testapp.book.insert"].materialized
+
+
+def test_schema_doesnt_materialize_intents():
+    View = createView()
+    View.as_view()(APIRequestFactory().get("/uql/"))
+    stubs = {
+        key: stub
+        for key, stub in View.getSharedRoot().items()
+        if key.startswith("models.")
+    }
+
+    assert not any(stub.materialized for stub in stubs.values())
+
+    # the intents are described the same way once they're created
+    described = {key: stub.toJson() for key, stub in stubs.items()}
+    assert described == {key: stub.function.toJson() for key, stub in stubs.items()}
+
+
+def test_schema_is_served_with_etag():
+    View = createView().as_view()
+    factory = APIRequestFactory()
+
+    response = View(factory.get("/uql/"))
+    etag = response["ETag"]
+    schema = json.loads(response.content)["schema"]
+    assert "models.testapp.book.find" in schema
+
+    # the etag doesn't depend on the intents validated before the schema was built
+    Other = createView().as_view()
+    body = {"intent": "models.testapp.book.find", "args": {"pk": ""}}
+    Other(factory.post("/uql/", body, format="json"))
+    assert Other(factory.get("/uql/"))["ETag"] == etag
+
+    notModified = View(factory.get("/uql/", HTTP_IF_NONE_MATCH=f"W/{etag}"))
+    assert notModified.status_code == 304
+    assert notModified["ETag"] == etag
+
+
+def test_single_intent_schema():
+    View = createView().as_view()
+    factory = APIRequestFactory()
+
+    response = View(factory.get("/uql/", {"intent": "functions.ping"}))
+    assert list(json.loads(response.content)["schema"]) == ["functions.ping"]
+    assert response["ETag"] != View(factory.get("/uql/"))["ETag"]
+
+    missing = View(factory.get("/uql/", {"intent": "functions.missing"}))
+    missing.render()
+    assert missing.status_code == 404
+
+
+def test_fast_json_parsing():
+    decoded = []
+
+    def decoder(raw):
+        decoded.append(raw)
+        return json.loads(raw)
+
+    book = ExposedModel(model=app.Book)
+    View = createUQLView(
+        models=[book], functions=[ping], fastJsonParsing=True, jsonDecoder=decoder
+    )
+    # json bodies never reach the drf parsers
+    View.parser_classes = []
+    view = View.as_view()
+    factory = APIRequestFactory()
+
+    body = {"intent": "functions.ping", "fields": True}
+    response = view(factory.post("/uql/", body, format="json"))
+    response.render()
+    assert json.loads(response.content)["data"] == {"pong": True}
+    assert len(decoded) == 1
+
+    malformed = view(
+        factory.post("/uql/", b"{", content_type="application/json; charset=utf-8")
+    )
+    malformed.render()
+    assert malformed.status_code == 400
+
+
+def batch(View, cells: list) -> list:
+    response = View.as_view()(APIRequestFactory().post("/uql/", cells, format="json"))
+    response.render()
+    return json.loads(response.content)
+
+
+def test_pure_batch_cells_run_concurrently():
+    import threading
+
+    # every cell waits for the other, so they can only finish if they run at once
+    barrier = threading.Barrier(2, timeout=5)
+
+    @ApiFunction.decorator(name="wait", pure=True)
+    def wait(request, args):
+        barrier.wait()
+        return {"n": args["n"], "thread": threading.current_thread().name}
+
+    @ApiFunction.decorator(name="write")
+    def write(request, args):
+        return {"thread": threading.current_thread().name}
+
+    View = createUQLView(models=[], functions=[wait, write], batchWorkers=2)
+    cells = [
+        {"intent": "functions.wait", "fields": True, "args": {"n": n}} for n in range(4)
+    ]
+
+    responses = batch(View, cells)
+    assert [response["data"]["n"] for response in responses] == [0, 1, 2, 3]
+    assert all(r["data"]["thread"].startswith("uql-batch") for r in responses)
+
+    # a cell that writes runs the batch sequentially, on the request's thread
+    cells = [
+        {"intent": "functions.write", "fields": True},
+        {"intent": "functions.write", "fields": True},
+    ]
+    responses = batch(View, cells)
+    assert not any(r["data"]["thread"].startswith("uql-batch") for r in responses)
+
+
+def test_batch_threads_keep_their_connections(monkeypatch):
+    import threading
+    from django.db import connection
+    from django.db import connections
+
+    barrier = threading.Barrier(2, timeout=5)
+    closed = []
+
+    @ApiFunction.decorator(name="query", pure=True)
+    def query(request, args):
+        barrier.wait()
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        return {"thread": threading.current_thread().name}
+
+    # in-memory sqlite databases are never really closed, the attempts are counted
+    close = type(connections["default"]).close
+    monkeypatch.setattr(
+        type(connections["default"]),
+        "close",
+        lambda self: closed.append(self) or close(self),
+    )
+
+    View = createUQLView(models=[], functions=[query], batchWorkers=2)
+    cells = [
+        {"intent": "functions.query", "fields": True, "args": {"n": n}}
+        for n in range(2)
+    ]
+
+    # with django's default CONN_MAX_AGE = 0, the cells reuse the connection of their thread
+    for _ in range(3):
+        responses = batch(View, cells)
+        assert all(r["data"]["thread"].startswith("uql-batch") for r in responses)
+    assert closed == []
+
+
+def test_pure_batches_in_transactions_run_sequentially(library):
+    book = ExposedModel(
+        model=app.Book, operations=[ModelOperations.COUNT, ModelOperations.EXISTS]
+    ).addPermission("ANONYMOUS", lambda _: useFullPermissionAccess())
+    View = createUQLView(models=[book], functions=[], batchWorkers=4)
+    cells = [
+        {"intent": "models.testapp.book.count", "fields": True},
+        {"intent": "models.testapp.book.exists", "fields": True},
+    ]
+
+    # the library is only visible within the test's transaction, on this thread's connection
+    assert [response["data"] for response in batch(View, cells)] == [
+        {"count": 6},
+        {"exists": True},
+    ]
+
+
+def test_identical_pure_batch_cells_run_once():
+    calls = []
+
+    @ApiFunction.decorator(name="read", pure=True)
+    def read(request, args):
+        calls.append(args)
+        return {"args": args}
+
+    @ApiFunction.decorator(name="write")
+    def write(request, args):
+        return {}
+
+    View = createUQLView(models=[], functions=[read, write])
+    cells = [
+        {"intent": "functions.read", "fields": True, "args": {"a": 1, "b": 2}},
+        {"intent": "functions.read", "fields": True, "args": {"b": 2, "a": 1}},
+        {"intent": "functions.read", "fields": True, "args": {"a": 2}},
+        {"intent": "functions.read", "fields": True, "args": {"a": 1, "b": 2}},
+    ]
+
+    response = View.as_view()(APIRequestFactory().post("/uql/", cells, format="json"))
+    response.render()
+
+    assert [cell["data"]["args"] for cell in json.loads(response.content)] == [
+        {"a": 1, "b": 2},
+        {"a": 1, "b": 2},
+        {"a": 2},
+        {"a": 1, "b": 2},
+    ]
+    assert calls == [{"a": 1, "b": 2}, {"a": 2}]
+    assert response["X-UQL-Deduplicated-Cells"] == "2"
+
+    # a write between identical cells could change their output, so every cell is run
+    calls.clear()
+    cells.insert(1, {"intent": "functions.write", "fields": True})
+
+    response = View.as_view()(APIRequestFactory().post("/uql/", cells, format="json"))
+    assert len(calls) == 4
+    assert response["X-UQL-Deduplicated-Cells"] == "0"
@@ -10,7 +10,15 @@ DEFAULT_ON_REQUIRED_ARGS = (
 )
 UNKNOWN_ARGS = "UQL:UNKNOWN_ARGS"  # unknown argument in request
 OBJECT_NOT_FOUND = "UQL:OBJECT_NOT_FOUND"
+INEXISTENT_QUERY = "UQL:INEXISTENT_QUERY"  # requested prepared query was not found
+QUERY_OVER_BUDGET = (
+    "UQL:QUERY_OVER_BUDGET"  # where structure exceeds the query budget of the role
+)
+INVALID_ORDERING = "UQL:INVALID_ORDERING"  # rows can't be ordered as requested
+INVALID_CURSOR = "UQL:INVALID_CURSOR"  # pagination cursor couldn't be decoded
 
+# header of batch responses, with the number of cells that were answered with the response of an identical cell
+DEDUPLICATED_CELLS_HEADER = "X-UQL-Deduplicated-Cells"
 
 ALL_COLUMNS = "ALL_COLUMNS"
 ALL_ROWS = "ALL_ROWS"
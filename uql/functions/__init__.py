@@ -3,7 +3,12 @@ import typing
 import inspect
 
 from uql import types
+from uql import constants
+from uql import exceptions
 from uql.utils import dto
+from uql.utils.select import project
+from uql.utils.select import compileProjector
+from uql.utils.typecheck import isMap, isArray
 from django.core.exceptions import ValidationError
 
 from rest_framework.request import Request
@@ -32,6 +37,30 @@ def _validateFunctionName(name: str) -> str:
     raise Exception(f"bad function name {name}")
 
 
+def _compilePermission(
+    permission: typing.Callable[[Request], bool] | typing.Type[BasePermission]
+) -> typing.Callable[[Request], bool]:
+    """Turns an item of permission_classes into a check that takes in the request.
+    BasePermission subclasses are instantiated once, here, instead of on every call.
+
+    Raises:
+        ValueError: If the permission is neither a callable nor a BasePermission subclass.
+    """
+    if inspect.isclass(permission):
+        if issubclass(permission, BasePermission):
+            instance = permission()
+            return lambda request: instance.has_permission(request, None)  # type: ignore
+    elif callable(permission):
+        return typing.cast(typing.Callable[[Request], bool], permission)
+    raise ValueError("Invalid permission value in permission_classes")
+
+
+# the compiled call of a function, with the fields requested from it's output
+Pipeline: typing.TypeAlias = typing.Callable[
+    [Request, dict[str, typing.Any], bool | dict | None], types.IntentResult
+]
+
+
 class ApiFunction:
     def __init__(
         self,
@@ -43,6 +72,8 @@ class ApiFunction:
             typing.Callable[[Request], bool] | typing.Type[BasePermission]
         ]
         | None = None,
+        selectsFields: bool = False,
+        pure: bool = False,
     ) -> None:
         """A function that can be called with a request and a dictionary of options as arguments.
 
@@ -65,22 +96,78 @@ class ApiFunction:
                 A dictionary representing the validation rules for the options passed to the function.
             permission_classes (list[typing.Callable[[Request], bool] | typing.Type[BasePermission]], optional):
                 A list of callables or subclasses of BasePermission that are used to check if the user has permission to access the function.
+            selectsFields (bool, optional):
+                If set, the handler is also passed the fields requested from it's output (the `fields` of the request,
+                True when called directly) as a third argument, so it can avoid loading data that would be discarded.
+                The output is still projected to the requested fields.
+            pure (bool, optional):
+                Set if the function doesn't write anything (eg. it only reads from the database), so the cells of
+                batch requests calling it can be run concurrently. see createUQLView(batchWorkers=...)
         """
         self.name = _validateFunctionName(name or handler.__name__)
         self.description = description or handler.__doc__
         self.rule = rule
         self.permission_classes = permission_classes
+        self.selectsFields = selectsFields
+        self.pure = pure
         self._handler = handler
 
         # instantly name the root rule
         if self.rule:
             self.rule.name = "args"
 
+        # validation, permission checks and the handler, bound into one callable
+        self._pipeline = self._compile()
+
+    def _compile(self) -> Pipeline:
+        """Binds the rule validator, permission checks and handler into a single callable,
+        so all the type checks (and permission instantiation) happen once, here.
+        The function should be recompiled if it's rule or permission_classes are replaced.
+        """
+        _handler = self._handler
+        validate = self.rule.validate if self.rule else None
+        checks = tuple(_compilePermission(p) for p in self.permission_classes or [])
+
+        # handlers that select fields take them as a third argument
+        handler: Pipeline = (
+            typing.cast(Pipeline, _handler)
+            if self.selectsFields
+            else lambda request, options, fields: _handler(request, options)
+        )
+
+        if not (validate or checks):
+            return handler
+
+        def pipeline(
+            request: Request,
+            options: dict[str, typing.Any],
+            fields: bool | dict | None,
+        ) -> types.IntentResult:
+            if validate:
+                # raises an error when validation fails
+                validate(options)
+
+            for check in checks:
+                if not check(request):
+                    raise ValidationError("Unauthorised operation", "401")
+
+            return handler(request, options, fields)
+
+        return pipeline
+
     def toJson(self) -> dict:
+        return ApiFunction.schema(self.name, self.rule, self.description)
+
+    @staticmethod
+    def schema(name: str, rule: dto.Dictionary | None, description: str | None) -> dict:
+        """returns the schema of a function with the given name, rule and description"""
+        if rule:
+            rule.name = "args"
+
         return {
-            "name": self.name,
-            "rule": None if self.rule == None else self.rule.toJson(),
-            "description": self.description,
+            "name": name,
+            "rule": None if rule == None else rule.toJson(),
+            "description": description,
         }
 
     def __str__(self) -> str:
@@ -93,28 +180,53 @@ class ApiFunction:
     def __call__(
         self, request: Request, options: dict[str, typing.Any]
     ) -> types.IntentResult:
-        if self.rule:
-            # raises an error when validation fails
-            self.rule.validate(options)
-
-        # check for permission
-        if self.permission_classes:
-            error = ValidationError("Unauthorised operation", "401")
-
-            for permission in self.permission_classes:
-                if inspect.isfunction(permission):
-                    if not permission(request):
-                        raise error
-                elif issubclass(
-                    typing.cast(typing.Type[BasePermission], permission), BasePermission
-                ):
-                    permission = typing.cast(typing.Type[BasePermission], permission)
-                    permission_instance = permission()
-                    if not permission_instance.has_permission(request, None):
-                        raise error
-                else:
-                    raise ValueError("Invalid permission value in permission_classes")
-        return self._handler(request, options)
+        return self._pipeline(request, options, True)
+
+    def execute(
+        self,
+        request: Request,
+        options: dict[str, typing.Any],
+        fields: bool | dict | None,
+        intent: str | None = None,
+    ) -> types.IntentResult | types.IntentOutput | types.IntentStream:
+        """Calls the function, then selects the requested fields from it's output.
+        If the handler returned an IntentOutput, an IntentOutput with the selected data is returned,
+        IntentStreams are returned as IntentStreams that select the fields of each chunk.
+
+        Args:
+            request (Request): the request being handled.
+            options (dict[str, typing.Any]): the arguments passed to the function.
+            fields (bool | dict | None): the fields selected from the output. see `uql.utils.select.project`
+            intent (str, optional): the intent name used to report errors. Defaults to the function's name.
+
+        Raises:
+            RequestHandlingError: if the handler returned anything other than a dict, list, tuple or None.
+        """
+        data = self._pipeline(request, options, fields)
+        extras: dict[str, typing.Any] | None = None
+
+        if isinstance(data, types.IntentStream):
+            # the chunks are selected as they're streamed
+            chunks, projector = data.chunks, compileProjector(fields)
+            return types.IntentStream(
+                (projector(chunk) or [] for chunk in chunks), data.extras
+            )
+
+        if isinstance(data, types.IntentOutput):
+            data, extras = data
+
+        # raise an error if the intent handler returned any thing other than
+        # the instances of dict or list or tuple or none
+        if not (data is None or isMap(data) or isArray(data)):
+            raise exceptions.RequestHandlingError(
+                "Invalid handler output",
+                errorCode=constants.INVALID_REQUEST_HANDLER_OUTPUT,
+                statusCode=500,
+                summary=f"Intent ({intent or self.name}) handler returned a {type(data)} type. allowed output types are dict, list, none",
+            )
+
+        data = project(data, fields)
+        return data if extras is None else types.IntentOutput(data, extras)
 
     @staticmethod
     def decorator(
@@ -125,6 +237,8 @@ class ApiFunction:
             typing.Callable[[Request], bool] | typing.Type[BasePermission]
         ]
         | None = None,
+        selectsFields: bool = False,
+        pure: bool = False,
     ):
         """
         Decorator for defining and registering functions as "intents".
@@ -139,6 +253,10 @@ class ApiFunction:
             A dictionary representing the validation rules for the options passed to the function.
         permission_classes (list[typing.Callable[[Request], bool] | typing.Type[BasePermission]], optional):
             A list of callables or subclasses of BasePermission that are used to check if the user has permission to access the function.
+        selectsFields (bool, optional):
+            Pass the requested fields to the handler as a third argument.
+        pure (bool, optional):
+            The function doesn't write anything, batched calls to it can run concurrently.
 
         This decorator returns the decorated function wrapped in an ApiFunction object, which can be called like a regular function, but also has some additional properties and methods for handling input validation and other functionality.
         """
@@ -154,6 +272,120 @@ class ApiFunction:
                 description=description,
                 rule=rule,
                 permission_classes=permission_classes,
+                selectsFields=selectsFields,
+                pure=pure,
             )
 
         return _
+
+
+class FunctionSpec(typing.NamedTuple):
+    """What an ApiFunction is created from, with the rule built on demand.
+    see `LazyApiFunction.fromSpec`"""
+
+    handler: typing.Callable[..., types.IntentResult]
+    rule: typing.Callable[[], dto.Dictionary | None]
+    description: str | None = None
+    selectsFields: bool = False
+    pure: bool = False
+
+    def create(self) -> ApiFunction:
+        return ApiFunction(
+            self.handler,
+            description=self.description,
+            rule=self.rule(),
+            selectsFields=self.selectsFields,
+            pure=self.pure,
+        )
+
+    def toJson(self) -> dict:
+        """the schema of the function, without creating it"""
+        return ApiFunction.schema(
+            self.handler.__name__,
+            self.rule(),
+            self.description or self.handler.__doc__,
+        )
+
+
+class LazyApiFunction:
+    def __init__(
+        self,
+        factory: typing.Callable[[], ApiFunction],
+        selectsFields: bool = False,
+        pure: bool = False,
+        describe: typing.Callable[[], dict] | None = None,
+    ) -> None:
+        """A stand-in for an ApiFunction that is only created when it's first used.
+
+        The factory is called the first time the stub is called or an attribute of the
+        function is read, the resulting ApiFunction is then kept and used for every
+        subsequent call. selectsFields and pure are read from the stub, so checking them
+        (eg. to schedule a batch) doesn't create the function.
+
+        Args:
+            factory (typing.Callable[[], ApiFunction]): returns the ApiFunction this stub stands for.
+            selectsFields (bool, optional): the selectsFields of the function. Defaults to False.
+            pure (bool, optional): the pure flag of the function. Defaults to False.
+            describe (typing.Callable[[], dict], optional): returns the schema of the function
+                (see ApiFunction.toJson) without creating it. The function is created to
+                describe it if not given.
+        """
+        self._factory = factory
+        self._describe = describe
+        self._function: ApiFunction | None = None
+        self.selectsFields = selectsFields
+        self.pure = pure
+
+    @staticmethod
+    def fromSpec(spec: FunctionSpec) -> "LazyApiFunction":
+        """returns a stub of the function created from spec, described from the spec"""
+        return LazyApiFunction(
+            spec.create, spec.selectsFields, spec.pure, describe=spec.toJson
+        )
+
+    @property
+    def materialized(self) -> bool:
+        """True if the ApiFunction has been created"""
+        return self._function is not None
+
+    def _materialize(self) -> ApiFunction:
+        """returns the ApiFunction this stub stands for, creating it the first time"""
+        if self._function is None:
+            self._function = self._factory()
+        return self._function
+
+    @property
+    def function(self) -> ApiFunction:
+        """The ApiFunction this stub stands for, created on first access"""
+        return self._materialize()
+
+    def toJson(self) -> dict:
+        if self._function is None and self._describe is not None:
+            return self._describe()
+        return self._materialize().toJson()
+
+    def __getattr__(self, name: str) -> typing.Any:
+        # only called for attributes not found on the stub itself
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self._materialize(), name)
+
+    def __str__(self) -> str:
+        return str(self._materialize())
+
+    def __repr__(self) -> str:
+        return repr(self._function) if self.materialized else "<LazyApiFunction>"
+
+    def __call__(
+        self, request: Request, options: dict[str, typing.Any]
+    ) -> types.IntentResult:
+        return self._materialize()(request, options)
+
+    def execute(
+        self,
+        request: Request,
+        options: dict[str, typing.Any],
+        fields: bool | dict | None,
+        intent: str | None = None,
+    ) -> types.IntentResult | types.IntentOutput | types.IntentStream:
+        return self._materialize().execute(request, options, fields, intent)
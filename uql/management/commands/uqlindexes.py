@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+
+from uql.models.advisor import readUsage
+from uql.models.advisor import recommendIndexes
+
+
+class Command(BaseCommand):
+    help = (
+        "Recommends the indexes to add, from the findmany lookups recorded by a "
+        "uql.models.advisor.QueryRecorder. The most expensive filters are listed first."
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("path", help="the file the QueryRecorder wrote to")
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=None,
+            help="the number of recommendations to print",
+        )
+
+    def handle(self, *args, **options) -> None:
+        try:
+            usage = readUsage(options["path"])
+        except OSError as e:
+            raise CommandError(f"Couldn't read {options['path']}: {e}")
+
+        recommendations = recommendIndexes(usage)[: options["limit"]]
+
+        if not recommendations:
+            self.stdout.write("No missing indexes found.")
+            return
+
+        for i, recommendation in enumerate(recommendations, start=1):
+            self.stdout.write(
+                f"{i}. {recommendation.model}.{recommendation.column} ({recommendation.reason}): "
+                f"{recommendation.calls} calls, {recommendation.meanLatency * 1000:.2f}ms on average"
+            )
+
+            for lookup in recommendation.lookups:
+                self.stdout.write(f"     {lookup}")
@@ -0,0 +1,35 @@
+from importlib import import_module
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from uql.models.search import buildSearchIndex
+from uql.models.search import searchableModels
+
+
+class Command(BaseCommand):
+    help = (
+        "Builds (or rebuilds) the search indexes of the exposed models with searchFields, "
+        "which the _search criterion and search ordering read."
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            "--database",
+            default=None,
+            help="the database to build the indexes in, the model's write database by default",
+        )
+
+    def handle(self, *args, **options) -> None:
+        # exposed models are declared alongside the uql view, importing the urls declares them
+        import_module(settings.ROOT_URLCONF)
+
+        models = searchableModels()
+
+        if not models:
+            self.stdout.write("No searchable models found.")
+            return
+
+        for model in models:
+            buildSearchIndex(model, using=options["database"])
+            self.stdout.write(f"Built the search index of {model._meta.label_lower}")
@@ -8,6 +8,12 @@ from rest_framework.serializers import ModelSerializer
 from uql import types
 from uql import constants
 from uql.exceptions import InexistentExposedModel
+from uql.utils.select import FrozenFields
+from uql.utils.query import PreparedQuery
+from uql.models.search import registerSearchFields
+
+if typing.TYPE_CHECKING:
+    from uql.models.context import RequestContext
 
 
 class ModelOperations(enum.Enum):
@@ -16,11 +22,17 @@ class ModelOperations(enum.Enum):
     DELETE = "DELETE"
     UPDATE = "UPDATE"
     SELECT_MANY = "SELECT_MANY"
+    AGGREGATE = "AGGREGATE"
+    EXISTS = "EXISTS"
+    COUNT = "COUNT"
     UPDATE_MANY = "UPDATE_MANY"
     # UPDATE_WHERE = "UPDATE_WHERE"
     # INSERT_MANY = "INSERT_MANY"
     # DELETE_MANY = "DELETE_MANY"
 
+    # the presets don't include AGGREGATE, EXISTS and COUNT, models publish them by listing
+    # them in their operations
+
     @staticmethod
     def all():
         return [
@@ -36,7 +48,10 @@ class ModelOperations(enum.Enum):
 
     @staticmethod
     def readonly():
-        return [ModelOperations.SELECT, ModelOperations.SELECT_MANY]
+        return [
+            ModelOperations.SELECT,
+            ModelOperations.SELECT_MANY,
+        ]
 
     @staticmethod
     def readonly_and_single_write():
@@ -77,6 +92,9 @@ class ExposedModel:
         model: type[models.Model],
         operations: list[ModelOperations] | None = None,
         fieldsIncludedOnUpdate: list[str] | None = None,
+        fastSerialization: bool = False,
+        strictOrdering: bool = False,
+        searchFields: list[str] | None = None,
     ) -> None:
         self.model = model
         self.rolePermissions: dict[
@@ -89,9 +107,29 @@ class ExposedModel:
         # fields we want always passed to Model.save(update_fields)
         self.fieldsIncludedOnUpdate = fieldsIncludedOnUpdate or []
 
+        # read rows for find and findmany with QuerySet.values() instead of model instances,
+        # see uql.models.values.ValuesSerializer
+        self.fastSerialization = fastSerialization
+
+        # only allow orderings an index can read rows in (see ModelMeta.isIndexedOrdering),
+        # so the database never sorts the rows
+        self.strictOrdering = strictOrdering
+
+        # text fields the _search criterion and search ordering match against, see
+        # uql.models.search.registerSearchFields
+        self.searchFields = searchFields or []
+        if self.searchFields:
+            registerSearchFields(model, self.searchFields)
+
+        # named where structures findmany can be called with, see addPreparedQuery
+        self.preparedQueries: dict[str, PreparedQuery] = {}
+
         # add model to dictionary
         self.__models[self.name] = self
 
+        # serializers of related models may have been created with a model this one replaces
+        serializers.clearSerializerCache()
+
     def __repr__(self) -> str:
         return f"<{self.__class__.__name__} model={self.name.title()}>"
 
@@ -144,12 +182,58 @@ class ExposedModel:
 
         if isinstance(role, str):
             self.rolePermissions[role] = perimission
+            serializers.clearSerializerCache(role)
         elif isinstance(role, list):
             for singleRole in role:
                 self.rolePermissions[singleRole] = perimission
+                serializers.clearSerializerCache(singleRole)
         else:
             raise TypeError("role should be a string or list of strings")
         return self
 
-    def getSerializerClass(self, role: str) -> type[ModelSerializer]:
-        return serializers.createSerializerClass(role, self)
+    def addPreparedQuery(
+        self, name: str, where: dict[str, typing.Any]
+    ) -> "ExposedModel":
+        """
+        Adds a query findmany can be called with by name, instead of sending the where structure.
+        The query is compiled once, with uql.utils.query.Parameter in place of the values given
+        by the client.
+
+        Parameters:
+            name (str): The name the query is called by, as the `query` argument of findmany.
+            where (dict[str, typing.Any]): The where structure of the query.
+
+        Returns:
+            ExposedModel: The ExposedModel object with the added query.
+
+        Example:
+            >>> book.addPreparedQuery("byAuthor", {"author": {"_eq": Parameter("author")}})
+            # {"intent": "models.app.book.findmany", "args": {"query": "byAuthor", "params": {"author": 1}}}
+        """
+        self.preparedQueries[name] = PreparedQuery(where)
+        return self
+
+    def getSerializerClass(
+        self,
+        role: str,
+        fields: FrozenFields | None = None,
+        context: "RequestContext | None" = None,
+    ) -> type[ModelSerializer]:
+        """returns the serializer of the role's permitted columns, with the permissions of the
+        request context if given"""
+        return serializers.createSerializerClass(
+            role, self, fields=fields, context=context
+        )
+
+    def getRelationPlan(
+        self,
+        role: str,
+        userId: types.Pk | None = None,
+        fields: FrozenFields | None = None,
+        context: "RequestContext | None" = None,
+    ) -> serializers.RelationPlan:
+        """returns the lookups that load the data serialized by getSerializerClass(role, fields),
+        with the permissions of the request context if given"""
+        return serializers.planRelations(
+            role, self, userId, fields=fields, context=context
+        )
@@ -0,0 +1,198 @@
+import json
+import atexit
+import typing
+import threading
+
+from uql.models.meta import getModelMeta
+
+from django.apps import apps
+from django.db import models
+
+# lookups an index on the column can't serve
+PATTERN_LOOKUPS = frozenset(["contains", "icontains", "regex"])
+
+# (model label, lookup) -> [calls, seconds]
+LookupUsage: typing.TypeAlias = dict[tuple[str, str], list]
+
+
+class QueryRecorder:
+    def __init__(self, path: str, flushEvery: int = 100) -> None:
+        """
+        Records the lookups findmany filters exposed models with (eg. author__name__icontains), and
+        how long the calls took. Pass it to createUQLView(queryRecorder=...) to opt in.
+
+        Usage is aggregated in memory, and appended to the file at path as json lines every
+        flushEvery calls (and when the process exits), so many processes can record to the same file.
+        `python manage.py uqlindexes <path>` reads the file and recommends the indexes to add.
+
+        Args:
+            path (str): the file usage is appended to.
+            flushEvery (int, optional): the number of calls aggregated before they're written. Defaults to 100.
+        """
+        self.path = path
+        self.flushEvery = flushEvery
+        self._pending: LookupUsage = {}
+        self._calls = 0
+        self._lock = threading.Lock()
+
+        atexit.register(self.flush)
+
+    def record(
+        self, model: type[models.Model], lookups: typing.Iterable[str], seconds: float
+    ) -> None:
+        """records a call that filtered model with lookups, and took seconds"""
+        label = model._meta.label_lower
+
+        with self._lock:
+            for lookup in set(lookups):
+                usage = self._pending.setdefault((label, lookup), [0, 0.0])
+                usage[0] += 1
+                usage[1] += seconds
+
+            self._calls += 1
+            if self._calls >= self.flushEvery:
+                self._write()
+
+    def flush(self) -> None:
+        """writes the usage recorded since the last write"""
+        with self._lock:
+            self._write()
+
+    def _write(self) -> None:
+        if self._pending:
+            with open(self.path, "a") as file:
+                file.writelines(
+                    json.dumps(
+                        {
+                            "model": label,
+                            "lookup": lookup,
+                            "calls": calls,
+                            "seconds": seconds,
+                        }
+                    )
+                    + "\n"
+                    for (label, lookup), (calls, seconds) in self._pending.items()
+                )
+
+        self._pending = {}
+        self._calls = 0
+
+
+def readUsage(path: str) -> LookupUsage:
+    """Returns the usage a QueryRecorder wrote to path, aggregated by model and lookup"""
+    usage: LookupUsage = {}
+
+    with open(path) as file:
+        for line in file:
+            if not line.strip():
+                continue
+
+            entry = json.loads(line)
+            total = usage.setdefault((entry["model"], entry["lookup"]), [0, 0.0])
+            total[0] += entry["calls"]
+            total[1] += entry["seconds"]
+
+    return usage
+
+
+class IndexRecommendation(typing.NamedTuple):
+    """A column that's filtered without an index that can serve the filter.
+
+    Attributes:
+        model (str): label of the model the column belongs to.
+        column (str): the column to index.
+        lookups (tuple[str, ...]): the lookups (from the filtered models) that filter the column.
+        calls (int): the number of calls that filtered the column.
+        seconds (float): the time those calls took.
+        reason (str): why the existing indexes can't serve the filter.
+    """
+
+    model: str
+    column: str
+    lookups: tuple[str, ...]
+    calls: int
+    seconds: float
+    reason: str
+
+    @property
+    def meanLatency(self) -> float:
+        return self.seconds / self.calls if self.calls else 0.0
+
+
+def _filteredColumn(
+    model: type[models.Model], lookup: str
+) -> tuple[type[models.Model], str, str] | None:
+    """Returns the model, column and lookup type (eg. icontains) a lookup filters, following
+    relations. A column that is transformed (eg. published__year) is returned with the transform
+    as it's lookup type. None is returned for lookups that don't filter a column."""
+    *path, lookupType = lookup.split("__")
+    meta = getModelMeta(model)
+
+    for i, part in enumerate(path):
+        related = meta.relatedModels.get(part)
+
+        if related is None:
+            if not (part in meta.fieldSet):
+                return None
+            return meta.model, part, "__".join([*path[i + 1 :], lookupType])
+
+        if i == len(path) - 1:
+            # relations are filtered by the primary key of the related model
+            return meta.model, part, lookupType
+        meta = getModelMeta(related)
+
+    return None
+
+
+def recommendIndexes(usage: LookupUsage) -> list[IndexRecommendation]:
+    """Returns the columns in usage that are filtered without an index that can serve the filter,
+    with the most expensive (calls * latency) first. Columns are checked against primary keys,
+    foreign keys, unique and db_index fields, and the leading column of Meta.indexes and
+    unique constraints (see ModelMeta.indexedColumns)."""
+    grouped: dict[tuple[str, str], dict[str, typing.Any]] = {}
+
+    for (label, lookup), (calls, seconds) in usage.items():
+        try:
+            model = apps.get_model(label)
+        except LookupError:
+            # the model has been removed since it was recorded
+            continue
+
+        filtered = _filteredColumn(model, lookup)
+        if filtered is None:
+            continue
+
+        target, column, lookupType = filtered
+        meta = getModelMeta(target)
+
+        if not (column in meta.indexedColumns or column in meta.relatedModels):
+            reason = "no index"
+        elif lookupType in PATTERN_LOOKUPS:
+            reason = f"the index can't serve {lookupType}"
+        elif not (lookupType in ("exact", "in", "gt", "gte", "lt", "lte")):
+            reason = f"the index can't serve the {lookupType} transform"
+        else:
+            continue
+
+        entry = grouped.setdefault(
+            (target._meta.label_lower, column),
+            {"lookups": {}, "calls": 0, "seconds": 0.0, "reasons": {}},
+        )
+        entry["lookups"][f"{label}: {lookup}"] = None
+        entry["reasons"][reason] = None
+        entry["calls"] += calls
+        entry["seconds"] += seconds
+
+    recommendations = [
+        IndexRecommendation(
+            model=label,
+            column=column,
+            lookups=tuple(entry["lookups"]),
+            calls=entry["calls"],
+            seconds=entry["seconds"],
+            reason=", ".join(entry["reasons"]),
+        )
+        for (label, column), entry in grouped.items()
+    ]
+
+    return sorted(recommendations, key=lambda r: (r.seconds, r.calls), reverse=True)
@@ -0,0 +1,114 @@
+import typing
+import threading
+
+from uql import types
+
+from rest_framework.request import Request
+
+if typing.TYPE_CHECKING:
+    from uql.models import ExposedModel
+
+# the attribute of the request the context is kept in
+REQUEST_CONTEXT_ATTRIBUTE = "_uqlContext"
+
+OperationType: typing.TypeAlias = typing.Literal["select", "insert", "update", "delete"]
+
+
+class RequestContext:
+    def __init__(self, app, request: Request) -> None:
+        """What the handlers of a request need to know about it's user, resolved once per request
+        (and shared by the cells of batch requests): the user's role, pk, and the permission objects
+        of the exposed models, from the role's permission functions. see `RequestContext.of`
+
+        Args:
+            app: the view handling the request, it resolves the role of the user.
+            request (Request): the request.
+        """
+        self.role: str = app.getUserRole(request.user)
+        self.userId: types.Pk | None = getattr(request.user, "pk", None)
+
+        # (exposed model, permission function) -> permission object, the permission function is
+        # part of the key so permissions replaced with ExposedModel.addPermission are picked up
+        self._permissions: dict[
+            tuple["ExposedModel", typing.Callable], types.ModelPermissionType
+        ] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def of(app, request: Request) -> "RequestContext":
+        """Returns the context of the request, creating it the first time"""
+        context = getattr(request, REQUEST_CONTEXT_ATTRIBUTE, None)
+
+        if context is None:
+            context = RequestContext(app, request)
+            setattr(request, REQUEST_CONTEXT_ATTRIBUTE, context)
+        return context
+
+    def permissionObject(
+        self, exposedmodel: "ExposedModel"
+    ) -> types.ModelPermissionType | None:
+        """Returns the permission object of the user's role on exposedmodel, bound to the user's pk.
+        The role's permission function is called once per request. None is returned if the role
+        has no permission on the model."""
+        permissionFunction = exposedmodel.rolePermissions.get(self.role)
+
+        if permissionFunction is None:
+            return None
+
+        key = (exposedmodel, permissionFunction)
+
+        with self._lock:
+            if not (key in self._permissions):
+                self._permissions[key] = permissionFunction(self.userId)
+            return self._permissions[key]
+
+    @typing.overload
+    def getPermission(
+        self, exposedmodel: "ExposedModel", operation: typing.Literal["select"]
+    ) -> types.SelectPermissionType:
+        ...
+
+    @typing.overload
+    def getPermission(
+        self, exposedmodel: "ExposedModel", operation: typing.Literal["insert"]
+    ) -> types.InsertPermissionType:
+        ...
+
+    @typing.overload
+    def getPermission(
+        self, exposedmodel: "ExposedModel", operation: typing.Literal["update"]
+    ) -> types.UpdatePermissionType:
+        ...
+
+    @typing.overload
+    def getPermission(
+        self, exposedmodel: "ExposedModel", operation: typing.Literal["delete"]
+    ) -> types.DeletePermissionType:
+        ...
+
+    def getPermission(self, exposedmodel: "ExposedModel", operation: OperationType):
+        """Returns the user's permission for an operation on exposedmodel,
+        see ModelOperationManager.getPermission
+
+        Raises:
+            PermissionError: if the role has no permission for the operation.
+        """
+        permissionObject = self.permissionObject(exposedmodel)
+        operationPermission = (
+            permissionObject.get(operation) if permissionObject is not None else None
+        )
+
+        if not operationPermission:
+            raise PermissionError(
+                f"User({self.userId}) with role: '{self.role}' has no {operation} permission",
+                401,
+            )
+
+        return operationPermission
+
+    def selectPermission(
+        self, exposedmodel: "ExposedModel"
+    ) -> types.SelectPermissionType | None:
+        """Returns the user's select permission on exposedmodel, or None"""
+        permissionObject = self.permissionObject(exposedmodel)
+        return permissionObject.get("select") if permissionObject is not None else None
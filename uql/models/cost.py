@@ -0,0 +1,150 @@
+import typing
+from collections.abc import Sequence
+from collections.abc import Sized
+
+from uql import types
+from uql.models.meta import ModelMeta
+from uql.models.meta import getModelMeta
+from uql.utils.query import criterions
+from uql.utils.query import conjunctions
+
+from django.db import models
+
+
+class QueryCost(typing.NamedTuple):
+    """What running a where structure would cost, worked out from the structure alone.
+
+    Attributes:
+        depth (int): how deeply the structure is nested, a flat structure has a depth of 1.
+        joins (int): the number of distinct relations traversed.
+        criteria (int): the number of criteria (eg. _eq, _gt) in the structure.
+        regex (int): the number of _regex criteria.
+        largestIn (int): the number of values in the largest _in or _nin list.
+        unindexed (tuple[str, ...]): lookups of the filtered columns that can't be found with an index.
+    """
+
+    depth: int
+    joins: int
+    criteria: int
+    regex: int
+    largestIn: int
+    unindexed: tuple[str, ...]
+
+
+class _Analysis:
+    def __init__(self) -> None:
+        self.depth = 0
+        self.joins: set[str] = set()
+        self.criteria = 0
+        self.regex = 0
+        self.largestIn = 0
+        self.unindexed: dict[str, None] = {}
+
+    def walk(
+        self,
+        query: typing.Any,
+        meta: ModelMeta,
+        path: str,
+        column: str | None,
+        transformed: bool,
+        depth: int,
+    ) -> None:
+        """walks a (sub) structure of a where structure
+
+        Args:
+            query: the structure.
+            meta (ModelMeta): the model column belongs to.
+            path (str): the lookup of the column, from the root model.
+            column (str | None): the field of meta criteria in the structure apply to.
+            transformed (bool): whether the column is transformed (eg. published__year), so an index can't be used.
+            depth (int): the nesting level of the structure.
+        """
+        # invalid structures are reported by makeQuery
+        if not isinstance(query, dict):
+            return
+
+        self.depth = max(self.depth, depth)
+
+        for item, value in query.items():
+            if item in criterions:
+                self.criteria += 1
+
+                if item == "_regex":
+                    self.regex += 1
+
+                if item in ("_in", "_nin") and isinstance(value, Sized):
+                    self.largestIn = max(self.largestIn, len(value))
+
+                # relations are filtered by the primary key of the related model
+                indexed = column in meta.indexedColumns or column in meta.relatedModels
+                if column is not None and (transformed or not indexed):
+                    self.unindexed[path] = None
+
+            elif item in conjunctions:
+                if isinstance(value, Sequence):
+                    for i in value:
+                        self.walk(i, meta, path, column, transformed, depth + 1)
+
+            else:
+                subMeta, subColumn, subTransformed = meta, column, transformed
+                subPath = path
+
+                for part in item.split("__"):
+                    if subColumn is not None:
+                        related = subMeta.relatedModels.get(subColumn)
+
+                        if related is not None and not subTransformed:
+                            # going through a relation to a field of the related model
+                            self.joins.add(subPath)
+                            subMeta = getModelMeta(related)
+                        else:
+                            subTransformed = True
+
+                    subColumn = part
+                    subPath = f"{subPath}__{part}" if subPath else part
+
+                self.walk(value, subMeta, subPath, subColumn, subTransformed, depth + 1)
+
+    def result(self) -> QueryCost:
+        return QueryCost(
+            depth=self.depth,
+            joins=len(self.joins),
+            criteria=self.criteria,
+            regex=self.regex,
+            largestIn=self.largestIn,
+            unindexed=tuple(self.unindexed),
+        )
+
+
+def analyzeQuery(model: type[models.Model], query: dict[str, typing.Any]) -> QueryCost:
+    """Returns the cost of filtering model with a where structure (see uql.utils.query.makeQuery)"""
+    analysis = _Analysis()
+    analysis.walk(query, getModelMeta(model), "", None, False, 1)
+    return analysis.result()
+
+
+def exceededLimits(cost: QueryCost, budget: types.QueryBudgetType) -> list[str]:
+    """Returns a description of each limit of the budget the cost exceeds"""
+    exceeded: list[str] = []
+
+    for limit, value, description in (
+        ("maxDepth", cost.depth, "nested {value} levels deep"),
+        ("maxJoins", cost.joins, "traverses {value} relations"),
+        ("maxCriteria", cost.criteria, "has {value} criteria"),
+        ("maxInSize", cost.largestIn, "has {value} values in a list"),
+    ):
+        maximum = typing.cast(int | None, budget.get(limit))
+        if maximum is not None and value > maximum:
+            exceeded.append(
+                f"{description.format(value=value)}, at most {maximum} allowed"
+            )
+
+    if cost.regex and not budget.get("allowRegex", True):
+        exceeded.append("uses _regex, which is not allowed")
+
+    if cost.unindexed and not budget.get("allowUnindexed", True):
+        exceeded.append(
+            f"filters columns without an index: {', '.join(cost.unindexed)}"
+        )
+
+    return exceeded
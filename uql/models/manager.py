@@ -1,17 +1,37 @@
+import json
+import time
+import base64
 import typing
+import itertools
 
 from uql import constants
 from uql import types
 from uql import exceptions
 from uql.utils import dto
 from uql.utils.query import makeQuery
-from uql.functions import ApiFunction
-from uql.models.serializers import _getAllModelFields
+from uql.utils.query import queryLookups
+from uql.utils.select import freezeFields
+from uql.functions import FunctionSpec
+from uql.functions import LazyApiFunction
+from uql.models.meta import ModelMeta
+from uql.models.meta import getModelMeta
+from uql.models.cost import analyzeQuery
+from uql.models.cost import exceededLimits
+from uql.models.search import SearchRank
+from uql.models.search import getSearchFields
+from uql.models.search import checkSearchCriteria
+from uql.models.values import ValuesSerializer
+from uql.models.context import RequestContext
+from uql.models.serializers import INCLUDED_CONTEXT
+from uql.models.serializers import createSerializerContext
 
-from . import serializers
 from django.db import models
 from django.db import transaction
+from django.core.exceptions import ValidationError
+from django.core.exceptions import FieldDoesNotExist
+from django.core.serializers.json import DjangoJSONEncoder
 from rest_framework.request import Request
+from rest_framework.serializers import ModelSerializer
 from . import ModelOperations
 
 if typing.TYPE_CHECKING:
@@ -25,13 +45,83 @@ ModelOperationPermissionType: typing.TypeAlias = (
 )
 
 
+class OrderColumn(typing.NamedTuple):
+    """a column rows are ordered by"""
+
+    column: str
+    descending: bool = False
+
+    # where null values are placed, "first" or "last", the database decides when None
+    nulls: str | None = None
+
+    # the text rows are ranked by relevance to, the column is then an annotation of the rank
+    # (see ModelOperationManager.annotateRanks)
+    search: str | None = None
+
+    def expression(self) -> models.OrderBy:
+        nulls = {"nulls_first": True} if self.nulls == "first" else {}
+        nulls = {"nulls_last": True} if self.nulls == "last" else nulls
+        column = models.F(self.column)
+        return column.desc(**nulls) if self.descending else column.asc(**nulls)
+
+    def reversed(self) -> "OrderColumn":
+        nulls = {"first": "last", "last": "first"}.get(self.nulls or "")
+        return OrderColumn(self.column, not self.descending, nulls, self.search)
+
+    def __str__(self) -> str:
+        order = f"-{self.column}" if self.descending else self.column
+        return f"{order} nulls {self.nulls}" if self.nulls else order
+
+
 class ModelOperationManager:
     """Holds the functions for handling model operations like select, delete ..."""
 
+    # the number of rows read and serialized at a time by streamed findmany calls
+    STREAM_CHUNK_SIZE = 500
+
+    # the aggregate functions of the aggregate intent
+    AGGREGATES: dict[str, type[models.Aggregate]] = {
+        "count": models.Count,
+        "sum": models.Sum,
+        "avg": models.Avg,
+        "min": models.Min,
+        "max": models.Max,
+    }
+
+    # the lookups whose prepared query parameters are converted to the compared field's type
+    # (see cleanParameter)
+    CONVERTED_LOOKUPS = frozenset(("exact", "gt", "gte", "lt", "lte", "in"))
+
+    # the aggregate functions that only take numbers
+    NUMERIC_AGGREGATES = frozenset(("sum", "avg"))
+
+    # the internal types (see ModelMeta.columnTypes) of the columns sum and avg take
+    NUMERIC_TYPES = frozenset(
+        (
+            "AutoField",
+            "BigAutoField",
+            "SmallAutoField",
+            "IntegerField",
+            "BigIntegerField",
+            "SmallIntegerField",
+            "PositiveIntegerField",
+            "PositiveBigIntegerField",
+            "PositiveSmallIntegerField",
+            "FloatField",
+            "DecimalField",
+            "DurationField",
+        )
+    )
+
     def __init__(self, app, exposedmodel: "ExposedModel") -> None:
         self.exposedmodel = exposedmodel
         self.app = app
 
+    @property
+    def meta(self) -> ModelMeta:
+        """field metadata index of the exposed model"""
+        return getModelMeta(self.exposedmodel.model)
+
     @staticmethod
     @typing.overload
     def getPermission(
@@ -140,7 +230,71 @@ class ModelOperationManager:
 
         return getattr(request.user, "pk", None)
 
-    def find(self, request: Request, args: dict[str, typing.Any]):
+    def getValuesSerializer(
+        self, serializerClass: type[ModelSerializer]
+    ) -> ValuesSerializer | None:
+        """returns the values serializer used in place of serializerClass for reads,
+        or None if fast serialization is not enabled, or not supported by the serializer"""
+        if not self.exposedmodel.fastSerialization:
+            return None
+        return ValuesSerializer.forSerializerClass(serializerClass)
+
+    @staticmethod
+    def withIncluded(
+        data: types.IntentResult,
+        context: dict[str, typing.Any],
+        **extras: typing.Any,
+    ) -> types.IntentResult | types.IntentOutput:
+        """returns the serialized data, with the side table of related objects if the
+        output was normalized (see createSerializerContext), and any other extra keys"""
+        included = context.get(INCLUDED_CONTEXT)
+
+        if included is not None:
+            extras["included"] = included
+
+        if not extras:
+            return data
+        return types.IntentOutput(data, extras)
+
+    def requestContext(self, request: Request) -> RequestContext:
+        """returns the role and permissions of the request's user, resolved once per request"""
+        return RequestContext.of(self.app, request)
+
+    def relatedRows(
+        self, requestContext: RequestContext
+    ) -> typing.Callable[[type[models.Model]], models.QuerySet]:
+        """returns a function that returns the rows of a related exposed model
+        the user is permitted to select"""
+
+        def rows(model: type[models.Model]) -> models.QuerySet:
+            related_em = self.exposedmodel.getExposedModel(model)
+            selectPermission = requestContext.selectPermission(related_em)
+
+            queryset = model.objects.all()
+            if selectPermission and selectPermission["row"] != constants.ALL_ROWS:
+                queryset = queryset.filter(selectPermission["row"])
+            return queryset
+
+        return rows
+
+    def loadRelations(
+        self, requestContext: RequestContext, instances: list[models.Model]
+    ) -> None:
+        """loads the relations serialized for the user's role into saved instances, the way
+        find and findmany load them: related rows are limited to the rows the user can select"""
+        plan = self.exposedmodel.getRelationPlan(
+            requestContext.role, requestContext.userId, context=requestContext
+        )
+        models.prefetch_related_objects(
+            instances, *plan.selectRelated, *plan.prefetchRelated
+        )
+
+    def find(
+        self,
+        request: Request,
+        args: dict[str, typing.Any],
+        fields: bool | dict | None = True,
+    ):
         """Returns a single object from models by primary key pk.
 
         This method retrieves a single/multiple objects depending on the `many` flag, from the specified models, using the
@@ -154,6 +308,8 @@ class ModelOperationManager:
                 user making the request.
             args (dict): A dictionary of arguments, including the optional `where`
                 argument used to filter the queryset of objects.
+            fields (bool | dict | None): The fields requested from the output. Only the
+                selected columns and relations are fetched and serialized.
 
         Raises:
             Interruption: If an error occurs while retrieving or serializing the
@@ -165,16 +321,12 @@ class ModelOperationManager:
 
         # arguments
         pk: types.Pk | None = args.get("pk")
+        normalize: bool = args.get("normalize") or False
 
         # ...
-        role = self.app.getUserRole(request.user)
-        sr = self.exposedmodel.getSerializerClass(role)
-        select_permission = ModelOperationManager.getPermission(
-            role,
-            "select",
-            self.exposedmodel.rolePermissions,
-            ModelOperationManager.getUserPkFromRequest(request),
-        )
+        requestContext = self.requestContext(request)
+        role, userId = requestContext.role, requestContext.userId
+        select_permission = requestContext.getPermission(self.exposedmodel, "select")
 
         queryset = (
             self.exposedmodel.model.objects.all()
@@ -182,9 +334,43 @@ class ModelOperationManager:
             else self.exposedmodel.model.objects.filter(select_permission["row"])
         )
 
-        return sr(queryset.get(pk=pk)).data
+        if not fields:
+            # no data is returned, so just make sure the row exists
+            queryset.only(self.meta.pk).get(pk=pk)
+            return None
+
+        selectedFields = freezeFields(fields)
+        sr = self.exposedmodel.getSerializerClass(role, selectedFields, requestContext)
+        valuesSerializer = self.getValuesSerializer(sr)
+
+        context = createSerializerContext(normalize)
+
+        if valuesSerializer:
+            rows = valuesSerializer.serialize(
+                queryset.filter(pk=pk),
+                self.relatedRows(requestContext),
+                context.get(INCLUDED_CONTEXT),
+            )
+
+            if not rows:
+                raise self.exposedmodel.model.DoesNotExist(
+                    f"{self.exposedmodel.model._meta.object_name} matching query does not exist."
+                )
+            return self.withIncluded(rows[0], context)
+
+        # load the selected columns and relations along with the row
+        queryset = self.exposedmodel.getRelationPlan(
+            role, userId, selectedFields, requestContext
+        ).apply(queryset)
 
-    def findMany(self, request: Request, args: dict[str, typing.Any]):
+        return self.withIncluded(sr(queryset.get(pk=pk), context=context).data, context)
+
+    def findMany(
+        self,
+        request: Request,
+        args: dict[str, typing.Any],
+        fields: bool | dict | None = True,
+    ):
         # return self._find(request, args, True)
         """Returns multiple object from models.
 
@@ -199,6 +385,8 @@ class ModelOperationManager:
                 user making the request.
             args (dict): A dictionary of arguments, including the optional `where`
                 argument used to filter the queryset of objects.
+            fields (bool | dict | None): The fields requested from the output. Only the
+                selected columns and relations are fetched and serialized.
 
         Raises:
             Interruption: If an error occurs while retrieving or serializing the
@@ -209,29 +397,72 @@ class ModelOperationManager:
         """
 
         # arguments
-        where: dict[str, typing.Any] | None = args.get("where")
         limit: int | None = args.get("limit")
         offset: int | None = args.get("offset")
+        normalize: bool = args.get("normalize") or False
+        stream: bool = args.get("stream") or False
+        chunkSize: int = args.get("chunkSize") or self.STREAM_CHUNK_SIZE
+        orderBy: list[str | dict[str, typing.Any]] | None = args.get("orderBy")
+        after: str | None = args.get("after")
+        before: str | None = args.get("before")
+        paginate: bool = args.get("paginate") or bool(after or before)
 
         # ...
-        role = self.app.getUserRole(request.user)
-        sr = self.exposedmodel.getSerializerClass(role)
-        select_permission = ModelOperationManager.getPermission(
-            role,
-            "select",
-            self.exposedmodel.rolePermissions,
-            ModelOperationManager.getUserPkFromRequest(request),
-        )
+        requestContext = self.requestContext(request)
+        role, userId = requestContext.role, requestContext.userId
+        select_permission = requestContext.getPermission(self.exposedmodel, "select")
 
-        query = makeQuery(where) if where else None
-        queryset = (
-            self.exposedmodel.model.objects.all()
-            if select_permission["row"] == constants.ALL_ROWS
-            else self.exposedmodel.model.objects.filter(select_permission["row"])
+        queryset = self.selectableRows(select_permission, args)
+
+        readable = (
+            self.meta.fieldSet
+            if select_permission["column"] == constants.ALL_COLUMNS
+            else select_permission["column"]
         )
-        queryset = queryset.filter(query) if query else queryset
+        ordering = self.parseOrdering(orderBy, readable, paginate)
+        if ordering:
+            queryset = self.annotateRanks(queryset, ordering)
+            queryset = queryset.order_by(*self.orderExpressions(ordering))
+
+        pageInfo: types.PageInfoType | None = None
+        if paginate:
+            if not limit:
+                raise exceptions.RequestHandlingError(
+                    "Paginated results require a limit",
+                    errorCode=constants.MISSING_REQUIRED_ARGUMENT,
+                    statusCode=400,
+                )
+
+            if offset or stream:
+                raise exceptions.RequestHandlingError(
+                    "Paginated results can't be offset or streamed",
+                    errorCode=constants.INVALID_REQUEST_BODY,
+                    statusCode=400,
+                    summary="Use the after and before cursors of the page info to move between pages",
+                )
+
+            queryset, pageInfo = self.paginate(
+                queryset, ordering, int(limit), after, before
+            )
+
+        # no data is returned, so there's nothing to fetch
+        if not fields:
+            if pageInfo is None:
+                return None
+            return types.IntentOutput(None, {"pageInfo": pageInfo})
 
-        if limit:
+        selectedFields = freezeFields(fields)
+        sr = self.exposedmodel.getSerializerClass(role, selectedFields, requestContext)
+        valuesSerializer = self.getValuesSerializer(sr)
+
+        if valuesSerializer is None:
+            # only load the selected columns, and the selected relations of all the rows in a fixed
+            # number of queries, instead of querying each row's relations while serializing
+            queryset = self.exposedmodel.getRelationPlan(
+                role, userId, selectedFields, requestContext
+            ).apply(queryset)
+
+        if limit and not paginate:
             offset = offset or 0
 
             # if we have limit = 3 and a list=[1, 2, 3, 4, 5, 6, 7, 8, 9]
@@ -240,7 +471,559 @@ class ModelOperationManager:
             # we get [4, 5, 6], for 2, we get [7, 8, 9]
             queryset = queryset[offset * limit : (offset * limit) + limit]
 
-        return sr(queryset, many=True).data
+        if stream:
+            return self.streamRows(
+                queryset,
+                sr,
+                valuesSerializer,
+                self.relatedRows(requestContext),
+                normalize,
+                int(chunkSize),
+            )
+
+        context = createSerializerContext(normalize)
+
+        if valuesSerializer:
+            data = valuesSerializer.serialize(
+                queryset,
+                self.relatedRows(requestContext),
+                context.get(INCLUDED_CONTEXT),
+            )
+        else:
+            data = sr(queryset, many=True, context=context).data
+
+        if pageInfo is None:
+            return self.withIncluded(data, context)
+        return self.withIncluded(data, context, pageInfo=pageInfo)
+
+    def selectableRows(
+        self,
+        selectPermission: types.SelectPermissionType,
+        args: dict[str, typing.Any],
+    ) -> models.QuerySet:
+        """Returns the rows of the exposed model the select permission allows, filtered with the
+        where structure (checked against the permission's budget) and the prepared query of args"""
+        where: dict[str, typing.Any] | None = args.get("where")
+        preparedQuery: str | None = args.get("query")
+        params: dict[str, typing.Any] = args.get("params") or {}
+
+        budget = selectPermission.get("budget")
+        if where and budget:
+            self.checkQueryBudget(where, budget)
+
+        if where:
+            checkSearchCriteria(self.exposedmodel.model, where)
+
+        query = makeQuery(where) if where else None
+
+        if preparedQuery is not None:
+            prepared = self.bindPreparedQuery(preparedQuery, params)
+            query = query & prepared if query else prepared
+
+        queryset = (
+            self.exposedmodel.model.objects.all()
+            if selectPermission["row"] == constants.ALL_ROWS
+            else self.exposedmodel.model.objects.filter(selectPermission["row"])
+        )
+        return queryset.filter(query) if query else queryset
+
+    def checkQueryBudget(
+        self, where: dict[str, typing.Any], budget: types.QueryBudgetType
+    ) -> None:
+        """Raises a RequestHandlingError if filtering the exposed model with the where
+        structure would exceed the budget. This is worked out from the structure, before
+        any query is run."""
+        exceeded = exceededLimits(analyzeQuery(self.exposedmodel.model, where), budget)
+
+        if exceeded:
+            raise exceptions.RequestHandlingError(
+                "Query is too expensive",
+                errorCode=constants.QUERY_OVER_BUDGET,
+                statusCode=400,
+                summary=f"The where structure {'; '.join(exceeded)}",
+            )
+
+    def bindPreparedQuery(self, name: str, params: dict[str, typing.Any]) -> models.Q:
+        """Returns the Q object of the exposed model's prepared query called name, with params
+        bound to it's parameters"""
+        prepared = self.exposedmodel.preparedQueries.get(name)
+
+        if prepared is None:
+            raise exceptions.RequestHandlingError(
+                f'Query "{name}" does not exist',
+                errorCode=constants.INEXISTENT_QUERY,
+                statusCode=404,
+                summary=f"{self.exposedmodel.name} has no prepared query called {name}",
+            )
+
+        missing = prepared.parameters - params.keys()
+        if missing:
+            raise exceptions.RequestHandlingError(
+                f'Missing parameters for query "{name}": {", ".join(sorted(missing))}',
+                errorCode=constants.MISSING_REQUIRED_ARGUMENT,
+                statusCode=400,
+            )
+
+        unknown = params.keys() - prepared.parameters
+        if unknown:
+            raise exceptions.RequestHandlingError(
+                f'Unknown parameters for query "{name}": {", ".join(sorted(unknown))}',
+                errorCode=constants.UNKNOWN_ARGS,
+                statusCode=400,
+            )
+
+        return prepared.bind(
+            {
+                name: self.cleanParameter(name, value, prepared.lookups[name])
+                for name, value in params.items()
+            }
+        )
+
+    def lookupField(self, lookup: str) -> tuple[models.Field | None, str]:
+        """Returns the field a django lookup (eg. "author__name__exact") compares, and the
+        lookup's name ("exact"). Relations are compared by the primary key of the related model.
+        The field is None when the lookup doesn't end on a field (eg. a transform like published__year)"""
+        *path, name = lookup.split("__")
+        model: type[models.Model] = self.exposedmodel.model
+        field: typing.Any = None
+
+        for part in path:
+            if field is not None:
+                if not field.is_relation:
+                    return None, name
+                model = field.related_model
+
+            try:
+                field = model._meta.pk if part == "pk" else model._meta.get_field(part)
+            except FieldDoesNotExist:
+                return None, name
+
+        if field is not None and field.is_relation:
+            field = (
+                field.target_field
+                if isinstance(field, models.ForeignKey)
+                else field.related_model._meta.pk
+            )
+        return field, name
+
+    def cleanParameter(
+        self, name: str, value: typing.Any, lookups: tuple[str, ...]
+    ) -> typing.Any:
+        """Returns the value of a prepared query's parameter converted by the fields it's compared
+        to (see django's Field.to_python), a list for _in and _nin. Values compared with other
+        criteria (eg. _contains, _search) are kept as they are.
+
+        Raises:
+            RequestHandlingError: if the value isn't valid for one of the fields.
+        """
+        for lookup in lookups:
+            field, lookupName = self.lookupField(lookup)
+            if field is None or not (lookupName in self.CONVERTED_LOOKUPS):
+                continue
+
+            try:
+                if lookupName == "in":
+                    if not isinstance(value, (list, tuple)):
+                        raise ValidationError(f"expected a list, got {value!r}")
+                    value = [field.to_python(item) for item in value]
+                else:
+                    value = field.to_python(value)
+
+            except ValidationError as e:
+                raise exceptions.RequestHandlingError(
+                    f'Invalid value for parameter "{name}": {" ".join(e.messages)}',
+                    errorCode=constants.INVALID_REQUEST_BODY,
+                    statusCode=400,
+                    summary=f"{name} should hold values of {lookup.rsplit('__', 1)[0]}",
+                )
+
+        return value
+
+    def parseOrdering(
+        self,
+        orderBy: list[str | dict[str, typing.Any]] | None,
+        readable: typing.Collection[str],
+        paginate: bool = False,
+    ) -> list[OrderColumn]:
+        """Returns the columns of an orderBy argument. The items of the argument are either a column
+        name, prefixed with "-" for descending order (eg. ["-price", "title"]), or a dict like
+        {"column": "published", "descending": True, "nulls": "last"}, or {"search": "some text"} to order
+        the most relevant rows to the text first (see uql.models.search.SearchRank).
+
+        Rows can only be ordered by columns the role can read, and if the exposed model has strict
+        ordering, by the leading columns of an index (see ModelMeta.isIndexedOrdering). Paginated
+        results are always ordered by the primary key last, so every row has a distinct sort key,
+        and can only be ordered by indexed columns that can't be null."""
+        ordering: list[OrderColumn] = []
+
+        def invalid(message: str, summary: str) -> exceptions.RequestHandlingError:
+            return exceptions.RequestHandlingError(
+                message,
+                errorCode=constants.INVALID_ORDERING,
+                statusCode=400,
+                summary=summary,
+            )
+
+        for i, item in enumerate(orderBy or []):
+            if isinstance(item, str):
+                order = OrderColumn(item.removeprefix("-"), item.startswith("-"))
+            elif "search" in item:
+                getSearchFields(self.exposedmodel.model)
+
+                if paginate:
+                    raise invalid(
+                        f"Can't paginate {self.exposedmodel.name} by search rank",
+                        "Paginated rows can only be ordered by indexed columns that can't be null",
+                    )
+
+                ordering.append(
+                    OrderColumn(
+                        f"uql_rank_{i}",
+                        bool(item.get("descending")),
+                        search=item["search"],
+                    )
+                )
+                continue
+            else:
+                order = OrderColumn(
+                    item["column"], bool(item.get("descending")), item.get("nulls")
+                )
+
+            if not (order.column in self.meta.columnTypes):
+                raise invalid(
+                    f'Can\'t order {self.exposedmodel.name} by "{order.column}"',
+                    "Rows can only be ordered by the columns of the model",
+                )
+
+            if not (order.column in readable):
+                raise PermissionError(f"Unauthorised key in orderBy", 401)
+
+            if paginate:
+                field = self.exposedmodel.model._meta.get_field(order.column)
+
+                if not (order.column in self.meta.indexedColumns) or field.null:
+                    raise invalid(
+                        f'Can\'t paginate {self.exposedmodel.name} by "{order.column}"',
+                        "Paginated rows can only be ordered by indexed columns that can't be null",
+                    )
+
+            ordering.append(order)
+
+        if paginate and not any(order.column == self.meta.pk for order in ordering):
+            ordering.append(OrderColumn(self.meta.pk))
+
+        if self.exposedmodel.strictOrdering and not self.meta.isIndexedOrdering(
+            [(order.column, order.descending) for order in ordering]
+        ):
+            raise invalid(
+                f"Can't order {self.exposedmodel.name} by {', '.join(map(str, ordering))}",
+                "Rows can only be ordered by the leading columns of an index, in the index's order or it's reverse",
+            )
+
+        return ordering
+
+    def annotateRanks(
+        self, queryset: models.QuerySet, ordering: list[OrderColumn]
+    ) -> models.QuerySet:
+        """annotates the queryset with the search ranks the rows are ordered by"""
+        ranks = {
+            order.column: SearchRank(self.exposedmodel.model, order.search)
+            for order in ordering
+            if order.search is not None
+        }
+        return queryset.annotate(**ranks) if ranks else queryset
+
+    @staticmethod
+    def orderExpressions(ordering: list[OrderColumn]) -> list[models.OrderBy]:
+        return [order.expression() for order in ordering]
+
+    def encodeCursor(self, ordering: list[OrderColumn], keys: tuple) -> str:
+        """Returns the opaque cursor of a row with the given sort keys"""
+        cursor = {"orderBy": list(map(str, ordering)), "keys": list(keys)}
+        return base64.urlsafe_b64encode(
+            json.dumps(cursor, cls=DjangoJSONEncoder).encode()
+        ).decode()
+
+    def decodeCursor(self, ordering: list[OrderColumn], cursor: str) -> list:
+        """Returns the sort keys of a cursor from encodeCursor, converted to the column's types
+
+        Raises:
+            RequestHandlingError: if the cursor is invalid, or was created for another ordering.
+        """
+        getField = self.exposedmodel.model._meta.get_field
+
+        try:
+            decoded = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            keys = decoded["keys"]
+
+            if decoded["orderBy"] == list(map(str, ordering)) and len(keys) == len(
+                ordering
+            ):
+                return [
+                    getField(order.column).to_python(key)
+                    for order, key in zip(ordering, keys)
+                ]
+        except (ValueError, TypeError, KeyError, ValidationError):
+            pass
+
+        raise exceptions.RequestHandlingError(
+            "Invalid cursor",
+            errorCode=constants.INVALID_CURSOR,
+            statusCode=400,
+            summary="Cursors can only be used with the orderBy of the page they're from",
+        )
+
+    def paginate(
+        self,
+        queryset: models.QuerySet,
+        ordering: list[OrderColumn],
+        limit: int,
+        after: str | None,
+        before: str | None,
+    ) -> tuple[models.QuerySet, types.PageInfoType]:
+        """Returns the rows of the page of limit rows after (or before) a cursor, and the page info.
+
+        The page is found with the sort keys of the cursor (WHERE (a, b) > (x, y) ORDER BY a, b LIMIT n),
+        instead of skipping rows with OFFSET, so every page costs the same and rows inserted before the
+        cursor don't shift the page. Only the sort keys of the page are read to find it, the returned
+        queryset reads the rows of the page by primary key. Whether there are rows on the other side
+        of the cursor is probed with an EXISTS query, as the row of the cursor may have been deleted.
+        """
+        cursor = before or after
+        pageOrdering = [order.reversed() for order in ordering] if before else ordering
+        rows = queryset
+        behind = False
+
+        if cursor:
+            keys = self.decodeCursor(ordering, cursor)
+            query: models.Q | None = None
+
+            # rows past the cursor: (a > x) or (a = x and b > y) ...
+            for i, order in enumerate(pageOrdering):
+                lookup = "lt" if order.descending else "gt"
+                term = models.Q(**{f"{order.column}__{lookup}": keys[i]}) & models.Q(
+                    **{o.column: keys[j] for j, o in enumerate(pageOrdering[:i])}
+                )
+                query = term if query is None else query | term
+
+            rows = rows.filter(query)
+
+            # the rows at or behind the cursor, the sort keys of paginated rows can't be null
+            behind = queryset.exclude(query).exists()
+
+        columns = [order.column for order in ordering]
+        page = list(
+            rows.order_by(*self.orderExpressions(pageOrdering)).values_list(*columns)[
+                : limit + 1
+            ]
+        )
+
+        more = len(page) > limit
+        page = page[:limit]
+
+        if before:
+            page.reverse()
+
+        pkIndex = columns.index(self.meta.pk)
+        pageInfo: types.PageInfoType = {
+            "hasNextPage": behind if before else more,
+            "hasPreviousPage": more if before else behind,
+            "startCursor": self.encodeCursor(ordering, page[0]) if page else None,
+            "endCursor": self.encodeCursor(ordering, page[-1]) if page else None,
+        }
+
+        return queryset.filter(pk__in=[row[pkIndex] for row in page]), pageInfo
+
+    def recordedFindMany(
+        self,
+        request: Request,
+        args: dict[str, typing.Any],
+        fields: bool | dict | None = True,
+    ):
+        """findMany, recording the lookups it filtered the rows with and how long it took,
+        with the query recorder of the app (see uql.models.advisor.QueryRecorder).
+        Streamed calls are recorded once their stream is exhausted, with the time spent
+        reading the chunks, not the time spent writing them to the client."""
+        start = time.perf_counter()
+        data = self.findMany(request, args, fields)
+        seconds = time.perf_counter() - start
+
+        lookups = queryLookups(args.get("where") or {})
+        prepared = self.exposedmodel.preparedQueries.get(args.get("query") or "")
+
+        if prepared:
+            lookups += queryLookups(prepared.where)
+
+        if not lookups:
+            return data
+
+        def record(seconds: float) -> None:
+            self.app.queryRecorder.record(self.exposedmodel.model, lookups, seconds)
+
+        if isinstance(data, types.IntentStream):
+            return types.IntentStream(
+                self.timedChunks(data.chunks, seconds, record), data.extras
+            )
+
+        record(seconds)
+        return data
+
+    @staticmethod
+    def timedChunks(
+        chunks: typing.Iterable[typing.Sequence[typing.Any]],
+        seconds: float,
+        record: typing.Callable[[float], None],
+    ) -> typing.Iterator[typing.Sequence[typing.Any]]:
+        """yields the chunks of a stream, adding the time spent producing each to seconds,
+        which is passed to record once they've all been produced"""
+        iterator = iter(chunks)
+
+        while True:
+            start = time.perf_counter()
+            chunk = next(iterator, None)
+            seconds += time.perf_counter() - start
+
+            if chunk is None:
+                break
+            yield chunk
+
+        record(seconds)
+
+    def streamRows(
+        self,
+        queryset: models.QuerySet,
+        sr: type[ModelSerializer],
+        valuesSerializer: ValuesSerializer | None,
+        relatedRows: typing.Callable[[type[models.Model]], models.QuerySet],
+        normalize: bool,
+        chunkSize: int,
+    ) -> types.IntentStream:
+        """Returns the serialized rows of the queryset as a stream of chunks of chunkSize rows.
+        The rows are read from the database with QuerySet.iterator as the chunks are produced, and
+        related objects are prefetched for each chunk, so memory use doesn't grow with the number of rows.
+        Normalized objects are collected in the side table, which is sent after the rows."""
+        context = createSerializerContext(normalize)
+        included = context.get(INCLUDED_CONTEXT)
+
+        def chunks() -> typing.Iterator[list]:
+            if valuesSerializer:
+                yield from valuesSerializer.iterate(
+                    queryset, relatedRows, chunkSize, included
+                )
+                return
+
+            rows = queryset.iterator(chunk_size=chunkSize)
+
+            while chunk := list(itertools.islice(rows, chunkSize)):
+                # objects are only reused within a chunk, unless they're collected in the side table
+                chunkContext = context if normalize else createSerializerContext()
+                yield sr(chunk, many=True, context=chunkContext).data
+
+        return types.IntentStream(
+            chunks(), lambda: {} if included is None else {"included": included}
+        )
+
+    def exists(self, request: Request, args: dict[str, typing.Any]) -> dict[str, bool]:
+        """Returns whether the user can select a row of the exposed model that matches the
+        where structure (and prepared query) of args, eg. {"exists": True}.
+        Runs as an EXISTS query, no rows are read."""
+        selectPermission = self.requestContext(request).getPermission(
+            self.exposedmodel, "select"
+        )
+        return {"exists": self.selectableRows(selectPermission, args).exists()}
+
+    def count(self, request: Request, args: dict[str, typing.Any]) -> dict[str, int]:
+        """Returns the number of rows of the exposed model the user can select that match the
+        where structure (and prepared query) of args, eg. {"count": 4}.
+        Runs as a COUNT(*) query, no rows are read."""
+        selectPermission = self.requestContext(request).getPermission(
+            self.exposedmodel, "select"
+        )
+        return {"count": self.selectableRows(selectPermission, args).count()}
+
+    def aggregate(
+        self, request: Request, args: dict[str, typing.Any]
+    ) -> dict[str, typing.Any] | list[dict[str, typing.Any]]:
+        """Aggregates the columns of the rows the user can select, filtered like findMany.
+
+        Every aggregated and grouped column must be readable by the user's role. "*" can be
+        counted to count the rows, and sum and avg only take numeric columns. Without groupBy, the aggregates of all the rows are returned
+        (eg. {"count": {"*": 6}, "sum": {"price": 15}}), else the aggregates of each group, with the
+        values of the grouped columns (eg. [{"group": {"author": 1}, "count": {"*": 3}}, ...]).
+        It runs as a single query.
+        """
+        groupBy: list[str] = args.get("groupBy") or []
+
+        requestContext = self.requestContext(request)
+        role = requestContext.role
+        selectPermission = requestContext.getPermission(self.exposedmodel, "select")
+        readable = (
+            self.meta.fieldSet
+            if selectPermission["column"] == constants.ALL_COLUMNS
+            else selectPermission["column"]
+        )
+
+        def column(name: str) -> str:
+            if not (name in self.meta.columnTypes):
+                raise exceptions.RequestHandlingError(
+                    f'cannot aggregate "{name}" in {self.exposedmodel.name}',
+                    errorCode=constants.UNKNOWN_ARGS,
+                    statusCode=400,
+                )
+            if not (name in readable):
+                raise PermissionError(f"Unauthorised key in aggregate", 401)
+            return name
+
+        # alias -> (function, column), aliases can't clash with the model's fields
+        aggregates: dict[str, tuple[str, str]] = {}
+        expressions: dict[str, models.Aggregate] = {}
+
+        for function, aggregateClass in self.AGGREGATES.items():
+            for name in args.get(function) or []:
+                if function == "count" and name == "*":
+                    target = "pk"
+                else:
+                    target = column(name)
+
+                if (
+                    function in self.NUMERIC_AGGREGATES
+                    and not self.meta.columnTypes[name] in self.NUMERIC_TYPES
+                ):
+                    raise exceptions.RequestHandlingError(
+                        f'cannot {function} "{name}" in {self.exposedmodel.name}',
+                        errorCode=constants.UNKNOWN_ARGS,
+                        statusCode=400,
+                        summary=f"{function} only takes numeric columns",
+                    )
+
+                alias = f"uql_{function}_{len(aggregates)}"
+                aggregates[alias] = (function, name)
+                expressions[alias] = aggregateClass(target)
+
+        if not aggregates:
+            raise exceptions.RequestHandlingError(
+                "Nothing to aggregate",
+                errorCode=constants.MISSING_REQUIRED_ARGUMENT,
+                statusCode=400,
+                summary=f"Pass the columns to aggregate as {', '.join(self.AGGREGATES)}",
+            )
+
+        groups = [column(name) for name in groupBy]
+        queryset = self.selectableRows(selectPermission, args)
+
+        def result(row: dict[str, typing.Any]) -> dict[str, typing.Any]:
+            res: dict[str, typing.Any] = {}
+            if groups:
+                res["group"] = {name: row[name] for name in groups}
+            for alias, (function, name) in aggregates.items():
+                res.setdefault(function, {})[name] = row[alias]
+            return res
+
+        if not groups:
+            return result(queryset.aggregate(**expressions))
+
+        rows = queryset.values(*groups).annotate(**expressions).order_by(*groups)
+        return [result(row) for row in rows]
 
     def _insertSingle(
         self, request: Request, objectData: dict[str, types.JsonData | models.Model]
@@ -271,13 +1054,9 @@ class ModelOperationManager:
         # Use the bulk_create method to insert multiple objects at once, rather than inserting them one at a time. This can significantly improve the performance when inserting a large number of objects.
 
         # get role and permission config
-        role = self.app.getUserRole(request.user)
-        insertPermission = ModelOperationManager.getPermission(
-            role,
-            "insert",
-            self.exposedmodel.rolePermissions,
-            ModelOperationManager.getUserPkFromRequest(request),
-        )
+        requestContext = self.requestContext(request)
+        role = requestContext.role
+        insertPermission = requestContext.getPermission(self.exposedmodel, "insert")
 
         insertPermission["check"] = insertPermission.get("check") or (
             lambda request, obj: True
@@ -289,14 +1068,14 @@ class ModelOperationManager:
         # check if user only included permitted colums in objectData
         # all the fields the user wants to include
         fields = (
-            serializers._getAllModelFields(self.exposedmodel.model)
+            self.meta.fieldSet
             if insertPermission["column"] == constants.ALL_COLUMNS
             else insertPermission["column"]
         )
 
         # an intersection of all the foriegn keys and the fields the user wants to include.
         # we need this to get all the foriegn keys the user wants to include
-        fk_fields = serializers._getModelForiegnFields(self.exposedmodel.model)
+        fk_fields = self.meta.foreignFields
 
         # convert all foriegn keys to actual models
         for key in objectData.keys():
@@ -312,7 +1091,7 @@ class ModelOperationManager:
             # but book.author has to be an Object not a string. so we check to see if Book config
             # has any foriegn key config attached names author, then we map "author-pk"...
             # to it's respective object
-            if key in fk_fields.keys():
+            if key in fk_fields:
                 fk_meta = fk_fields[key]
                 objectData[key] = fk_meta["model"].objects.get(pk=objectData[key])
 
@@ -320,9 +1099,10 @@ class ModelOperationManager:
             # create model
             model = self.exposedmodel.model(**objectData)
             model.save()
+            self.loadRelations(requestContext, [model])
 
             # get model data from select realizers
-            sr = self.exposedmodel.getSerializerClass(role)
+            sr = self.exposedmodel.getSerializerClass(role, context=requestContext)
             return sr(model).data
 
         except BaseException as e:
@@ -358,20 +1138,16 @@ class ModelOperationManager:
     ) -> dict[str, typing.Any]:
         partial: types.PartialUpdateType = args["partial"]
 
-        role = self.app.getUserRole(request.user)
-        updatePermission = ModelOperationManager.getPermission(
-            role,
-            "update",
-            self.exposedmodel.rolePermissions,
-            ModelOperationManager.getUserPkFromRequest(request),
-        )
+        requestContext = self.requestContext(request)
+        role = requestContext.role
+        updatePermission = requestContext.getPermission(self.exposedmodel, "update")
 
         check = updatePermission.get("check") or (lambda request, partial: True)
 
         if not check(request, partial):
             raise PermissionError("Unauthorised update operation", 401)
 
-        sr = self.exposedmodel.getSerializerClass(role)
+        sr = self.exposedmodel.getSerializerClass(role, context=requestContext)
 
         # would raise a Model.DoesNotExist error if not found
         model = (
@@ -383,7 +1159,7 @@ class ModelOperationManager:
         # let's be sure all the keys in partial['fields'] are allowed as per the permission
         # let's get all the fields allowed in the permission
         fields = (
-            serializers._getAllModelFields(self.exposedmodel.model)
+            self.meta.fieldSet
             if updatePermission["column"] == constants.ALL_COLUMNS
             else updatePermission["column"]
         )
@@ -400,6 +1176,7 @@ class ModelOperationManager:
             *self.exposedmodel.fieldsIncludedOnUpdate,
         }
         model.save(update_fields=list(update_fields))
+        self.loadRelations(requestContext, [model])
 
         return sr(model).data
 
@@ -407,13 +1184,9 @@ class ModelOperationManager:
         self, request: Request, args: dict[str, typing.Any]
     ) -> dict[str, typing.Any]:
         partials: list[types.PartialUpdateType] = args["partials"]
-        role = self.app.getUserRole(request.user)
-        updatePermission = ModelOperationManager.getPermission(
-            role,
-            "update",
-            self.exposedmodel.rolePermissions,
-            ModelOperationManager.getUserPkFromRequest(request),
-        )
+        requestContext = self.requestContext(request)
+        role = requestContext.role
+        updatePermission = requestContext.getPermission(self.exposedmodel, "update")
 
         check = updatePermission.get("check") or (lambda request, partial: True)
 
@@ -421,10 +1194,18 @@ class ModelOperationManager:
             raise PermissionError("Unauthorised update operation", 401)
 
         # fetch the serializers that would be used to serialize the model instances
-        sr = self.exposedmodel.getSerializerClass(role)
+        sr = self.exposedmodel.getSerializerClass(role, context=requestContext)
 
         modelInstances: list[models.Model] = []
 
+        # let's be sure all the keys in partial['fields'] are allowed as per the permission
+        # let's get all the fields allowed in the permission
+        fields = (
+            self.meta.fieldSet
+            if updatePermission["column"] == constants.ALL_COLUMNS
+            else updatePermission["column"]
+        )
+
         with transaction.atomic():
             for partial in partials:
                 # would raise a Model.DoesNotExist error if not found
@@ -436,14 +1217,6 @@ class ModelOperationManager:
 
                 modelInstances.append(model)
 
-                # let's be sure all the keys in partial['fields'] are allowed as per the permission
-                # let's get all the fields allowed in the permission
-                fields = (
-                    serializers._getAllModelFields(self.exposedmodel.model)
-                    if updatePermission["column"] == constants.ALL_COLUMNS
-                    else updatePermission["column"]
-                )
-
                 # partial["fields"] must be a subset of fields
                 if not set(partial["fields"]).issubset(fields):
                     raise PermissionError(f"Unauthorised key in update", 401)
@@ -458,17 +1231,15 @@ class ModelOperationManager:
 
                 model.save(update_fields=list(update_fields))
 
+            self.loadRelations(requestContext, modelInstances)
+
             return sr(modelInstances, many=True).data
 
     def delete(self, request: Request, args: dict[str, typing.Any]) -> None:
         pk: types.Pk = args["pk"]
 
-        role = self.app.getUserRole(request.user)
-        deletePermission = ModelOperationManager.getPermission(
-            role,
-            "delete",
-            self.exposedmodel.rolePermissions,
-            ModelOperationManager.getUserPkFromRequest(request),
+        deletePermission = self.requestContext(request).getPermission(
+            self.exposedmodel, "delete"
         )
 
         model = (
@@ -480,126 +1251,206 @@ class ModelOperationManager:
         model.delete()
         return None
 
-    def generateHandlers(self) -> dict[str, "ApiFunction"]:
-        name = self.exposedmodel.name
+    def findSpec(self) -> FunctionSpec:
+        return FunctionSpec(
+            self.find,
+            selectsFields=True,
+            pure=True,
+            description=f"Select a single row from {self.exposedmodel.name}",
+            rule=lambda: dto.Dictionary(
+                {
+                    "pk": dto.Any([dto.String(min_length=1), dto.Number(minimum=1)]),
+                    "normalize": dto.Boolean(nullable=True),
+                }
+            ),
+        )
 
-        rel = {
-            ModelOperations.SELECT: (
-                f"models.{name}.find",
-                ApiFunction(
-                    self.find,
-                    description=f"Select a single row from {name}",
-                    rule=dto.Dictionary(
-                        {
-                            "pk": dto.Any(
-                                [dto.String(min_length=1), dto.Number(minimum=1)]
-                            )
-                        }
+    def findManySpec(self) -> FunctionSpec:
+        recorded = getattr(self.app, "queryRecorder", None) is not None
+
+        return FunctionSpec(
+            self.recordedFindMany if recorded else self.findMany,
+            selectsFields=True,
+            pure=True,
+            rule=lambda: dto.Dictionary(
+                {
+                    "where": dto.Dictionary(nullable=True, allow_unknown_keys=True),
+                    "query": dto.String(nullable=True, min_length=1),
+                    "params": dto.Dictionary(nullable=True, allow_unknown_keys=True),
+                    "limit": dto.Number(nullable=True, validators=[lambda x: x > 0]),
+                    "offset": dto.Number(nullable=True, validators=[lambda x: x > 0]),
+                    "normalize": dto.Boolean(nullable=True),
+                    "stream": dto.Boolean(nullable=True),
+                    "chunkSize": dto.Number(
+                        nullable=True, integer_only=True, minimum=1
                     ),
-                ),
-            ),
-            ModelOperations.SELECT_MANY: (
-                f"models.{name}.findmany",
-                ApiFunction(
-                    self.findMany,
-                    rule=dto.Dictionary(
-                        {
-                            "where": dto.Dictionary(allow_unknown_keys=True),
-                            "limit": dto.Number(
-                                nullable=True, validators=[lambda x: x > 0]
-                            ),
-                            "offset": dto.Number(
-                                nullable=True, validators=[lambda x: x > 0]
-                            ),
-                        }
+                    "orderBy": dto.List(
+                        dto.Any(
+                            [
+                                dto.String(min_length=1),
+                                dto.Dictionary(
+                                    {
+                                        "column": dto.String(min_length=1),
+                                        "descending": dto.Boolean(nullable=True),
+                                        "nulls": dto.String(
+                                            nullable=True, pattern="^(first|last)$"
+                                        ),
+                                    }
+                                ),
+                                dto.Dictionary(
+                                    {
+                                        "search": dto.String(min_length=1),
+                                        "descending": dto.Boolean(nullable=True),
+                                    }
+                                ),
+                            ]
+                        ),
+                        nullable=True,
                     ),
-                    description=f"Select many rows from {name}. offset requires limit to be useful, although it is not enforced",
-                ),
+                    "paginate": dto.Boolean(nullable=True),
+                    "after": dto.String(nullable=True, min_length=1),
+                    "before": dto.String(nullable=True, min_length=1),
+                }
             ),
-            ModelOperations.INSERT: (
-                f"models.{name}.insert",
-                ApiFunction(
-                    self.insert,
-                    # requiredArgs=("object",),
-                    rule=dto.Dictionary(
+            description=f"Select many rows from {self.exposedmodel.name}. offset requires limit to be useful, although it is not enforced. query calls a prepared query by name, with the values of it's parameters in params. stream sends the rows in chunks of chunkSize rows, as they're read from the database. paginate returns limit rows after (or before) a cursor, ordered by orderBy, with the cursors of the page in pageInfo. an orderBy item with search orders the most relevant rows to it's text first",
+        )
+
+    def aggregateSpec(self) -> FunctionSpec:
+        return FunctionSpec(
+            self.aggregate,
+            pure=True,
+            rule=lambda: dto.Dictionary(
+                {
+                    "where": dto.Dictionary(nullable=True, allow_unknown_keys=True),
+                    "query": dto.String(nullable=True, min_length=1),
+                    "params": dto.Dictionary(nullable=True, allow_unknown_keys=True),
+                    "groupBy": dto.List(dto.String(min_length=1), nullable=True),
+                    **{
+                        function: dto.List(dto.String(min_length=1), nullable=True)
+                        for function in self.AGGREGATES
+                    },
+                }
+            ),
+            description=f'Aggregate the columns of the rows of {self.exposedmodel.name} that match the where structure. count, sum, avg, min and max take the columns to aggregate (count takes "*" to count rows, sum and avg only take numeric columns), grouped by the groupBy columns if given',
+        )
+
+    def existsSpec(self) -> FunctionSpec:
+        return FunctionSpec(
+            self.exists,
+            pure=True,
+            rule=self.filterRule,
+            description=f"Check if a row of {self.exposedmodel.name} matches the where structure",
+        )
+
+    def countSpec(self) -> FunctionSpec:
+        return FunctionSpec(
+            self.count,
+            pure=True,
+            rule=self.filterRule,
+            description=f"Count the rows of {self.exposedmodel.name} that match the where structure",
+        )
+
+    @staticmethod
+    def filterRule() -> dto.Dictionary:
+        """the rule of the arguments that filter rows, see selectableRows"""
+        return dto.Dictionary(
+            {
+                "where": dto.Dictionary(nullable=True, allow_unknown_keys=True),
+                "query": dto.String(nullable=True, min_length=1),
+                "params": dto.Dictionary(nullable=True, allow_unknown_keys=True),
+            }
+        )
+
+    def insertSpec(self) -> FunctionSpec:
+        return FunctionSpec(
+            self.insert,
+            # requiredArgs=("object",),
+            rule=lambda: dto.Dictionary(
+                {
+                    "object": dto.Dictionary(
                         {
-                            "object": dto.Dictionary(
-                                {
-                                    field: dto.Any(_name=field, nullable=True)
-                                    for field in _getAllModelFields(
-                                        self.exposedmodel.model
-                                    )
-                                }
-                            )
+                            field: dto.Any(_name=field, nullable=True)
+                            for field in self.meta.fields
                         }
-                    ),
-                    description=f"Insert an object into {name}",
-                ),
+                    )
+                }
             ),
-            ModelOperations.UPDATE: (
-                f"models.{name}.update",
-                ApiFunction(
-                    self.update,
-                    description=f"Update the fields of {name}",
-                    rule=dto.Dictionary(
+            description=f"Insert an object into {self.exposedmodel.name}",
+        )
+
+    def updateSpec(self) -> FunctionSpec:
+        return FunctionSpec(
+            self.update,
+            description=f"Update the fields of {self.exposedmodel.name}",
+            rule=lambda: dto.Dictionary(
+                {
+                    "partial": dto.Dictionary(
                         {
-                            "partial": dto.Dictionary(
+                            "pk": dto.Any([dto.Number(), dto.String()]),
+                            "fields": dto.Dictionary(
                                 {
-                                    "pk": dto.Any([dto.Number(), dto.String()]),
-                                    "fields": dto.Dictionary(
-                                        {
-                                            field: dto.Any(nullable=True, _name=field)
-                                            for field in _getAllModelFields(
-                                                self.exposedmodel.model
-                                            )
-                                        }
-                                    ),
+                                    field: dto.Any(nullable=True, _name=field)
+                                    for field in self.meta.fields
                                 }
-                            )
+                            ),
                         }
-                    ),
-                ),
-            ),
-            ModelOperations.DELETE: (
-                f"models.{name}.delete",
-                ApiFunction(
-                    self.delete,
-                    description=f"Delete a(n) {name} instance with the given pk",
-                    rule=dto.Dictionary({"pk": dto.Any([dto.String(), dto.Number()])}),
-                ),
+                    )
+                }
             ),
-            ModelOperations.UPDATE_MANY: (
-                f"models.{name}.updatemany",
-                ApiFunction(
-                    self.updateMany,
-                    description=f"Updates many objects at the same time",
-                    rule=dto.Dictionary(
-                        {
-                            "partials": dto.List(
-                                dto.Dictionary(
+        )
+
+    def deleteSpec(self) -> FunctionSpec:
+        return FunctionSpec(
+            self.delete,
+            description=f"Delete a(n) {self.exposedmodel.name} instance with the given pk",
+            rule=lambda: dto.Dictionary({"pk": dto.Any([dto.String(), dto.Number()])}),
+        )
+
+    def updateManySpec(self) -> FunctionSpec:
+        return FunctionSpec(
+            self.updateMany,
+            description=f"Updates many objects at the same time",
+            rule=lambda: dto.Dictionary(
+                {
+                    "partials": dto.List(
+                        dto.Dictionary(
+                            {
+                                "pk": dto.Any([dto.Number(), dto.String()]),
+                                "fields": dto.Dictionary(
                                     {
-                                        "pk": dto.Any([dto.Number(), dto.String()]),
-                                        "fields": dto.Dictionary(
-                                            {
-                                                field: dto.Any(
-                                                    nullable=True, _name=field
-                                                )
-                                                for field in _getAllModelFields(
-                                                    self.exposedmodel.model
-                                                )
-                                            }
-                                        ),
+                                        field: dto.Any(nullable=True, _name=field)
+                                        for field in self.meta.fields
                                     }
-                                )
-                            )
-                        }
-                    ),
-                ),
+                                ),
+                            }
+                        )
+                    )
+                }
             ),
+        )
+
+    def generateHandlers(self) -> dict[str, LazyApiFunction]:
+        """Returns the intents for this model's published operations.
+        Each intent holds a stub, the ApiFunction is only created the first time the
+        intent is dispatched to. Describing it only builds it's rule."""
+        name = self.exposedmodel.name
+
+        # building a spec doesn't build the function's rule
+        rel: dict[ModelOperations, tuple[str, FunctionSpec]] = {
+            ModelOperations.SELECT: ("find", self.findSpec()),
+            ModelOperations.SELECT_MANY: ("findmany", self.findManySpec()),
+            ModelOperations.AGGREGATE: ("aggregate", self.aggregateSpec()),
+            ModelOperations.EXISTS: ("exists", self.existsSpec()),
+            ModelOperations.COUNT: ("count", self.countSpec()),
+            ModelOperations.INSERT: ("insert", self.insertSpec()),
+            ModelOperations.UPDATE: ("update", self.updateSpec()),
+            ModelOperations.DELETE: ("delete", self.deleteSpec()),
+            ModelOperations.UPDATE_MANY: ("updatemany", self.updateManySpec()),
         }
-        # filter functions to publish based on configuration
-        for i in [*rel.keys()]:
-            if not (i in self.exposedmodel.operations):
-                del rel[i]
 
-        return dict([pair for pair in rel.values()])
+        # filter functions to publish based on configuration
+        return {
+            f"models.{name}.{intent}": LazyApiFunction.fromSpec(spec)
+            for operation, (intent, spec) in rel.items()
+            if operation in self.exposedmodel.operations
+        }
@@ -0,0 +1,158 @@
+import typing
+import threading
+
+from uql import types
+from django.db import models
+from django.db.models.fields import reverse_related
+
+
+class ModelMeta:
+    def __init__(self, model: type[models.Model]) -> None:
+        """
+        An index of the field information uql reads from a model's _meta.
+        It's built once per model (see `getModelMeta`), so handlers don't walk
+        model._meta.get_fields() on every call, or for every row.
+
+        Attributes:
+            model (type[models.Model]): the indexed model.
+            fields (tuple[str, ...]): names of the model's fields, including forward foreign keys,
+                but not reverse relations.
+            fieldSet (frozenset[str]): the same names, for membership checks.
+            foreignFields (dict[str, types.ForeignKeyType]): forward foreign keys and reverse relations,
+                with the related model and the cardinality of the relation ("OBJECT" or "LIST").
+            columnTypes (dict[str, str]): the internal type (eg. "CharField") of each concrete field.
+            singleRelations (frozenset[str]): relations that point to a single object (foreign keys
+                and one-to-one relations, both ways), these can be joined with select_related.
+            manyToManyFields (frozenset[str]): forward many-to-many fields.
+            reverseForeignKeys (dict[str, str]): reverse foreign key (and one-to-one) relations, with the
+                name of the field that points back to this model from the related model.
+            relatedLookups (dict[str, str]): the lookup that points back to this model from the related
+                model, for every relation (eg. "books" for Book.tags if Tag.books is the reverse relation).
+            relatedModels (dict[str, type[models.Model]]): the related model of every relation.
+            indexes (tuple[tuple[tuple[str, bool], ...], ...]): the (column, descending) pairs of each index
+                of the model: primary and foreign keys, unique and db_index fields, Meta.indexes,
+                unique_together and index_together.
+            indexedColumns (frozenset[str]): concrete fields filters can find with an index, the
+                leading column of an index.
+            pk (str): name of the primary key field.
+        """
+        self.model = model
+
+        allFields = model._meta.get_fields(include_hidden=False)
+
+        self.fields: tuple[str, ...] = tuple(
+            field.name for field in allFields if isinstance(field, models.Field)
+        )
+        self.fieldSet: frozenset[str] = frozenset(self.fields)
+
+        self.foreignFields: dict[str, types.ForeignKeyType] = {
+            field.name: {
+                "model": typing.cast(type[models.Model], field.related_model),
+                "type": "OBJECT" if field.many_to_one else "LIST",
+            }
+            for field in allFields
+            if isinstance(field, (models.ForeignKey, reverse_related.ForeignObjectRel))
+        }
+
+        self.singleRelations: frozenset[str] = frozenset(
+            field.name
+            for field in allFields
+            if field.is_relation and (field.many_to_one or field.one_to_one)
+        )
+
+        self.manyToManyFields: frozenset[str] = frozenset(
+            field.name
+            for field in allFields
+            if isinstance(field, models.ManyToManyField)
+        )
+
+        self.reverseForeignKeys: dict[str, str] = {
+            field.name: field.field.name
+            for field in allFields
+            if isinstance(field, reverse_related.ForeignObjectRel)
+            and (field.one_to_many or field.one_to_one)
+        }
+
+        self.relatedLookups: dict[str, str] = {
+            field.name: (
+                field.field.name
+                if isinstance(field, reverse_related.ForeignObjectRel)
+                else field.related_query_name()
+            )
+            for field in allFields
+            if field.is_relation and field.related_model is not None
+        }
+
+        self.relatedModels: dict[str, type[models.Model]] = {
+            field.name: typing.cast(type[models.Model], field.related_model)
+            for field in allFields
+            if field.is_relation and field.related_model is not None
+        }
+
+        self.pk: str = model._meta.pk.name
+
+        # the (column, descending) pairs of each index: single column indexes of primary keys,
+        # foreign keys, unique and db_index fields, Meta.indexes and unique/index together
+        self.indexes: tuple[tuple[tuple[str, bool], ...], ...] = (
+            *(
+                ((field.name, False),)
+                for field in model._meta.concrete_fields
+                if field.primary_key or field.unique or field.db_index
+            ),
+            *(
+                tuple((name.lstrip("-"), name.startswith("-")) for name in fields)
+                for fields in (
+                    *(index.fields for index in model._meta.indexes),
+                    *model._meta.unique_together,
+                    *getattr(model._meta, "index_together", ()),
+                )
+                if fields
+            ),
+        )
+
+        # an index can only be used for it's leading column
+        self.indexedColumns: frozenset[str] = frozenset(
+            index[0][0] for index in self.indexes
+        )
+
+        self.columnTypes: dict[str, str] = {
+            field.name: field.get_internal_type()
+            for field in model._meta.concrete_fields
+        }
+
+    def isIndexedOrdering(self, ordering: typing.Sequence[tuple[str, bool]]) -> bool:
+        """Returns whether an index can read rows in the given (column, descending) order
+        without sorting them: the columns are the leading columns of an index, in the index's
+        directions or all reversed. The primary key can follow the columns, as it breaks the
+        ties of the index's entries in most databases."""
+        if len(ordering) > 1 and ordering[-1][0] == self.pk:
+            ordering = ordering[:-1]
+
+        for index in self.indexes:
+            prefix = index[: len(ordering)]
+
+            if [column for column, _ in prefix] != [column for column, _ in ordering]:
+                continue
+
+            directions = [
+                d == indexed for (_, d), (_, indexed) in zip(ordering, prefix)
+            ]
+            if all(directions) or not any(directions):
+                return True
+
+        return False
+
+
+_metas: dict[type[models.Model], ModelMeta] = {}
+_metasLock = threading.Lock()
+
+
+def getModelMeta(model: type[models.Model]) -> ModelMeta:
+    """returns the metadata index of a model, building it the first time it's requested"""
+    meta = _metas.get(model)
+
+    if meta is None:
+        with _metasLock:
+            meta = _metas.get(model) or ModelMeta(model)
+            _metas[model] = meta
+    return meta
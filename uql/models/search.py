@@ -0,0 +1,351 @@
+import typing
+
+from uql import constants
+from uql import exceptions
+from uql.models.meta import getModelMeta
+from uql.utils.query import criterions
+from uql.utils.query import conjunctions
+
+from django.db import models
+from django.db import connections
+from django.db import router
+from django.db.models.signals import post_save
+from django.db.models.signals import post_delete
+
+# the text search configuration of postgres indexes and queries
+SEARCH_CONFIG = "simple"
+
+# the fields searched with the _search criterion, by model
+_searchFields: dict[type[models.Model], tuple[str, ...]] = {}
+
+
+def registerSearchFields(
+    model: type[models.Model], fields: typing.Sequence[str]
+) -> None:
+    """Makes the fields of model searchable with the _search criterion, and keeps the
+    model's search index up to date when rows are saved or deleted. The index is built
+    by `buildSearchIndex` (or `python manage.py uqlsearch`).
+
+    Rows changed without saving the model (eg. QuerySet.update, bulk_create) are only
+    indexed when the index is rebuilt. sqlite search tables keep the primary key of the row
+    as their rowid, so the model's primary key has to be an integer."""
+    pk = model._meta.pk
+    if not isinstance(pk.target_field if pk.is_relation else pk, models.IntegerField):
+        raise TypeError(
+            f"{model._meta.label} can't be searched, it's primary key is not an integer"
+        )
+
+    for field in fields:
+        if not isinstance(
+            model._meta.get_field(field), (models.CharField, models.TextField)
+        ):
+            raise TypeError(f"{model._meta.label}.{field} is not a text field")
+
+    _searchFields[model] = tuple(fields)
+
+    # _search filters on the primary key of the searched model (see SearchLookup). the lookup
+    # is registered on the field itself where django supports it (4.2+), else on it's class
+    pk.register_lookup(SearchLookup)
+
+    uid = f"uql-search-{model._meta.label_lower}"
+    post_save.connect(_indexRow, sender=model, dispatch_uid=uid)
+    post_delete.connect(_unindexRow, sender=model, dispatch_uid=uid)
+
+
+def getSearchFields(model: type[models.Model]) -> tuple[str, ...]:
+    """returns the searchable fields of model
+
+    Raises:
+        RequestHandlingError: if model has no searchable fields.
+    """
+    fields = _searchFields.get(model)
+
+    if not fields:
+        raise exceptions.RequestHandlingError(
+            f"{model._meta.label_lower} can't be searched",
+            errorCode=constants.UNKNOWN_ARGS,
+            statusCode=400,
+            summary=(
+                "Only exposed models with searchFields can be searched with _search"
+            ),
+        )
+    return fields
+
+
+def checkSearchCriteria(
+    model: type[models.Model] | None, query: typing.Any, column: str | None = None
+) -> None:
+    """Checks the _search criteria of a where structure filtering model are placed on the
+    model or one of it's relations (eg. {"author": {"_search": "a"}}), and search models with
+    searchable fields. column is the field of model the criteria of query apply to, model is
+    None below a field that isn't a relation.
+
+    Raises:
+        RequestHandlingError: if a _search criterion is placed on a field that isn't a relation
+            (eg. {"title": {"_search": "a"}}), or searches a model without searchable fields.
+    """
+    # invalid structures are reported by makeQuery
+    if not isinstance(query, dict):
+        return
+
+    for item, value in query.items():
+        if item == "_search":
+            searched = model
+            if model is not None and column is not None:
+                searched = getModelMeta(model).relatedModels.get(column)
+
+            if searched is None:
+                raise exceptions.RequestHandlingError(
+                    f"{column} can't be searched",
+                    errorCode=constants.INVALID_REQUEST_BODY,
+                    statusCode=400,
+                    summary="_search is placed on a model or a relation, not on a column",
+                )
+            getSearchFields(searched)
+
+        elif item in conjunctions:
+            if isinstance(value, list):
+                for i in value:
+                    checkSearchCriteria(model, i, column)
+
+        elif not (item in criterions):
+            subModel, subColumn = model, column
+
+            for part in item.split("__"):
+                if subModel is not None and subColumn is not None:
+                    subModel = getModelMeta(subModel).relatedModels.get(subColumn)
+                subColumn = part
+
+            checkSearchCriteria(subModel, value, subColumn)
+
+
+def searchableModels() -> list[type[models.Model]]:
+    """returns the models with searchable fields"""
+    return list(_searchFields)
+
+
+def _searchTable(model: type[models.Model]) -> str:
+    return f"uql_search_{model._meta.db_table}"
+
+
+def _quote(connection, name: str) -> str:
+    return connection.ops.quote_name(name)
+
+
+def searchWords(text: typing.Any) -> list[str]:
+    """returns the words of a searched text
+
+    Raises:
+        RequestHandlingError: if text isn't a string with at least one word.
+    """
+    words = text.split() if isinstance(text, str) else []
+
+    if not words:
+        raise exceptions.RequestHandlingError(
+            "Nothing to search for",
+            errorCode=constants.INVALID_REQUEST_BODY,
+            statusCode=400,
+            summary="_search and search ordering take a text with at least one word",
+        )
+    return words
+
+
+def _matchText(text: str) -> str:
+    """returns an fts5 query matching rows with every word of text"""
+    return " ".join('"' + word.replace('"', '""') + '"' for word in searchWords(text))
+
+
+def _escapeLike(word: str) -> str:
+    """returns word with the LIKE wildcards (% and _) and the escape character (!) escaped,
+    ! is used as backslashes are escape characters of mysql's string literals"""
+    return word.replace("!", "!!").replace("%", "!%").replace("_", "!_")
+
+
+def _document(model: type[models.Model], connection) -> str:
+    """returns the postgres tsvector expression of the searchable fields, the same
+    expression is indexed, so queries can use the index"""
+    columns = " || ' ' || ".join(
+        f"coalesce({_quote(connection, model._meta.get_field(field).column)}, '')"
+        for field in getSearchFields(model)
+    )
+    return f"to_tsvector('{SEARCH_CONFIG}', {columns})"
+
+
+def _isBuilt(model: type[models.Model], connection) -> bool:
+    """whether the sqlite search table of model exists, read from the database's catalog
+    each time, as other processes (eg. python manage.py uqlsearch) build and drop it"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s",
+            [_searchTable(model)],
+        )
+        return cursor.fetchone() is not None
+
+
+def buildSearchIndex(model: type[models.Model], using: str | None = None) -> None:
+    """(Re)builds the search index of model's searchable fields.
+    sqlite gets an fts5 table holding the text of every row, postgres an expression GIN
+    index on the table. Other databases are searched without an index."""
+    connection = connections[using or router.db_for_write(model)]
+    fields = getSearchFields(model)
+    table = _quote(connection, model._meta.db_table)
+    pk = _quote(connection, model._meta.pk.column)
+    columns = [_quote(connection, model._meta.get_field(f).column) for f in fields]
+
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            search = _quote(connection, _searchTable(model))
+            cursor.execute(f"DROP TABLE IF EXISTS {search}")
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE {search} USING fts5({', '.join(columns)})"
+            )
+            cursor.execute(
+                f"INSERT INTO {search}(rowid, {', '.join(columns)}) "
+                f"SELECT {pk}, {', '.join(columns)} FROM {table}"
+            )
+
+        elif connection.vendor == "postgresql":
+            index = _quote(connection, f"{_searchTable(model)}_idx")
+            document = _document(model, connection)
+            cursor.execute(f"DROP INDEX IF EXISTS {index}")
+            cursor.execute(f"CREATE INDEX {index} ON {table} USING GIN ({document})")
+
+
+def dropSearchIndex(model: type[models.Model], using: str | None = None) -> None:
+    """Drops the search index of model, it's rows are then searched without an index"""
+    connection = connections[using or router.db_for_write(model)]
+
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            cursor.execute(
+                f"DROP TABLE IF EXISTS {_quote(connection, _searchTable(model))}"
+            )
+
+        elif connection.vendor == "postgresql":
+            index = _quote(connection, f"{_searchTable(model)}_idx")
+            cursor.execute(f"DROP INDEX IF EXISTS {index}")
+
+
+def _indexRow(sender: type[models.Model], instance: models.Model, using: str, **kwargs):
+    # postgres indexes are kept up to date by the database
+    connection = connections[using]
+    if connection.vendor != "sqlite" or not _isBuilt(sender, connection):
+        return
+
+    fields = getSearchFields(sender)
+    search = _quote(connection, _searchTable(sender))
+    columns = ", ".join(
+        _quote(connection, sender._meta.get_field(f).column) for f in fields
+    )
+    placeholders = ", ".join(["%s"] * len(fields))
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {search} WHERE rowid = %s", [instance.pk])
+        cursor.execute(
+            f"INSERT INTO {search}(rowid, {columns}) VALUES (%s, {placeholders})",
+            [instance.pk, *[getattr(instance, field) for field in fields]],
+        )
+
+
+def _unindexRow(
+    sender: type[models.Model], instance: models.Model, using: str, **kwargs
+):
+    connection = connections[using]
+    if connection.vendor != "sqlite" or not _isBuilt(sender, connection):
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {_quote(connection, _searchTable(sender))} WHERE rowid = %s",
+            [instance.pk],
+        )
+
+
+def searchQuery(
+    model: type[models.Model], connection, text: str
+) -> tuple[str, list[typing.Any]]:
+    """returns the sql selecting the primary keys of model's rows that match text,
+    and it's params"""
+    words = searchWords(text)
+    table = _quote(connection, model._meta.db_table)
+    pk = _quote(connection, model._meta.pk.column)
+
+    if connection.vendor == "sqlite" and _isBuilt(model, connection):
+        search = _quote(connection, _searchTable(model))
+        return f"SELECT rowid FROM {search} WHERE {search} MATCH %s", [_matchText(text)]
+
+    if connection.vendor == "postgresql":
+        return (
+            f"SELECT {pk} FROM {table} WHERE {_document(model, connection)} "
+            f"@@ plainto_tsquery('{SEARCH_CONFIG}', %s)",
+            [text],
+        )
+
+    # without an index, rows with every word in one of the fields match. the LIKE wildcards
+    # of the words are escaped, so they match themselves
+    fields = getSearchFields(model)
+    columns = [_quote(connection, model._meta.get_field(f).column) for f in fields]
+    conditions = " AND ".join(
+        "("
+        + " OR ".join(f"UPPER({c}) LIKE UPPER(%s) ESCAPE '!'" for c in columns)
+        + ")"
+        for _ in words
+    )
+    params = [f"%{_escapeLike(word)}%" for word in words for _ in fields]
+    return f"SELECT {pk} FROM {table} WHERE {conditions}", params
+
+
+class SearchRank(models.Expression):
+    output_field = models.FloatField()
+
+    def __init__(self, model: type[models.Model], text: str) -> None:
+        """The relevance of the rows of model (not aliased in the query) to text, lower
+        is more relevant. Rows that don't match text rank after the rows that do."""
+        searchWords(text)
+        super().__init__()
+        self.model = model
+        self.text = text
+
+    def as_sql(self, compiler, connection):
+        table = _quote(connection, self.model._meta.db_table)
+        pk = _quote(connection, self.model._meta.pk.column)
+
+        if connection.vendor == "sqlite" and _isBuilt(self.model, connection):
+            search = _quote(connection, _searchTable(self.model))
+            return (
+                f"COALESCE((SELECT bm25({search}) FROM {search} "
+                f"WHERE {search} MATCH %s AND {search}.rowid = {table}.{pk}), 0)",
+                [_matchText(self.text)],
+            )
+
+        if connection.vendor == "postgresql":
+            return (
+                f"-ts_rank({_document(self.model, connection)}, "
+                f"plainto_tsquery('{SEARCH_CONFIG}', %s))",
+                [self.text],
+            )
+
+        return "0", []
+
+
+class SearchLookup(models.Lookup):
+    """pk__uqlsearch="text": matches the rows whose searchable fields (see
+    registerSearchFields) hold every word of text. The searched model is the model of
+    the primary key, or the related model of a foreign key (when django reads author__pk
+    from the author_id column)"""
+
+    lookup_name = "uqlsearch"
+    prepare_rhs = False
+
+    def get_prep_lookup(self):
+        # blank texts are rejected when the rows are filtered, not when they're read
+        searchWords(self.rhs)
+        return super().get_prep_lookup()
+
+    def as_sql(self, compiler, connection):
+        lhs, params = self.process_lhs(compiler, connection)
+        field = self.lhs.target
+        model = field.related_model if field.is_relation else field.model
+
+        sql, searchParams = searchQuery(model, connection, self.rhs)
+        return f"{lhs} IN ({sql})", [*params, *searchParams]
@@ -1,21 +1,27 @@
 import typing
+import threading
+from collections import OrderedDict
 from colorama import Fore, Style
 
 from uql import types
 from uql import constants
 from uql.exceptions import InexistentExposedModel
+from uql.models.meta import ModelMeta
+from uql.models.meta import getModelMeta
+from uql.utils.select import FrozenFields
 
 from django.db import models
-from django.db.models.fields import reverse_related
+from django.db.models import Prefetch
 
 from rest_framework.serializers import ModelSerializer
 
 if typing.TYPE_CHECKING:
     # Imports only used for type checking
     from . import ExposedModel
+    from .context import RequestContext
 
 
-def _raisePermissionError(role: str):
+def _raisePermissionError(role: str) -> typing.NoReturn:
     """
     Raises a PermissionError with a message indicating that the specified role is not allowed to select the current model.
 
@@ -30,16 +36,11 @@ def _raisePermissionError(role: str):
 def _getModelForiegnFields(
     modelClass: type[models.Model],
 ) -> dict[str, types.ForeignKeyType]:
-    foreign_keys: dict[str, types.ForeignKeyType] = {}
-    for field in modelClass._meta.get_fields(include_hidden=False):
-        if isinstance(field, models.ForeignKey) or isinstance(
-            field, reverse_related.ForeignObjectRel
-        ):
-            foreign_keys[field.name] = {
-                "model": field.related_model,
-                "type": "OBJECT" if field.many_to_one else "LIST",
-            }
-    return foreign_keys
+    """
+    Returns the forward foreign keys and reverse relations of the model, with the related model
+    and the cardinality of each relation. The returned dict is shared, and should not be modified.
+    """
+    return getModelMeta(modelClass).foreignFields
 
 
 def _getAllModelFields(
@@ -48,7 +49,7 @@ def _getAllModelFields(
     """
     Retrieves a list of field names for the specified Django model class.
 
-    This function returns a list of field names for the model class, including both regular fields and foreign key fields. It excludes hidden fields and fields that do not have a related_name attribute.
+    This function returns a list of field names for the model class, including both regular fields and foreign key fields. It excludes hidden fields and reverse relations.
 
     Args:
     modelClass (type[models.Model]): a Django model class
@@ -57,22 +58,246 @@ def _getAllModelFields(
     Returns:
     list[str]: a list of field names for the model"""
 
-    return [
-        field.name
-        for field in modelClass._meta.get_fields(include_hidden=False)
-        if isinstance(field, models.Field)
-        or (
-            isinstance(field, models.ForeignKey)
-            and getattr(field, "related_name", None)
-            and include_foriegn_keys
-        )
-    ]
+    return list(getModelMeta(modelClass).fields)
+
+
+# the maximum number of generated serializer classes kept in the cache
+SERIALIZER_CACHE_SIZE = 512
+
+# the serializer classes of the expanded relations of a serializer, by relation name, with
+# whether the relation is a list. None for relations the role can't select
+NestedSerializers: typing.TypeAlias = dict[
+    str, tuple[type[ModelSerializer], bool] | None
+]
+
+SerializerCacheKey: typing.TypeAlias = tuple[
+    str,
+    "ExposedModel",
+    frozenset[tuple[type[models.Model], int]],
+    FrozenFields | None,
+    tuple[str, ...],
+    tuple[tuple[str, tuple[type[ModelSerializer], bool] | None], ...],
+]
+
+# generated serializer classes keyed by (role, exposed model, recursive relation, fields,
+# serialized columns, nested serializers), least recently used classes are dropped first
+# once the cache is full
+_serializerCache: OrderedDict[SerializerCacheKey, type[ModelSerializer]] = OrderedDict()
+_serializerCacheLock = threading.Lock()
+
+
+def clearSerializerCache(role: str | None = None) -> None:
+    """
+    Drops generated serializer classes from the cache.
+
+    Args:
+    role (str, optional): only drop the classes created for this role. Defaults to None, which drops every class.
+    """
+    with _serializerCacheLock:
+        if role is None:
+            _serializerCache.clear()
+            return
+
+        for key in [key for key in _serializerCache if key[0] == role]:
+            del _serializerCache[key]
 
 
 def createSerializerClass(
     role: str,
     exposedmodel: "ExposedModel",
     _recursive_relation: dict[type[models.Model], int] | None = None,
+    fields: FrozenFields | None = None,
+    context: "RequestContext | None" = None,
+) -> type[ModelSerializer]:
+    """
+    Returns the model serializer class for the given role and exposed model, see `_createSerializerClass`.
+
+    The serialized columns come from the role's select permission, bound to the user of the request
+    context if given (the permission the rows and relations are loaded with, see `planRelations`),
+    else from the permission function called without a user. The serializers of the relations are
+    created the same way.
+
+    Classes are cached, so the serializer (and the serializers of it's relations) are only created once
+    for each role, exposed model, recursive relation, fields and permitted columns. Cached classes of a
+    role are dropped when the role's permission is changed with ExposedModel.addPermission.
+
+    Raises:
+        PermissionError: if the role has no select permission on the exposed model.
+    """
+    recursive_relation = _recursive_relation or {}
+    selectPermission = _selectPermission(role, exposedmodel, None, context)
+
+    if not selectPermission:
+        _raisePermissionError(role)
+
+    meta = getModelMeta(exposedmodel.model)
+    columns = _selectColumns(meta, selectPermission, fields)
+    nested = _nestedSerializers(
+        role, exposedmodel, recursive_relation, fields, columns, context
+    )
+
+    key: SerializerCacheKey = (
+        role,
+        exposedmodel,
+        frozenset(recursive_relation.items()),
+        fields,
+        tuple(columns),
+        tuple(nested.items()),
+    )
+
+    with _serializerCacheLock:
+        serializerClass = _serializerCache.get(key)
+        if serializerClass:
+            _serializerCache.move_to_end(key)
+            return serializerClass
+
+    serializerClass = _createSerializerClass(role, exposedmodel, columns, nested)
+
+    with _serializerCacheLock:
+        _serializerCache[key] = serializerClass
+        while len(_serializerCache) > SERIALIZER_CACHE_SIZE:
+            _serializerCache.popitem(last=False)
+
+    return serializerClass
+
+
+def _nestedSerializers(
+    role: str,
+    exposedmodel: "ExposedModel",
+    recursive_relation: dict[type[models.Model], int],
+    fields: FrozenFields | None,
+    columns: list[str],
+    context: "RequestContext | None",
+) -> NestedSerializers:
+    """returns the serializer classes of the relations of the exposed model that are serialized
+    as objects: the permitted and selected relations to exposed models, up to RELATION_RECURSIVE_DEPTH"""
+    nested: NestedSerializers = {}
+
+    for name, fk in getModelMeta(exposedmodel.model).foreignFields.items():
+        # only create a serializer for the foreign key if the user has requested it
+        if not (name in columns):
+            continue
+
+        relationFields = _relationFields(fields, name)
+
+        if relationFields is False:
+            # the relation was selected, but not expanded
+            continue
+
+        if (
+            recursive_relation.get(fk["model"], 0)
+            > exposedmodel.RELATION_RECURSIVE_DEPTH
+        ):
+            # skip this model if it's been referenced up to RELATION_RECURSIVE_DEPTH
+            # from this node up from the parent's model root
+            continue
+
+        try:
+            # related exposed model
+            related_em = exposedmodel.getExposedModel(fk["model"])
+        except InexistentExposedModel:
+            print(
+                Fore.RED,
+                f"EXPOSED MODEL: {fk['model']} not found",
+                Style.RESET_ALL,
+            )
+            continue
+
+        try:
+            # create a serializer for the related exposed model
+            related_em_sr = createSerializerClass(
+                role,
+                related_em,
+                # update the recursive relation dictionary to include the current model
+                _recursive_relation={
+                    **recursive_relation,
+                    fk["model"]: recursive_relation.get(fk["model"], 0) + 1,
+                },
+                fields=relationFields,
+                context=context,
+            )
+        except PermissionError:
+            # raised when the relation is serialized
+            nested[name] = None
+            continue
+
+        nested[name] = (related_em_sr, fk["type"] == "LIST")
+
+    return nested
+
+
+# serializer context keys, see `createSerializerContext`
+IDENTITY_MAP_CONTEXT = "uql.identityMap"
+INCLUDED_CONTEXT = "uql.included"
+
+
+def createSerializerContext(
+    normalize: bool = False,
+) -> dict[str, typing.Any]:
+    """
+    Returns the context of a serialization (ie. a response), passed to the serializers from `createSerializerClass`.
+
+    Objects are serialized once per context: an object that appears many times in the output
+    (eg. the author of many books) is serialized the first time, then the same data is reused.
+
+    Args:
+    normalize (bool): if set, related objects are not nested. they're added to a side table, the
+        context's INCLUDED_CONTEXT (by exposed model name and pk), and replaced by their pk.
+    """
+    context: dict[str, typing.Any] = {IDENTITY_MAP_CONTEXT: {}}
+
+    if normalize:
+        context[INCLUDED_CONTEXT] = {}
+    return context
+
+
+def _isNested(serializer: ModelSerializer) -> bool:
+    """returns true if the serializer is a field of another model serializer"""
+    parent = serializer.parent
+
+    while parent is not None:
+        if isinstance(parent, ModelSerializer):
+            return True
+        parent = parent.parent
+    return False
+
+
+def _selectColumns(
+    meta: ModelMeta,
+    selectPermission: types.SelectPermissionType,
+    fields: FrozenFields | None,
+) -> list[str]:
+    """returns the permitted columns, limited to the selected fields if any"""
+    columns = (
+        list(meta.fields)
+        if selectPermission["column"] == constants.ALL_COLUMNS
+        else typing.cast(list[str], selectPermission["column"])
+    )
+
+    if fields is None:
+        return columns
+
+    selected = {key for key, _ in fields}
+    return [column for column in columns if column in selected]
+
+
+def _relationFields(
+    fields: FrozenFields | None, name: str
+) -> FrozenFields | None | typing.Literal[False]:
+    """returns the fields selected from a relation: None for every field,
+    or False if the relation should not be expanded"""
+    if fields is None:
+        return None
+
+    selection = dict(fields)[name]
+    return None if selection is True else selection
+
+
+def _createSerializerClass(
+    role: str,
+    exposedmodel: "ExposedModel",
+    columns: list[str],
+    nested: NestedSerializers,
 ) -> type[ModelSerializer]:
     """
     Creates a model serializer class based on the given user role and operation type. The serializer produced will
@@ -83,89 +308,219 @@ def createSerializerClass(
     Args:
         role (str): the user's role (e.g. USER, ADMIN, ANONYMOUS).
         exposedmodel (ExposedModel): the exposed model for which the serializer is being created.
-        _recursive_relation (dict[type[models.Model], int], optional): a dictionary containing all the models that have
-            been called before this one in a linear manner, with each model traversing all the way up directly to its
-            parent. This is used to prevent infinite relationship loops, where a foreign model also references the
-            parent model in its serializer.
-
-    Raises:
-        TypeError: if the operation is invalid.
-        PermissionError: if the role is not sufficient for its operation.
+        columns (list[str]): the columns the role is permitted to access, limited to the fields selected by the
+            request if any (see `_selectColumns`).
+        nested (NestedSerializers): the serializers of the relations serialized as objects, see `_nestedSerializers`.
+            the other relations are serialized as primary keys.
 
     Returns:
         type[ModelSerializer]: the serializer class.
     """
 
-    recursive_relation = _recursive_relation or {}
-
-    # get the permission function for the given role
-    permissionFunction = exposedmodel.rolePermissions.get(role)
-
-    if not permissionFunction:
-        _raisePermissionError(role)
-
-    # we do not need to pass the userid as we only need the "select" permission
-    # to fetch the columns that the user is permitted to access
-    permissionObject = permissionFunction(None)
-    selectPermission = permissionObject.get("select")
-
-    if not selectPermission:
-        _raisePermissionError(role)
-
     class Sr(ModelSerializer):
         class Meta:
             model = exposedmodel.model
 
             # if the user has permission to access all columns, include all fields in the serializer
-            # otherwise, only include the columns specified in the permissions
-            fields = (
-                _getAllModelFields(exposedmodel.model)
-                if selectPermission["column"] == constants.ALL_COLUMNS
-                else selectPermission["column"]
-            )
+            # otherwise, only include the columns specified in the permissions.
+            # only the selected columns are included when fields are selected
+            fields = columns
 
         def get_fields(self):
             # get already defined fields from serializer class
             fields = super().get_fields()
 
-            # create serializers for defined foreignkeys
-            # and inject them into serializer fields
-            fk_meta_objects = _getModelForiegnFields(exposedmodel.model)
-            for name, fk in fk_meta_objects.items():
-                # only create a serializer for the foreign key if the user has requested it
-                if name in Sr.Meta.fields:
-                    if (
-                        recursive_relation.get(fk["model"], 0)
-                        > exposedmodel.RELATION_RECURSIVE_DEPTH
-                    ):
-                        # skip this model if it's been referenced up to RELATION_RECURSIVE_DEPTH
-                        # from this node up from the parent's model root
-                        continue
-
-                    try:
-                        # related exposed model
-                        related_em = exposedmodel.getExposedModel(fk["model"])
-                    except InexistentExposedModel:
-                        print(
-                            Fore.RED,
-                            f"EXPOSED MODEL: {fk['model']} not found",
-                            Style.RESET_ALL,
-                        )
-                        continue
-
-                    # create a serializer for the related exposed model
-                    related_em_sr = createSerializerClass(
-                        role,
-                        related_em,
-                        # update the recursive relation dictionary to include the current model
-                        _recursive_relation={
-                            **recursive_relation,
-                            fk["model"]: recursive_relation.get(fk["model"], 0) + 1,
-                        },
-                    )
-
-                    # add the serializer for the related exposed model to the fields of the current serializer
-                    fields[name] = related_em_sr(many=fk["type"] == "LIST")
+            # inject the serializers of the foreign keys into serializer fields
+            for name, serializer in nested.items():
+                if serializer is None:
+                    _raisePermissionError(role)
+
+                related_em_sr, many = serializer
+                fields[name] = related_em_sr(many=many)
             return fields
 
+        def to_representation(self, instance):
+            identityMap: dict | None = self.context.get(IDENTITY_MAP_CONTEXT)
+
+            if identityMap is None:
+                return super().to_representation(instance)
+
+            included: dict | None = self.context.get(INCLUDED_CONTEXT)
+            normalized = included is not None and _isNested(self)
+
+            key = (exposedmodel.model, instance.pk, Sr)
+            data = identityMap.get(key)
+
+            if data is None:
+                data = identityMap[key] = super().to_representation(instance)
+
+                if normalized:
+                    # the same object may be selected with different fields at different places
+                    included.setdefault(exposedmodel.name, {}).setdefault(
+                        instance.pk, {}
+                    ).update(data)
+
+            return instance.pk if normalized else data
+
     return Sr
+
+
+class RelationPlan(typing.NamedTuple):
+    """lookups that load the data serialized for a model, relative to that model"""
+
+    selectRelated: list[str]
+    prefetchRelated: list[str | Prefetch]
+
+    # the columns loaded from the database, including the columns of joined relations
+    only: list[str]
+
+    def apply(self, queryset: models.QuerySet) -> models.QuerySet:
+        if self.selectRelated:
+            queryset = queryset.select_related(*self.selectRelated)
+        if self.prefetchRelated:
+            queryset = queryset.prefetch_related(*self.prefetchRelated)
+        return queryset.only(*self.only)
+
+
+def _prefixLookup(prefix: str, lookup: str | Prefetch) -> str | Prefetch:
+    if isinstance(lookup, Prefetch):
+        return Prefetch(
+            f"{prefix}__{lookup.prefetch_through}", queryset=lookup.queryset
+        )
+    return f"{prefix}__{lookup}"
+
+
+def _loadedColumns(meta: ModelMeta, columns: list[str]) -> list[str]:
+    """returns the database columns needed to serialize the given fields"""
+    known = meta.fieldSet | set(meta.foreignFields)
+
+    # fields that are not model fields (eg. properties) may read any column
+    if any(not (column in known) for column in columns):
+        return list(meta.columnTypes)
+
+    return [
+        meta.pk,
+        *[c for c in columns if c in meta.columnTypes and c != meta.pk],
+    ]
+
+
+def _selectPermission(
+    role: str,
+    exposedmodel: "ExposedModel",
+    userId: types.Pk | None,
+    context: "RequestContext | None",
+) -> types.SelectPermissionType | None:
+    """returns the select permission of role on the exposed model, from the request context if given"""
+    if context is not None:
+        return context.selectPermission(exposedmodel)
+
+    permissionFunction = exposedmodel.rolePermissions.get(role)
+    return permissionFunction(userId).get("select") if permissionFunction else None
+
+
+def planRelations(
+    role: str,
+    exposedmodel: "ExposedModel",
+    userId: types.Pk | None = None,
+    _recursive_relation: dict[type[models.Model], int] | None = None,
+    fields: FrozenFields | None = None,
+    context: "RequestContext | None" = None,
+) -> RelationPlan:
+    """
+    Plans the select_related and prefetch_related lookups needed to serialize the given model with
+    the serializer from `createSerializerClass`, so the nested serializers don't query each row's
+    relations one by one, and the columns to load, so unserialized columns are never fetched.
+
+    It walks the relations the same way the serializer does (permitted and selected columns,
+    registered exposed models and RELATION_RECURSIVE_DEPTH). Single object relations are joined
+    with select_related, other relations are prefetched. Prefetched relations to exposed models
+    are filtered with the row query of the related model's select permission.
+
+    Args:
+        role (str): the user's role.
+        exposedmodel (ExposedModel): the exposed model being serialized.
+        userId (types.Pk, optional): the user's pk, passed to the permission functions for the row queries.
+        fields (FrozenFields, optional): the fields selected by the request. Defaults to every field.
+        context (RequestContext, optional): the context of the request, the permissions are read from it
+            instead of calling the permission functions again.
+
+    Returns:
+        RelationPlan: the lookups, relative to the exposed model.
+    """
+
+    recursive_relation = _recursive_relation or {}
+    meta = getModelMeta(exposedmodel.model)
+    selectRelated: list[str] = []
+    prefetchRelated: list[str | Prefetch] = []
+
+    selectPermission = _selectPermission(role, exposedmodel, userId, context)
+
+    # the serializer raises a PermissionError for this
+    if not selectPermission:
+        return RelationPlan(selectRelated, prefetchRelated, list(meta.columnTypes))
+
+    columns = _selectColumns(meta, selectPermission, fields)
+    only = _loadedColumns(meta, columns)
+
+    # many-to-many fields that are serialized as a list of primary keys
+    prefetchRelated.extend([name for name in meta.manyToManyFields if name in columns])
+
+    for name, fk in meta.foreignFields.items():
+        if not (name in columns):
+            continue
+
+        nested = name in meta.singleRelations
+        relationFields = _relationFields(fields, name)
+        related_em: "ExposedModel | None" = None
+
+        if (
+            relationFields is not False
+            and recursive_relation.get(fk["model"], 0)
+            <= exposedmodel.RELATION_RECURSIVE_DEPTH
+        ):
+            try:
+                related_em = exposedmodel.getExposedModel(fk["model"])
+            except InexistentExposedModel:
+                pass
+
+        if related_em is None:
+            # serialized as primary key(s) by the serializer
+            if not nested:
+                prefetchRelated.append(name)
+            continue
+
+        plan = planRelations(
+            role,
+            related_em,
+            userId,
+            _recursive_relation={
+                **recursive_relation,
+                fk["model"]: recursive_relation.get(fk["model"], 0) + 1,
+            },
+            fields=typing.cast(FrozenFields | None, relationFields),
+            context=context,
+        )
+
+        if nested:
+            selectRelated.append(name)
+            selectRelated.extend([f"{name}__{i}" for i in plan.selectRelated])
+            prefetchRelated.extend(
+                [_prefixLookup(name, i) for i in plan.prefetchRelated]
+            )
+            only.extend([f"{name}__{i}" for i in plan.only])
+            continue
+
+        # only prefetch the related rows the user is permitted to select
+        relatedPermission = _selectPermission(role, related_em, userId, context)
+
+        queryset = related_em.model.objects.all()
+        if relatedPermission and relatedPermission["row"] != constants.ALL_ROWS:
+            queryset = queryset.filter(relatedPermission["row"])
+
+        # the prefetched rows are matched to their parent with the field pointing back to it
+        if name in meta.reverseForeignKeys:
+            plan.only.append(meta.reverseForeignKeys[name])
+
+        prefetchRelated.append(Prefetch(name, queryset=plan.apply(queryset)))
+
+    return RelationPlan(selectRelated, prefetchRelated, only)
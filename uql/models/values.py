@@ -0,0 +1,345 @@
+import typing
+import weakref
+import threading
+import itertools
+from collections import defaultdict
+
+from uql.models.meta import ModelMeta
+from uql.models.meta import getModelMeta
+
+from django.db import models
+from rest_framework import fields as drfFields
+from rest_framework import relations
+from rest_framework.serializers import ListSerializer
+from rest_framework.serializers import ModelSerializer
+
+# returns the queryset of the rows of a related model the user is permitted to select
+RelatedRowsFactory: typing.TypeAlias = typing.Callable[
+    [type[models.Model]], models.QuerySet
+]
+
+# a row read with QuerySet.values()
+Row: typing.TypeAlias = dict[str, typing.Any]
+
+# the values serializer of each serializer class, None if it can't have one.
+# serializer classes can be evicted from their cache, so they're referenced weakly
+_valuesSerializers: "weakref.WeakKeyDictionary[type[ModelSerializer], ValuesSerializer | None]" = (
+    weakref.WeakKeyDictionary()
+)
+_valuesSerializersLock = threading.Lock()
+
+# serializer fields that return the database value as is
+_IDENTITY_FIELDS = (
+    drfFields.CharField,
+    drfFields.EmailField,
+    drfFields.SlugField,
+    drfFields.URLField,
+    drfFields.IntegerField,
+    drfFields.BigIntegerField,
+    drfFields.BooleanField,
+    drfFields.FloatField,
+)
+
+# serializer fields that need the model instance, and not just the column value
+_INSTANCE_FIELDS = (
+    drfFields.FileField,
+    drfFields.ModelField,
+    drfFields.ReadOnlyField,
+    drfFields.HiddenField,
+    drfFields.SerializerMethodField,
+)
+
+
+class UnsupportedField(Exception):
+    """raised when a serializer has a field that can't be read from QuerySet.values()"""
+
+
+class _Context:
+    def __init__(
+        self, relatedRows: RelatedRowsFactory, included: dict | None = None
+    ) -> None:
+        """
+        The state of a single ValuesSerializer.serialize call.
+
+        Args:
+            relatedRows (RelatedRowsFactory): returns the permitted rows of a related model.
+            included (dict, optional): the side table of normalized related objects, by exposed model name and pk.
+                Related objects are not nested if it's given.
+        """
+        self.relatedRows = relatedRows
+        self.included = included
+
+        # the loaded rows of each batch, grouped by the parent's pk
+        self.loaded: dict[_Batch, dict[typing.Any, list]] = {}
+
+        # nested objects, serialized once by (model, pk, serializer class)
+        self.identityMap: dict[tuple, dict[str, typing.Any]] = {}
+
+
+class _Batch:
+    def __init__(
+        self,
+        model: type[models.Model],
+        lookup: str,
+        level: "_Level | None",
+    ) -> None:
+        """
+        A many valued relation, loaded for all the rows of a level in one query.
+
+        Args:
+            model (type[models.Model]): the related model.
+            lookup (str): the lookup that points back to the parent model from the related model.
+            level (_Level | None): the level of the nested serializer, or None if the relation
+                is serialized as a list of primary keys.
+        """
+        self.model = model
+        self.lookup = lookup
+        self.level = level
+
+
+class _Level:
+    def __init__(self, serializer: ModelSerializer, prefix: str = "") -> None:
+        """
+        The columns and relations of a serializer, read from the rows of a values() query.
+        Single object relations are joined, so their columns are read from the same rows, with
+        a prefix (eg. "author__name"); other relations are loaded in batches.
+
+        Args:
+            serializer (ModelSerializer): the (nested) serializer instance.
+            prefix (str): the prefix of the values() keys of this level.
+
+        Raises:
+            UnsupportedField: if a field of the serializer can't be read from values().
+        """
+        model = typing.cast(type[models.Model], serializer.Meta.model)
+        meta = getModelMeta(model)
+
+        self.meta: ModelMeta = meta
+        self.serializerClass = type(serializer)
+
+        # the exposed model name, see ExposedModel.getModelName
+        self.name = model._meta.label_lower
+        self.pkKey = f"{prefix}{meta.pk}"
+        self.values: dict[str, None] = {self.pkKey: None}
+        self.batches: list[_Batch] = []
+        self.readers: list[
+            tuple[str, typing.Callable[[Row, _Context], typing.Any]]
+        ] = []
+
+        # joined relations whose batches are read from the same rows
+        self.joined: list[_Level] = []
+
+        for name, field in serializer.fields.items():
+            if field.source != name:
+                raise UnsupportedField(name)
+            self.readers.append((name, self._compileField(name, field, prefix)))
+
+    def _compileField(
+        self, name: str, field: drfFields.Field, prefix: str
+    ) -> typing.Callable[[Row, _Context], typing.Any]:
+        meta = self.meta
+        key = f"{prefix}{name}"
+
+        if isinstance(field, ModelSerializer):
+            # single object relation, joined
+            child = _Level(field, f"{key}__")
+            self.values.update(child.values)
+            self.joined.append(child)
+
+            return lambda row, context: (
+                None if row[child.pkKey] is None else child.nested(row, context)
+            )
+
+        if isinstance(field, ListSerializer) and isinstance(
+            field.child, ModelSerializer
+        ):
+            relatedModel = meta.foreignFields[name]["model"]
+            batch = _Batch(relatedModel, meta.relatedLookups[name], _Level(field.child))
+            return self._batchReader(batch)
+
+        if isinstance(field, relations.ManyRelatedField) and isinstance(
+            field.child_relation, relations.PrimaryKeyRelatedField
+        ):
+            # serialized as a list of primary keys
+            relatedModel = typing.cast(
+                type[models.Model], meta.model._meta.get_field(name).related_model
+            )
+            batch = _Batch(relatedModel, meta.relatedLookups[name], None)
+            return self._batchReader(batch)
+
+        if isinstance(field, relations.PrimaryKeyRelatedField):
+            # values() reads a relation as the related primary key
+            self.values[key] = None
+            return lambda row, context: row[key]
+
+        if isinstance(field, drfFields.Field) and not isinstance(
+            field,
+            (relations.RelatedField, relations.ManyRelatedField, *_INSTANCE_FIELDS),
+        ):
+            if not (name in meta.columnTypes):
+                raise UnsupportedField(name)
+
+            self.values[key] = None
+
+            if type(field) in _IDENTITY_FIELDS:
+                return lambda row, context: row[key]
+
+            represent = field.to_representation
+
+            # null values are not passed to the serializer field
+            return lambda row, context: (
+                None if row[key] is None else represent(row[key])
+            )
+
+        raise UnsupportedField(name)
+
+    def _batchReader(
+        self, batch: _Batch
+    ) -> typing.Callable[[Row, _Context], typing.Any]:
+        self.batches.append(batch)
+        pkKey = self.pkKey
+        # the same related rows may be read for several rows, eg. the books of a joined author
+        return lambda row, context: list(context.loaded[batch].get(row[pkKey], ()))
+
+    def load(self, rows: list[Row], context: _Context) -> None:
+        """loads the batched relations of the given rows, and of the joined relations"""
+        for child in self.joined:
+            child.load(rows, context)
+
+        if not self.batches:
+            return
+
+        pks = {row[self.pkKey] for row in rows} - {None}
+
+        for batch in self.batches:
+            grouped: defaultdict[typing.Any, list] = defaultdict(list)
+            context.loaded[batch] = grouped
+
+            if not pks:
+                continue
+
+            lookup = {f"{batch.lookup}__in": pks}
+
+            if batch.level is None:
+                # the related primary keys are not filtered by the row permissions
+                for parent, pk in batch.model.objects.filter(**lookup).values_list(
+                    batch.lookup, "pk"
+                ):
+                    grouped[parent].append(pk)
+                continue
+
+            related = list(
+                context.relatedRows(batch.model)
+                .filter(**lookup)
+                .values(*{**batch.level.values, batch.lookup: None})
+            )
+            batch.level.load(related, context)
+
+            for row in related:
+                grouped[row[batch.lookup]].append(batch.level.nested(row, context))
+
+    def build(self, row: Row, context: _Context) -> dict[str, typing.Any]:
+        return {name: read(row, context) for name, read in self.readers}
+
+    def nested(self, row: Row, context: _Context) -> typing.Any:
+        """builds a related object, or returns it's pk if the output is normalized"""
+        pk = row[self.pkKey]
+        key = (self.meta.model, pk, self.serializerClass)
+        data = context.identityMap.get(key)
+
+        if data is None:
+            data = context.identityMap[key] = self.build(row, context)
+
+            if context.included is not None:
+                context.included.setdefault(self.name, {}).setdefault(pk, {}).update(
+                    data
+                )
+
+        return data if context.included is None else pk
+
+
+class ValuesSerializer:
+    def __init__(self, serializerClass: type[ModelSerializer]) -> None:
+        """
+        A serializer that reads rows with QuerySet.values() instead of loading model instances,
+        and builds the same data as the given serializer class (from `createSerializerClass`).
+
+        The columns, relations and nesting are read from the serializer's fields, so the same
+        column permissions, selected fields and RELATION_RECURSIVE_DEPTH apply. Single object
+        relations are joined in the rows query, every other relation is loaded with one query
+        for all the rows.
+
+        Raises:
+            UnsupportedField: if a field of the serializer can't be read from values(),
+                eg. file fields, properties or method fields.
+        """
+        self.serializerClass = serializerClass
+        self.root = _Level(serializerClass())
+
+    @staticmethod
+    def forSerializerClass(
+        serializerClass: type[ModelSerializer],
+    ) -> "ValuesSerializer | None":
+        """returns the values serializer of a serializer class, or None if the serializer
+        has fields values() can't read. it's only created once per serializer class"""
+        if serializerClass in _valuesSerializers:
+            return _valuesSerializers[serializerClass]
+
+        valuesSerializer: ValuesSerializer | None
+        try:
+            valuesSerializer = ValuesSerializer(serializerClass)
+        except UnsupportedField:
+            valuesSerializer = None
+
+        with _valuesSerializersLock:
+            return _valuesSerializers.setdefault(serializerClass, valuesSerializer)
+
+    def serialize(
+        self,
+        queryset: models.QuerySet,
+        relatedRows: RelatedRowsFactory,
+        included: dict | None = None,
+    ) -> list[dict[str, typing.Any]]:
+        """
+        Serializes the rows of the queryset.
+
+        Args:
+            queryset (models.QuerySet): the filtered (and sliced) queryset of the model.
+            relatedRows (RelatedRowsFactory): returns the permitted rows of a related model,
+                used to filter nested lists of related objects.
+            included (dict, optional): if given, related objects are added to this side table
+                (by exposed model name and pk) and replaced by their pk, see `createSerializerContext`.
+
+        Returns:
+            list[dict[str, typing.Any]]: the serialized rows.
+        """
+        rows = list(queryset.values(*self.root.values))
+        return self._serializeRows(rows, _Context(relatedRows, included))
+
+    def iterate(
+        self,
+        queryset: models.QuerySet,
+        relatedRows: RelatedRowsFactory,
+        chunkSize: int,
+        included: dict | None = None,
+    ) -> typing.Iterator[list[dict[str, typing.Any]]]:
+        """
+        Serializes the rows of the queryset in chunks of chunkSize rows, reading them from the
+        database as they're needed. see `serialize` for the arguments.
+
+        Unless the output is normalized, nested objects are reused within a chunk, and not
+        across chunks, so the memory used doesn't grow with the number of rows.
+        """
+        rows = queryset.values(*self.root.values).iterator(chunk_size=chunkSize)
+        context = _Context(relatedRows, included)
+
+        while chunk := list(itertools.islice(rows, chunkSize)):
+            if included is None:
+                context = _Context(relatedRows)
+            yield self._serializeRows(chunk, context)
+
+    def _serializeRows(
+        self, rows: list[Row], context: _Context
+    ) -> list[dict[str, typing.Any]]:
+        self.root.load(rows, context)
+        return [self.root.build(row, context) for row in rows]
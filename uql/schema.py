@@ -0,0 +1,66 @@
+import json
+import typing
+import hashlib
+
+from rest_framework.renderers import JSONRenderer
+
+if typing.TYPE_CHECKING:
+    from .functions import ApiFunction
+    from .functions import LazyApiFunction
+
+
+def _computeEtag(data: typing.Any) -> str:
+    """Returns a strong etag from the canonical json of the given data"""
+    canonical = json.dumps(data, sort_keys=True, separators=(",", ":"), default=str)
+    return f'"{hashlib.sha256(canonical.encode()).hexdigest()[:32]}"'
+
+
+class SerializedSchema(typing.NamedTuple):
+    data: dict[str, typing.Any]
+    etag: str
+    content: bytes
+
+    @staticmethod
+    def create(
+        data: dict[str, typing.Any], renderer: JSONRenderer
+    ) -> "SerializedSchema":
+        return SerializedSchema(
+            data=data, etag=_computeEtag(data), content=renderer.render(data)
+        )
+
+
+class SchemaDocument:
+    def __init__(
+        self, root: typing.Mapping[str, "ApiFunction | LazyApiFunction"]
+    ) -> None:
+        """The serialized schema of an intent root.
+
+        The document, and the schema of each intent in it, is serialized once and
+        kept with a content hash that's used as it's etag. Since the root is
+        read-only, the document can be shared by every request served by the root.
+
+        Args:
+            root (typing.Mapping[str, ApiFunction | LazyApiFunction]): the intent root to describe
+        """
+        renderer = JSONRenderer()
+        schema = {key: {**val.toJson(), "name": key} for key, val in root.items()}
+
+        # the whole schema, and the schema of each single intent
+        self.full = SerializedSchema.create({"schema": schema or None}, renderer)
+        self.intents = {
+            key: SerializedSchema.create({"schema": {key: val}}, renderer)
+            for key, val in schema.items()
+        }
+
+    @staticmethod
+    def matchesEtag(ifNoneMatch: str | None, etag: str) -> bool:
+        """Checks an If-None-Match header value against an etag.
+        Uses the weak comparison, as required for GET requests."""
+        if not ifNoneMatch:
+            return False
+
+        if ifNoneMatch.strip() == "*":
+            return True
+
+        candidates = [tag.strip() for tag in ifNoneMatch.split(",")]
+        return etag in [tag[2:] if tag.startswith("W/") else tag for tag in candidates]
@@ -11,6 +11,33 @@ IntentResult: typing.TypeAlias = (
 )
 
 
+class IntentOutput(typing.NamedTuple):
+    """An intent handler's output, with extra keys for the response body (eg. "included").
+    The data is selected with the requested fields, the extras are sent as they are."""
+
+    data: IntentResult
+    extras: dict[str, typing.Any]
+
+
+class IntentStream:
+    def __init__(
+        self,
+        chunks: typing.Iterable[typing.Sequence[typing.Any]],
+        extras: typing.Callable[[], dict[str, typing.Any]] | None = None,
+    ) -> None:
+        """An intent handler's output that is streamed to the client, instead of being built in memory.
+        The response is the same as a regular response, with the data being a list: the items of each
+        chunk are selected with the requested fields, and written to the list as the chunk is produced.
+
+        Args:
+            chunks (typing.Iterable[typing.Sequence[typing.Any]]): lists of items, produced lazily.
+            extras (typing.Callable[[], dict[str, typing.Any]], optional): returns extra keys for the
+                response body, called once every chunk has been written.
+        """
+        self.chunks = chunks
+        self.extras = extras or dict
+
+
 class RequestErrorType(typing.TypedDict):
     message: str
     errorCode: int | str | None
@@ -32,6 +59,19 @@ class ResponseBodyType(typing.TypedDict):
     warning: NotRequired[str | None]
     statusCode: int
 
+    # related objects of normalized model outputs, by exposed model name and pk
+    included: NotRequired[dict[str, dict[Pk, typing.Any]]]
+
+    # cursors of a paginated findmany output
+    pageInfo: NotRequired["PageInfoType"]
+
+
+class PageInfoType(typing.TypedDict):
+    hasNextPage: bool
+    hasPreviousPage: bool
+    startCursor: str | None
+    endCursor: str | None
+
 
 class ForeignKeyType(typing.TypedDict):
     """data structure for foreign keys"""
@@ -40,6 +80,18 @@ class ForeignKeyType(typing.TypedDict):
     type: typing.Literal["LIST"] | typing.Literal["OBJECT"]
 
 
+class QueryBudgetType(typing.TypedDict, total=False):
+    """limits on the where structures a role can filter with, checked before the query is run.
+    limits that are not set are not checked (see uql.models.cost)"""
+
+    maxDepth: int  # how deeply the structure can be nested
+    maxJoins: int  # how many relations can be traversed
+    maxCriteria: int  # how many criteria (eg. _eq, _gt) the structure can hold
+    maxInSize: int  # how many values an _in or _nin list can hold
+    allowRegex: bool  # whether _regex can be used
+    allowUnindexed: bool  # whether columns without an index can be filtered
+
+
 class SelectPermissionType(typing.TypedDict):
     """data structure for permission unit"""
 
@@ -48,6 +100,9 @@ class SelectPermissionType(typing.TypedDict):
     ]  # these are the columns, permitted to be read
     row: typing.Literal["ALL_ROWS"] | models.Q  # queries the rows that could be read
 
+    # limits on the where structures used to filter the rows
+    budget: NotRequired[QueryBudgetType]
+
 
 class DeletePermissionType(typing.TypedDict):
     row: typing.Literal["ALL_ROWS"] | models.Q  # queries the row that could be deleted
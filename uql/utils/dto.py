@@ -279,6 +279,11 @@ class Dictionary(Rule):
         self.max_length = max_length
 
     def toJson(self) -> dict[str, typing.Any]:
+        # name the child rules the same way validate does, so the output doesn't
+        # depend on whether or not a value has been validated before
+        for key, rule in self.rules.items():
+            rule.name = f"{self.name}.{key}"
+
         return {
             "type": "dictionary",
             "rules": {key: rule.toJson() for key, rule in self.rules.items()},
@@ -384,6 +389,8 @@ class List(Rule):
         self.max_length = max_length
 
     def toJson(self) -> dict[str, typing.Any]:
+        self.element_rule.name = f"{self.name}[]"
+
         return {
             "type": "list",
             "element_rule": self.element_rule.toJson(),
@@ -462,6 +469,9 @@ class Any(Rule):
         ), "Two rules, or None are required to use this class"
 
     def toJson(self) -> dict[str, typing.Any]:
+        for rule in self.rules:
+            rule.name = self.name
+
         return {
             "type": "any",
             "rules": [rule.toJson() for rule in self.rules],
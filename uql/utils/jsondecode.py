@@ -0,0 +1,28 @@
+# json decoding for request bodies.
+# uses orjson when it's installed, and falls back to the standard library
+import json
+import typing
+
+JsonDecoder: typing.TypeAlias = typing.Callable[[bytes | str], typing.Any]
+
+
+def _stdlibLoads(data: bytes | str) -> typing.Any:
+    return json.loads(data)
+
+
+# the fastest decoder available
+loads: JsonDecoder
+
+try:
+    from orjson import loads as orjsonLoads
+
+    loads = orjsonLoads
+except ImportError:
+    loads = _stdlibLoads
+
+
+def isJsonContentType(contentType: str | None) -> bool:
+    """checks if a content type header describes a json body, ignoring it's parameters"""
+    if not contentType:
+        return False
+    return contentType.split(";", 1)[0].strip().lower() == "application/json"
@@ -4,8 +4,10 @@
 # and the keys in the dictionaries correspond to various types of search criteria,
 # including equality checks, inequality checks, range checks, and membership checks.
 # These criteria are represented using special keywords,
-# such as _eq, _gt, _gte, _lt, _lte, _in, _nin, _contains, _icontains, _regex, _or, _and,
+# such as _eq, _gt, _gte, _lt, _lte, _in, _nin, _contains, _icontains, _regex, _search, _or, _and,
 # and _not, which are stored in a dictionary.
+# _search applies to a model (the queried model, or a relation) rather than a field, and matches
+# the rows whose searchable fields (see uql.models.search) hold every word of it's value.
 # The makeQuery function recursively traverses the search query dictionary,
 # using the critaroin dictionary to identify the type of each criterion
 # and to create the appropriate Django Q object for that criterion.
@@ -14,9 +16,14 @@
 # The Q objects created for each criterion are then combined using the _or
 # and _and conjunctions, or negated using the _not conjunction,
 # to create the final Q object that represents the entire search query.
+# The structure of a query (it's keys, without the values) is compiled once into a
+# function that builds the Q object from the values, and kept in an LRU cache,
+# so queries of the same shape only have their values walked.
 
 import typing
+import operator
 from functools import reduce
+from functools import lru_cache
 from django.db.models import Q
 from collections.abc import Sequence
 
@@ -36,6 +43,7 @@ CriterionTypes: typing.TypeAlias = (
     | typing.Literal["_contains"]
     | typing.Literal["_icontains"]
     | typing.Literal["_regex"]
+    | typing.Literal["_search"]
 )
 
 
@@ -59,11 +67,24 @@ class Criterion:
             "_contains",
             "_icontains",
             "_regex",
+            "_search",
         ]:
-            res = Q(**{f"{key}{self.djtype}": value})
+            res = Q(**{self.lookup(key): value})
             return ~res if self.negate else res
         raise ValueError(f"Invalid criterion")
 
+    def lookup(self, key: str) -> str:
+        """Returns the django lookup of the criterion on key, key is empty for the queried model"""
+        return f"{key}{self.djtype}" if key else self.djtype.removeprefix("__")
+
+    def bind(self, key: str) -> typing.Callable[[typing.Iterator], Q]:
+        """Returns a function that resolves the criterion on key, with the next value of an iterator"""
+        lookup = self.lookup(key)
+
+        if self.negate:
+            return lambda values: ~Q(**{lookup: next(values)})
+        return lambda values: Q(**{lookup: next(values)})
+
 
 class Conjunction:
     def __init__(
@@ -87,6 +108,7 @@ criterions: dict[CriterionTypes, Criterion] = {
     "_contains": Criterion("_contains", "__contains"),
     "_icontains": Criterion("_icontains", "__icontains"),
     "_regex": Criterion("_regex", "__regex"),
+    "_search": Criterion("_search", "__pk__uqlsearch"),
 }
 
 # create conjunctions
@@ -101,41 +123,158 @@ class QueryStructureError(BaseException):
     pass
 
 
-# make query func
-# TODO: cache function
-def makeQuery(query: dict[str, typing.Any], **kwargs: str) -> Q:
-    # Get parent field name, if any
-    parent: str = kwargs.get("parent", "")
+# the number of query shapes kept compiled
+QUERY_CACHE_SIZE = 512
+
+# a hashable copy of a query structure, without it's values (see `_shape`)
+QueryShape: typing.TypeAlias = tuple[tuple[str, typing.Any], ...]
 
-    # Initialize list to store Q objects for each criterion
-    res: list[Q] = []
+# builds the Q object of a query shape from the values of the query, in order
+QueryTemplate: typing.TypeAlias = typing.Callable[[typing.Iterator], Q]
 
+
+def _shape(query: dict[str, typing.Any], values: list) -> QueryShape:
+    """Returns the shape of a query: (key, shape) pairs in the order of the query, where the
+    shape of a criterion is None. The values of the criterions are appended to values, in order."""
     try:
-        for item, value in query.items():
-            # check if item is a criterion or conjunction
-            criterion = criterions.get(typing.cast(CriterionTypes, item))
-            conjunction = conjunctions.get(typing.cast(ConjunctionTypes, item))
-
-            if criterion:
-                # If item is a criterion, resolve it and add the resulting Q object to the list
-                res.append(criterion.resolve(parent, value))
-
-            elif conjunction:
-                # If item is a conjunction, recursively resolve its values and combine them using the conjunction
-                assert isinstance(value, Sequence)
-                res.append(
-                    conjunction.resolve([makeQuery(i, parent=parent) for i in value])
-                )
-
-            else:
-                # If item is not a criterion or conjunction, treat it as a field name and recursively resolve its value
-                res.append(
-                    makeQuery(value, parent=f"{parent}__{item}" if parent else item)
-                )
-
-        # Combine all Q objects using the _and conjunction
-        return reduce(lambda a, b: a & b, res)
+        items = query.items()
     except AttributeError:
         raise QueryStructureError(
             f'expected a citarion or relationship, got a string "{query}"', 400
         )
+
+    shape: list[tuple[str, typing.Any]] = []
+    for item, value in items:
+        if item in criterions:
+            values.append(value)
+            shape.append((item, None))
+
+        elif item in conjunctions:
+            assert isinstance(value, Sequence)
+            shape.append((item, tuple(_shape(i, values) for i in value)))
+
+        else:
+            shape.append((item, _shape(value, values)))
+
+    return tuple(shape)
+
+
+def _compile(shape: QueryShape, parent: str) -> QueryTemplate:
+    """Compiles a query shape into a function that builds it's Q object from the query's values"""
+    # Build a Q object for each item in the shape
+    parts: list[QueryTemplate] = []
+
+    for item, sub in shape:
+        criterion = criterions.get(typing.cast(CriterionTypes, item))
+        conjunction = conjunctions.get(typing.cast(ConjunctionTypes, item))
+
+        if criterion:
+            parts.append(criterion.bind(parent))
+
+        elif conjunction:
+            # combine the Q objects of the conjunction's items with the conjunction
+            parts.append(_conjoin(conjunction, [_compile(i, parent) for i in sub]))
+
+        else:
+            parts.append(_compile(sub, f"{parent}__{item}" if parent else item))
+
+    if len(parts) == 1:
+        return parts[0]
+
+    # Combine all Q objects using the _and conjunction
+    return lambda values: reduce(operator.and_, [part(values) for part in parts])
+
+
+def _conjoin(conjunction: Conjunction, items: list[QueryTemplate]) -> QueryTemplate:
+    """Returns a function that combines the Q objects of items with the conjunction"""
+    resolve = conjunction.resolve
+    return lambda values: resolve([i(values) for i in items])
+
+
+@lru_cache(maxsize=QUERY_CACHE_SIZE)
+def _template(shape: QueryShape, parent: str) -> QueryTemplate:
+    return _compile(shape, parent)
+
+
+def queryCacheInfo():
+    """Returns the hits, misses, maxsize and currsize of the compiled query cache"""
+    return _template.cache_info()  # pylint: disable=no-value-for-parameter
+
+
+def clearQueryCache() -> None:
+    """Empties the compiled query cache, and resets it's counters"""
+    _template.cache_clear()
+
+
+class Parameter:
+    def __init__(self, name: str) -> None:
+        """A placeholder for a value of a prepared query, given when the query is called"""
+        self.name = name
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} name={self.name}>"
+
+
+class PreparedQuery:
+    def __init__(self, where: dict[str, typing.Any]) -> None:
+        """A query structure that is compiled once, with Parameters in place of the values
+        that are given when it's called. see `bind`"""
+        values: list = []
+        self.where = where
+        self.template = _compile(_shape(where, values), "")
+        self.values = tuple(values)
+        self.parameters = frozenset(
+            value.name for value in values if isinstance(value, Parameter)
+        )
+
+        # the django lookups each parameter is compared with, eg. {"author": ("author__name__exact",)}
+        lookups: dict[str, list[str]] = {}
+        for value, lookup in zip(values, queryLookups(where)):
+            if isinstance(value, Parameter):
+                lookups.setdefault(value.name, []).append(lookup)
+        self.lookups = {name: tuple(lookup) for name, lookup in lookups.items()}
+
+    def bind(self, params: dict[str, typing.Any]) -> Q:
+        """Returns the Q object of the query with it's parameters set to params.
+        Every parameter is required, and params should only hold parameters of the query."""
+        return self.template(
+            iter(
+                [
+                    params[value.name] if isinstance(value, Parameter) else value
+                    for value in self.values
+                ]
+            )
+        )
+
+
+def queryLookups(query: dict[str, typing.Any], parent: str = "") -> list[str]:
+    """Returns the django lookup of each criterion in a query structure, in order.
+    eg. ["author__name__icontains", "price__exact"] for
+    {"author": {"name": {"_icontains": "a"}}, "price": {"_eq": 1}}"""
+    lookups: list[str] = []
+
+    for item, value in query.items():
+        criterion = criterions.get(typing.cast(CriterionTypes, item))
+
+        if criterion:
+            lookups.append(
+                criterion.lookup(parent) if criterion.djtype else f"{parent}__exact"
+            )
+
+        elif item in conjunctions:
+            for i in value:
+                lookups.extend(queryLookups(i, parent))
+
+        else:
+            lookups.extend(queryLookups(value, f"{parent}__{item}" if parent else item))
+
+    return lookups
+
+
+def makeQuery(query: dict[str, typing.Any], **kwargs: str) -> Q:
+    # Get parent field name, if any
+    parent: str = kwargs.get("parent", "")
+
+    values: list = []
+    template = _template(_shape(query, values), parent)
+    return template(iter(values))
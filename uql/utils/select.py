@@ -1,10 +1,40 @@
 from .typecheck import isMap
 from .typecheck import isArray
+import typing
+from functools import lru_cache
 from collections.abc import Mapping
 
 
+# a hashable copy of a fields structure (see `freezeFields`)
+FrozenFields: typing.TypeAlias = tuple[tuple[str, "FrozenFields | bool"], ...]
+
+
+def freezeFields(fields: bool | dict | None) -> FrozenFields | None:
+    """Turns a fields structure into a hashable, order independent tuple of (key, selection) pairs.
+
+    The selection of a key is True when the whole value is selected, False when the key is only
+    required to exist (falsy values), or the frozen structure of the nested selection.
+    Returns None if the structure isn't a dict, meaning that every field is selected.
+    """
+    if type(fields) != dict:
+        return None
+    return _freezeMap(typing.cast(dict, fields))
+
+
+def _freezeMap(fields: Mapping) -> FrozenFields:
+    return tuple(
+        sorted(
+            (
+                key,
+                (_freezeMap(val) if isMap(val) else True) if val else False,
+            )
+            for key, val in fields.items()
+        )
+    )
+
+
 def selectKeys(data: Mapping, structure: dict) -> dict:
-    res = {}
+    res: dict[str, typing.Any] = {}
     for key, val in structure.items():
         if not (key in data):
             raise KeyError(f"{key} doenst exist in root")
@@ -16,8 +46,129 @@ def selectKeys(data: Mapping, structure: dict) -> dict:
                 else:
                     res[key] = data[key]
             elif isArray(data[key]):
-                res[key] = [selectKeys(i, val) if isMap(val) else i for i in data[key]]
+                # items that are not maps (eg. primary keys of normalized objects) are kept as they are
+                res[key] = [
+                    selectKeys(i, val) if isMap(val) and isMap(i) else i
+                    for i in data[key]
+                ]
             else:
                 res[key] = data[key]
 
     return res
+
+
+# selects the requested fields from an intent's output (see `compileProjector`)
+Projector: typing.TypeAlias = typing.Callable[[typing.Any], typing.Any]
+
+
+def _compileMap(structure: dict) -> typing.Callable[[Mapping], dict]:
+    """Returns a function that does `selectKeys(data, structure)`.
+    The keys and the handler of each selected key are worked out once, so the structure isn't
+    walked again for every row. Values selected whole are kept as they are."""
+    required = tuple(structure.keys())
+    requiredSet = frozenset(required)
+
+    # (key, handler), the handler is None for values selected whole
+    branches = tuple(
+        (key, _compileNested(_compileMap(val)) if isMap(val) else None)
+        for key, val in structure.items()
+        # keys with falsy selections are only required to exist
+        if val
+    )
+
+    def projectMap(data: Mapping) -> dict:
+        if not requiredSet <= data.keys():
+            key = next(key for key in required if not (key in data))
+            raise KeyError(f"{key} doenst exist in root")
+
+        res = {}
+        for key, handler in branches:
+            res[key] = data[key] if handler is None else handler(data[key])
+        return res
+
+    return projectMap
+
+
+def _compileNested(
+    projectMap: typing.Callable[[Mapping], dict]
+) -> typing.Callable[[typing.Any], typing.Any]:
+    """Returns the handler of a key with a nested selection: maps, and the maps in lists are projected"""
+
+    def projectValue(value: typing.Any) -> typing.Any:
+        if type(value) is dict or isMap(value):
+            return projectMap(value)
+        if isArray(value):
+            # items that are not maps (eg. primary keys of normalized objects) are kept as they are
+            return [projectMap(i) if type(i) is dict or isMap(i) else i for i in value]
+        return value
+
+    return projectValue
+
+
+def compileProjector(fields: bool | dict | None) -> Projector:
+    """Compiles a fields structure into a function that does `project(data, fields)`.
+    Compile the structure once when it's applied to many outputs (eg. the chunks of a stream)."""
+    if not fields:
+        return lambda data: None
+
+    if type(fields) != dict:
+        return lambda data: data
+
+    projectMap = _compileMap(typing.cast(dict, fields))
+
+    def projector(data: typing.Any) -> typing.Any:
+        if data is None:
+            return None
+        if type(data) is dict or isMap(data):
+            return projectMap(data)
+        return [projectMap(i) if type(i) is dict or isMap(i) else i for i in data]
+
+    return projector
+
+
+# the number of fields structures kept compiled by `project`
+PROJECTOR_CACHE_SIZE = 256
+
+# a hashable copy of a dict fields structure, in the order of it's keys (see `_fieldsKey`)
+FieldsKey: typing.TypeAlias = tuple[tuple[str, "FieldsKey | bool"], ...]
+
+
+def _fieldsKey(fields: dict) -> FieldsKey:
+    """Unlike `freezeFields`, the keys keep their order, as projected maps keep the order of
+    the structure"""
+    return tuple(
+        (key, (_fieldsKey(val) if isMap(val) else True) if val else False)
+        for key, val in fields.items()
+    )
+
+
+def _thawFields(key: FieldsKey) -> dict:
+    return {name: _thawFields(val) if type(val) is tuple else val for name, val in key}
+
+
+@lru_cache(maxsize=PROJECTOR_CACHE_SIZE)
+def _cachedProjector(key: FieldsKey) -> Projector:
+    return compileProjector(_thawFields(key))
+
+
+def project(data: typing.Any, fields: bool | dict | None) -> typing.Any:
+    """Selects the requested fields from an intent's output.
+
+    - None/False/empty fields: no data is returned
+    - True: the data is returned as it is
+    - dict: only the keys in the structure are returned, from a map or from each map in a list
+
+    A single map is selected from directly, lists are projected with a compiled projector,
+    kept for the next outputs requested with the same structure.
+    """
+    if not fields:
+        return None
+
+    if type(fields) != dict or data is None:
+        return data
+
+    fields = typing.cast(dict, fields)
+
+    if type(data) is dict or isMap(data):
+        return selectKeys(data, fields)
+    return _cachedProjector(_fieldsKey(fields))(data)
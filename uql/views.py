@@ -1,44 +1,113 @@
 import json
 import typing
+import threading
+
+from types import MappingProxyType
+from concurrent.futures import ThreadPoolExecutor
 
 from rest_framework.views import APIView
 from rest_framework.request import Request
 from rest_framework.response import Response
+from rest_framework.renderers import JSONRenderer
 from rest_framework.parsers import JSONParser
 from rest_framework.parsers import FormParser
 from rest_framework.parsers import MultiPartParser
+from django.http import HttpResponse
+from django.http import HttpResponseBase
+from django.http import StreamingHttpResponse
 from django.http.request import QueryDict
+from django.db import connections
 
 from . import types
 from . import constants
 from . import exceptions
 from . import getUserRole as _getUserRole
 
-from .utils.select import selectKeys
-from .utils.typecheck import isMap, isArray
+from .utils import jsondecode
 from .functions import ApiFunction
+from .functions import LazyApiFunction
+from .schema import SchemaDocument
 from .models import ExposedModel
+from .models.advisor import QueryRecorder
+from .models.context import RequestContext
 from .models.manager import ModelOperationManager
 
 
+def _releaseWorkerConnections() -> None:
+    """Closes the database connections of a batch thread that errors made unusable, or that
+    are older than a CONN_MAX_AGE greater than 0. Unlike django.db.close_old_connections,
+    connections with CONN_MAX_AGE = 0 (django's default) are kept open, so the thread doesn't
+    connect again for every cell it runs."""
+    for connection in connections.all(initialized_only=True):
+        if connection.settings_dict["CONN_MAX_AGE"] != 0:
+            connection.close_if_unusable_or_obsolete()
+
+        elif connection.errors_occurred:
+            if connection.connection is not None and connection.is_usable():
+                connection.errors_occurred = False
+            else:
+                connection.close()
+
+
 def createUQLView(
     models: list[ExposedModel],
     functions: list[ApiFunction],
     raiseExceptions: bool = False,
     userRoleFactory: typing.Callable[[typing.Any], str] = _getUserRole,
+    fastJsonParsing: bool = False,
+    jsonDecoder: jsondecode.JsonDecoder | None = None,
+    queryRecorder: QueryRecorder | None = None,
+    batchWorkers: int = 0,
 ) -> typing.Type[APIView]:
+    """Creates the view that serves the given models and functions.
+
+    Args:
+        models (list[ExposedModel]): the models exposed through the view.
+        functions (list[ApiFunction]): the functions exposed through the view.
+        raiseExceptions (bool, optional): raise errors instead of returning a structured error response. Defaults to False.
+        userRoleFactory (typing.Callable[[typing.Any], str], optional): returns the role of a user. Defaults to uql.getUserRole.
+        fastJsonParsing (bool, optional): decode application/json post bodies straight from the raw body,
+            skipping DRF's parser negotiation. form data (uploads) still goes through the DRF parsers. Defaults to False.
+        jsonDecoder (JsonDecoder, optional): decodes json bodies, when fastJsonParsing is set, and the uql.body
+            of form data. Defaults to orjson.loads if orjson is installed, else json.loads.
+        queryRecorder (QueryRecorder, optional): records the lookups findmany filters the models with,
+            for `manage.py uqlindexes` to recommend indexes from. Defaults to None, nothing is recorded.
+        batchWorkers (int, optional): run the cells of batch requests on up to batchWorkers threads at once,
+            when every cell calls a pure function (eg. find, findmany), each thread with it's own database
+            connection. The connections of the threads are kept open for their next cells, even with
+            CONN_MAX_AGE = 0, so up to batchWorkers connections stay open per process. Batches with a cell
+            that writes run sequentially, and so do batches sent within a transaction, which other
+            connections can't see. Defaults to 0, cells are run sequentially.
+    """
+    decode = jsonDecoder or jsondecode.loads
+    recorder = queryRecorder
+
     class UQLViewClass(APIView):
         parser_classes = [JSONParser, FormParser, MultiPartParser]
 
+        # DRF creates a new view instance for every request, so the intent root
+        # is computed once for the class (on first instantiation) and shared
+        # between all instances. it's read-only, so requests can't alter it.
+        _sharedRoot: typing.Mapping[str, ApiFunction | LazyApiFunction] | None = None
+        _sharedSchema: SchemaDocument | None = None
+
+        # records the lookups of findmany calls, see uql.models.advisor
+        queryRecorder: QueryRecorder | None = recorder
+
+        # runs the cells of batches concurrently, shared by all instances, see getBatchExecutor
+        _batchExecutor: ThreadPoolExecutor | None = None
+        _batchExecutorLock = threading.Lock()
+
         def __init__(
             self,
         ) -> None:
             self.raiseExceptions = raiseExceptions
             self.__models = models
             self.__functions = functions
-            self.root: dict[str, ApiFunction] = {}
-
-            self._evaluateRoots()
+            self.root: typing.Mapping[
+                str, ApiFunction | LazyApiFunction
+            ] = self.getSharedRoot()
+            self._schema: SchemaDocument | None = None
 
         @property
         def models(self) -> list[ExposedModel]:
@@ -58,21 +127,62 @@ def createUQLView(
             self.__functions = val
             self._evaluateRoots()
 
-        def _evaluateRoots(self):
-            modelRoots = {}
-            functionsRoots = {}
+        @classmethod
+        def getSharedRoot(cls) -> typing.Mapping[str, ApiFunction | LazyApiFunction]:
+            """Returns the intent root shared by all instances of this view class,
+            building it the first time it's requested."""
+            if cls._sharedRoot is None:
+                cls._sharedRoot = cls.buildRoot(models, functions)
+            return cls._sharedRoot
+
+        @classmethod
+        def buildRoot(
+            cls, models: list[ExposedModel], functions: list[ApiFunction]
+        ) -> typing.Mapping[str, ApiFunction | LazyApiFunction]:
+            """Creates a read-only intent root from the given models and functions"""
+            modelRoots: dict[str, LazyApiFunction] = {}
+            functionsRoots: dict[str, ApiFunction] = {}
 
             # load up function roots
-            for function in self.functions:
+            for function in functions:
                 functionsRoots[f"functions.{function.name}"] = function
 
             # load up model roots
-            for exposedmodel in self.models:
+            for exposedmodel in models:
                 modelRoots.update(
-                    ModelOperationManager(self, exposedmodel).generateHandlers()
+                    ModelOperationManager(cls, exposedmodel).generateHandlers()
                 )
 
-            self.root = {**modelRoots, **functionsRoots}
+            return MappingProxyType({**modelRoots, **functionsRoots})
+
+        def _evaluateRoots(self):
+            # only this instance gets the rebuilt root, the shared root is left untouched
+            self.root = self.buildRoot(self.models, self.functions)
+            self._schema = None
+
+        def getSchema(self) -> SchemaDocument:
+            """Returns the serialized schema of this view's root.
+            The schema of the shared root is also shared, and only serialized once."""
+            cls = type(self)
+
+            if self.root is cls._sharedRoot:
+                if cls._sharedSchema is None:
+                    cls._sharedSchema = SchemaDocument(self.root)
+                return cls._sharedSchema
+
+            if self._schema is None:
+                self._schema = SchemaDocument(self.root)
+            return self._schema
+
+        @classmethod
+        def getBatchExecutor(cls) -> ThreadPoolExecutor:
+            """Returns the thread pool batch cells are run on, creating it the first time"""
+            with cls._batchExecutorLock:
+                if cls._batchExecutor is None:
+                    cls._batchExecutor = ThreadPoolExecutor(
+                        max_workers=batchWorkers, thread_name_prefix="uql-batch"
+                    )
+                return cls._batchExecutor
 
         @staticmethod
         def getUserRole(
@@ -86,7 +196,10 @@ def createUQLView(
         def rootErrorHandler(
             self,
             fn: typing.Callable[
-                [Request], types.ResponseBodyType | list[types.ResponseBodyType]
+                [Request],
+                types.ResponseBodyType
+                | list[types.ResponseBodyType]
+                | HttpResponseBase,
             ],
         ):
             """
@@ -103,7 +216,8 @@ def createUQLView(
             `Response` object and returned to the client with a status code of 200.
             Otherwise, the `ResponseBodyType` object will be wrapped in a `Response`
             object and returned to the client with the status code specified in the
-            "statusCode" field of the `ResponseBodyType` object.
+            "statusCode" field of the `ResponseBodyType` object. Http responses
+            returned by the view function are passed on as they are.
 
             Args:
                 fn: The view function to be decorated.
@@ -113,8 +227,10 @@ def createUQLView(
                 to the client.
             """
 
-            def _(*args, **kwargs) -> Response:
-                _response: types.ResponseBodyType | list[types.ResponseBodyType]
+            def _(*args, **kwargs) -> HttpResponseBase:
+                _response: types.ResponseBodyType | list[
+                    types.ResponseBodyType
+                ] | HttpResponseBase
 
                 try:
                     _response = fn(*args, **kwargs)
@@ -161,6 +277,9 @@ def createUQLView(
                             },
                         }
 
+                if isinstance(_response, HttpResponseBase):
+                    return _response
+
                 if type(_response) == list:
                     return Response(_response, status=200)
 
@@ -169,11 +288,46 @@ def createUQLView(
 
             return _
 
-        def get(self, request: Request) -> Response:
-            schema = {
-                key: {**val.toJson(), "name": key} for key, val in self.root.items()
-            }
-            return Response({"schema": schema or None})
+        def get(self, request: Request) -> HttpResponseBase:
+            @self.rootErrorHandler
+            def inner(request: Request) -> HttpResponseBase:
+                schema = self.getSchema()
+
+                # ?intent=... fetches the schema of a single intent
+                intent: str | None = request.query_params.get("intent")
+
+                if intent == None:
+                    document = schema.full
+                elif intent in schema.intents:
+                    document = schema.intents[intent]
+                else:
+                    raise exceptions.RequestHandlingError(
+                        "Intent does not exist",
+                        errorCode=constants.INEXISTENT_INTENT,
+                        statusCode=404,
+                        summary=f'Intent "{intent}" does not exist in uql root.',
+                    )
+
+                headers = {"ETag": document.etag}
+
+                # the client's copy of the schema is still valid
+                if SchemaDocument.matchesEtag(
+                    request.headers.get("If-None-Match"), document.etag
+                ):
+                    return Response(status=304, headers=headers)
+
+                # send the pre-rendered document when the client accepts json,
+                # other renderers (like the browsable api) render it as usual
+                if request.accepted_renderer.format == "json":
+                    return HttpResponse(
+                        document.content,
+                        content_type="application/json",
+                        headers=headers,
+                    )
+
+                return Response(document.data, headers=headers)
+
+            return inner(request)
 
         def handleIntent(
             self,
@@ -181,7 +335,7 @@ def createUQLView(
             intent: str | None,
             fields: bool | dict | None,
             arguments: dict[str, typing.Any],
-        ) -> types.ResponseBodyType:
+        ) -> types.ResponseBodyType | StreamingHttpResponse:
             # intents are required to use this app
             if intent == None:
                 raise exceptions.RequestHandlingError(
@@ -200,7 +354,7 @@ def createUQLView(
                 )
 
             # get the function that would handles current request from root
-            handler: ApiFunction = self.root[intent]
+            handler = self.root[intent]
 
             warning = (
                 "fields not specified (or set to null), you might get an empty data"
@@ -208,49 +362,15 @@ def createUQLView(
                 else None
             )
 
-            data = handler(request, arguments)
+            # runs the handler and selects the requested fields from it's output
+            result = handler.execute(request, arguments, fields, intent)
+            extras: dict[str, typing.Any] = {}
 
-            # raise an error if the intent handler returned any thing other than
-            # the instances of dict or list or tuple or none
-            if not (data == None or isMap(data) or isArray(data)):
-                raise exceptions.RequestHandlingError(
-                    "Invalid handler output",
-                    errorCode=constants.INVALID_REQUEST_HANDLER_OUTPUT,
-                    statusCode=500,
-                    summary=f"Intent ({intent}) handler returned a {type(data)} type. allowed output types are dict, list, none",
-                )
+            if isinstance(result, types.IntentStream):
+                return self.streamResponse(result, warning)
 
-            # if there's no data, do not filter response
-            if data == None:
-                return {
-                    "_appname": "uql",
-                    "data": None,
-                    "error": None,
-                    "warning": warning,
-                    "statusCode": 200,
-                }
-
-            # psuedo data function
-            _data = lambda: data
-
-            if isMap(data):
-                _data = lambda: selectKeys(
-                    typing.cast(dict, data), typing.cast(dict, fields)
-                )
-            else:
-                _data = lambda: [
-                    selectKeys(i, typing.cast(dict, fields)) if isMap(i) else i
-                    for i in typing.cast(typing.Sequence[typing.Any], data)
-                ]
-
-            # check fields to compute result
-            if fields:
-                if type(fields) == dict:
-                    result = _data()
-                else:
-                    result = data
-            else:
-                result = None
+            if isinstance(result, types.IntentOutput):
+                result, extras = result
 
             # return result
             return {
@@ -259,22 +379,188 @@ def createUQLView(
                 "warning": warning,
                 "statusCode": 200,
                 "error": None,
+                **extras,
             }
 
+        def streamResponse(
+            self, stream: types.IntentStream, warning: str | None
+        ) -> StreamingHttpResponse:
+            """Writes the response body of a streamed intent output as it's chunks are produced,
+            so only a chunk of the data is held in memory at a time. The body is the same as
+            the body of a regular response.
+
+            Errors raised while streaming can't be reported in the body, as the response has been
+            started, they're raised and the response is cut short.
+            """
+            renderer = JSONRenderer()
+
+            def content() -> typing.Iterator[bytes]:
+                yield b'{"_appname":"uql","data":['
+
+                separator = b""
+                for chunk in stream.chunks:
+                    # the items of the chunk, without the brackets of the list
+                    items = renderer.render(list(chunk))[1:-1]
+
+                    if items:
+                        yield separator + items
+                        separator = b","
+
+                tail = {
+                    "warning": warning,
+                    "statusCode": 200,
+                    "error": None,
+                    **stream.extras(),
+                }
+                yield b"]," + renderer.render(tail)[1:]
+
+            return StreamingHttpResponse(content(), content_type="application/json")
+
+        def parseBody(self, request: Request) -> typing.Any:
+            """Returns the decoded body of a post request.
+
+            With fastJsonParsing, json bodies are decoded from the raw request body with the
+            json decoder; everything else is left to DRF's parsers (request.data).
+
+            Raises:
+                RequestHandlingError: if the json body could not be decoded.
+            """
+            if not (
+                fastJsonParsing and jsondecode.isJsonContentType(request.content_type)
+            ):
+                return request.data
+
+            raw = request.body
+
+            if not raw:
+                return {}
+
+            try:
+                return decode(raw)
+            except ValueError as e:
+                raise exceptions.RequestHandlingError(
+                    "Malformed json body",
+                    errorCode=constants.INVALID_REQUEST_BODY,
+                    statusCode=400,
+                    summary=str(e),
+                )
+
+        def handleCell(
+            self, request: Request, cell: types.RequestBodyType
+        ) -> types.ResponseBodyType:
+            """Handles a cell of a batch request"""
+            cellResponse = self.handleIntent(
+                request, cell["intent"], cell["fields"], cell["args"]
+            )
+
+            if isinstance(cellResponse, StreamingHttpResponse):
+                raise exceptions.RequestHandlingError(
+                    "Streamed intents can't be batched",
+                    errorCode=constants.INVALID_REQUEST_BODY,
+                    statusCode=400,
+                    summary=f'Intent "{cell["intent"]}" streams it\'s output, it should be called on it\'s own.',
+                )
+
+            return cellResponse
+
+        def isPureBatch(self, body: list[types.RequestBodyType]) -> bool:
+            """Whether every cell of a batch calls a pure function (one that doesn't write)"""
+            for cell in body:
+                handler = self.root.get(cell["intent"] or "")
+                if handler is None or not handler.pure:
+                    return False
+            return True
+
+        def isConcurrentBatch(self, body: list[types.RequestBodyType]) -> bool:
+            """Whether the cells of a batch can be run concurrently: batchWorkers is set, every
+            cell calls a pure function, and no transaction is open (the cells would be run on
+            other connections, outside of it)"""
+            if batchWorkers < 2 or len(body) < 2 or not self.isPureBatch(body):
+                return False
+
+            return not any(
+                connection.in_atomic_block for connection in connections.all()
+            )
+
+        @staticmethod
+        def cellKey(cell: types.RequestBodyType) -> str | None:
+            """Returns the canonical json of the intent, fields and args of a cell, identical
+            cells have the same key. None is returned if the cell can't be encoded."""
+            try:
+                return json.dumps(
+                    [cell["intent"], cell["fields"], cell["args"]],
+                    sort_keys=True,
+                    separators=(",", ":"),
+                )
+            except (TypeError, ValueError):
+                return None
+
+        def runBatch(
+            self, request: Request, body: list[types.RequestBodyType]
+        ) -> tuple[list[types.ResponseBodyType], int]:
+            """Handles the cells of a batch request, and returns their responses in the order of
+            the cells, with the number of deduplicated cells.
+
+            When every cell is pure, identical cells (see cellKey) are only run once, and their
+            response is repeated for each of them. The distinct cells are run concurrently if they
+            can be (see isConcurrentBatch), else one after the other. The error of the first failing
+            cell is raised."""
+            cells = body
+            positions = list(range(len(body)))
+
+            # a write between identical cells could change their responses
+            if self.isPureBatch(body):
+                distinct: dict[str, int] = {}
+                cells, positions = [], []
+
+                for cell in body:
+                    key = self.cellKey(cell)
+
+                    if key is None or not (key in distinct):
+                        if key is not None:
+                            distinct[key] = len(cells)
+                        positions.append(len(cells))
+                        cells.append(cell)
+                    else:
+                        positions.append(distinct[key])
+
+            responses = self.runCells(request, cells)
+            return [responses[i] for i in positions], len(body) - len(cells)
+
+        def runCells(
+            self, request: Request, cells: list[types.RequestBodyType]
+        ) -> list[types.ResponseBodyType]:
+            """Handles the cells concurrently if they can be (see isConcurrentBatch), else one
+            after the other, and returns their responses in order"""
+            if not self.isConcurrentBatch(cells):
+                return [self.handleCell(request, cell) for cell in cells]
+
+            # the user and their role are resolved once, before the cells are run
+            RequestContext.of(self, request)
+
+            def runCell(cell: types.RequestBodyType) -> types.ResponseBodyType:
+                # every thread has it's own connections, reused by the cells it runs
+                try:
+                    return self.handleCell(request, cell)
+                finally:
+                    _releaseWorkerConnections()
+
+            return list(self.getBatchExecutor().map(runCell, cells))
+
         def post(self, request: Request) -> Response:
             @self.rootErrorHandler
             def inner(
                 request: Request,
-            ) -> types.ResponseBodyType | list[types.ResponseBodyType]:
+            ) -> types.ResponseBodyType | HttpResponseBase:
                 # get response body
-                body = request.data
+                body = self.parseBody(request)
 
                 if type(body) == QueryDict:
                     # if we we're given a query dict, transform it into a dict
                     formdata = typing.cast(QueryDict, body)
 
                     # look for $uql.body in formdata
-                    body = json.loads(formdata.get("uql.body", "{}"))
+                    body = decode(formdata.get("uql.body", "{}"))
 
                 if type(body) == dict:
                     body = typing.cast(types.RequestBodyType, body)
@@ -299,22 +585,21 @@ def createUQLView(
                     return self.handleIntent(request, intent, fields, arguments)
 
                 elif type(body) == list:
-
-                    # sequentially run multiple intent in on call
                     body = typing.cast(list[types.RequestBodyType], body)
-                    responseData: list[types.ResponseBodyType] = []
 
                     for cell in body:
                         cell.setdefault("intent", None)
                         cell.setdefault("fields", None)
                         cell.setdefault("args", {})
 
-                        responseData.append(
-                            self.handleIntent(
-                                request, cell["intent"], cell["fields"], cell["args"]
-                            )
-                        )
-                    return responseData
+                    responses, deduplicated = self.runBatch(request, body)
+                    return Response(
+                        responses,
+                        status=200,
+                        headers={
+                            constants.DEDUPLICATED_CELLS_HEADER: str(deduplicated)
+                        },
+                    )
                 else:
                     raise exceptions.RequestHandlingError(
                         f"Unknown body type: {type(body)}",